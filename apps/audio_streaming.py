@@ -0,0 +1,190 @@
+'''
+Stream the audio of each demodulator (and the mix) over local TCP.
+
+A client connects, sends the name of a stream followed by a newline and
+gets back "OK <rate> s16le" and then raw 16 bit little endian mono PCM
+at the audio rate for as long as it stays connected.  "list" returns the
+stream names, one per line.  The streams are the channel numbers of the
+demodulators ("1", "2"...) and the mix of each device ("mix", "mix-1"...).
+
+The flowgraph hands float buffers to the event loop (AudioTap blocks) and
+the encoding to int16 happens there, once per buffer for all the clients.
+Each client has a bounded queue; a client that does not keep up loses its
+oldest buffers so neither the flowgraph nor the other clients ever wait.
+
+Example: nc localhost 8765 <<< 3 | aplay -r 8000 -f S16_LE
+'''
+import asyncio
+import logging
+
+import numpy as np
+
+QUEUE_BUFFERS = 64
+
+
+def encode(samples: np.ndarray) -> bytes:
+    '''
+    Float audio (+/-1.0 full scale) to 16 bit little endian PCM
+    '''
+    return (np.clip(samples, -1.0, 1.0) * 32767).astype('<i2').tobytes()
+
+
+class AudioClient:
+    '''
+    One connected client of a stream
+
+    Attributes:
+        queue (asyncio.Queue): Encoded buffers waiting to be sent
+        dropped (int): Buffers dropped because the client was too slow
+    '''
+
+    def __init__(self, writer: asyncio.StreamWriter, max_buffers: int) -> None:
+        self.writer = writer
+        self.queue: asyncio.Queue[bytes] = asyncio.Queue(max_buffers)
+        self.dropped = 0
+
+    def put(self, data: bytes) -> None:
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(data)
+
+
+class AudioStreamServer:
+    '''
+    TCP server for the demodulator audio streams
+
+    Args:
+        port (int): TCP port (0 = any free port, see port after start)
+        audio_rate (int): Audio sample rate in sps
+        host (str): Address to listen on (local only by default)
+        max_buffers (int): Buffers queued per client before dropping
+
+    Attributes:
+        streams (set[str]): Names of the known streams
+        clients (dict[str, set[AudioClient]]): Clients of each stream
+    '''
+
+    def __init__(self, port: int, audio_rate: int, host: str='127.0.0.1',
+                 max_buffers: int=QUEUE_BUFFERS) -> None:
+        self.port = port
+        self.host = host
+        self.audio_rate = audio_rate
+        self.max_buffers = max_buffers
+        self.streams: set[str] = set()
+        self.clients: dict[str, set[AudioClient]] = {}
+        self.server: asyncio.AbstractServer | None = None
+        self.loop: asyncio.AbstractEventLoop | None = None
+
+    async def start(self) -> None:
+        self.loop = asyncio.get_running_loop()
+        self.server = await asyncio.start_server(self._serve, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        logging.info(f'Audio streams on {self.host}:{self.port}')
+
+    async def close(self) -> None:
+        if self.server is None:
+            return
+        self.server.close()
+        for clients in self.clients.values():
+            for client in clients:
+                client.writer.close()
+        await self.server.wait_closed()
+        self.server = None
+
+    def register(self, stream: str) -> None:
+        """Make a stream known to the clients"""
+        self.streams.add(stream)
+
+    def wanted(self, stream: str) -> bool:
+        """Whether a stream has clients (safe from any thread)"""
+        return bool(self.clients.get(stream))
+
+    def publish(self, stream: str, samples: np.ndarray) -> None:
+        """Send audio to the clients of a stream (event loop thread)
+
+        Args:
+            stream (str): Stream name
+            samples (np.ndarray): Float audio samples
+        """
+        clients = self.clients.get(stream)
+        if not clients:
+            return
+        data = encode(samples)
+        for client in clients:
+            client.put(data)
+
+    def publish_threadsafe(self, stream: str, samples: np.ndarray) -> None:
+        """Hand audio from another thread (e.g. a flowgraph block) to the loop"""
+        if self.loop is None or not self.wanted(stream):
+            return
+        try:
+            self.loop.call_soon_threadsafe(self.publish, stream, samples)
+        except RuntimeError:
+            pass  # loop closed, we are shutting down
+
+    async def _serve(self, reader: asyncio.StreamReader,
+                     writer: asyncio.StreamWriter) -> None:
+        try:
+            request = (await reader.readline()).decode(errors='replace').strip()
+        except ConnectionError:
+            writer.close()
+            return
+
+        if request == 'list':
+            writer.write(''.join(f'{stream}\n' for stream in sorted(self.streams)).encode())
+            await self._close(writer)
+            return
+        if request not in self.streams:
+            writer.write(f'ERR unknown stream {request}\n'.encode())
+            await self._close(writer)
+            return
+
+        writer.write(f'OK {self.audio_rate} s16le\n'.encode())
+        client = AudioClient(writer, self.max_buffers)
+        self.clients.setdefault(request, set()).add(client)
+        logging.debug(f'Audio stream {request} to {writer.get_extra_info("peername")}')
+        try:
+            while True:
+                writer.write(await client.queue.get())
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self.clients[request].discard(client)
+            if client.dropped:
+                logging.debug(f'Audio stream {request} dropped {client.dropped} buffers')
+            writer.close()
+
+    async def _close(self, writer: asyncio.StreamWriter) -> None:
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+        writer.close()
+
+
+async def main() -> None:
+    """Stream a test tone as "1" and the mix on port 8765"""
+    audio_rate = 8000
+    server = AudioStreamServer(8765, audio_rate)
+    server.register('1')
+    server.register('mix')
+    await server.start()
+    print(f'nc localhost {server.port} <<< 1 | aplay -r {audio_rate} -f S16_LE')
+
+    phase = 0
+    while True:
+        times = (phase + np.arange(audio_rate//10)) / audio_rate
+        tone = 0.3 * np.sin(2*np.pi*440*times).astype(np.float32)
+        server.publish('1', tone)
+        server.publish('mix', tone)
+        phase += len(times)
+        await asyncio.sleep(0.1)
+
+
+if __name__ == '__main__':
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
@@ -5,12 +5,38 @@ through all the available frequencies
 
 Initialize with command line parameters (frequencies or frequency ranges) and
 timeouts for activity tracking.
+
+The order of the steps and the time spent on each one comes from a step
+schedule (--schedule).  The round robin schedule visits every step in turn
+for the quiet timeout.  The activity schedule keeps a decaying activity
+score per step and visits busy steps more often and for longer, while
+--max_revisit makes sure quiet steps are still visited.  The survey
+schedule sweeps all the steps quickly with the demodulators off to build a
+band occupancy map, then dwells only on the steps that had activity until
+the next survey.
+
+With --plan_steps the steps of each range are placed on the frequencies of
+interest from the frequency file once it is loaded (see step_planner.py).
 '''
+from abc import ABC, abstractmethod
 from dataclasses import dataclass, field
 import logging
 import asyncio
+import math
+import time
 import typing
 
+from occupancy import OccupancyMap
+from step_planner import USABLE_BANDWIDTH, plan_centers
+
+SCHEDULES = ('round_robin', 'activity', 'survey')
+ACTIVITY_HALF_LIFE = 600.0  # seconds for the activity score of a step to halve
+QUIET_SCORE = 0.2  # score every step has so quiet steps are still visited
+MIN_DWELL_FACTOR = 0.5  # dwell of a step relative to the quiet timeout
+MAX_DWELL_FACTOR = 3.0
+REVISIT_SLACK = 0.5  # seconds allowed for a retune (and timer jitter) per step
+DETECTION_WEIGHT = 0.25  # activity of a transmission start (interesting = 1.0)
+
 @dataclass(kw_only=True)
 class FrequencyRangeParams:
     '''
@@ -39,22 +65,313 @@ class FrequencyGroup:
     Frequencies are in Hz
 
     Note: The notify_interface callback is included here but used only
-    by the scanner.
+    by the scanner.  wait_settled is awaited before the time on a step
+    starts (the scanner returns once the spectrum is clean after a retune).
     '''
     ranges: list[FrequencyRangeParams] = field(default_factory=list)
     singles: list[FrequencySingleParams] = field(default_factory=list)
     sample_rate: int
     quiet_timeout: float = 10
     active_timeout: float = 16
+    schedule: str = 'round_robin'
+    max_revisit: float = 120
+    survey_dwell: float = 1.0
+    resurvey: float = 600
+    min_duty: float = 0.01
+    channel_spacing: int = 5000
+    plan_steps: bool = False
     notify_scanner: typing.Callable = field(default=lambda: None)
     notify_interface: typing.Callable = field(default=lambda: None)
+    wait_settled: typing.Callable[[], typing.Awaitable] = field(default=lambda: asyncio.sleep(0))
+
+    def __post_init__(self):
+        if self.schedule not in SCHEDULES:
+            raise ValueError(f'Unknown schedule {self.schedule} (use one of {SCHEDULES})')
+        if self.max_revisit <= 0:
+            raise ValueError(f'Maximum revisit time must be positive: {self.max_revisit}')
+        if self.survey_dwell <= 0 or self.resurvey <= 0:
+            raise ValueError('Survey dwell and resurvey times must be positive')
+        if not 0 <= self.min_duty <= 1:
+            raise ValueError(f'Minimum duty cycle must be between 0 and 1: {self.min_duty}')
+
+class StepSchedule(ABC):
+    '''
+    Base class for the step schedules.  Decides which step comes next and
+    how long to stay on it when it is quiet.
+
+    Args:
+        steps (list[int]): Center frequency of each step in Hz
+        params (FrequencyGroup): Timeouts and schedule options
+        clock (Callable): Time source in seconds
+
+    Attributes:
+        surveying (bool): The scanner only collects spectra (no demodulation)
+        observes (bool): The schedule wants the channels of each spectrum
+    '''
+    surveying = False
+    observes = False
+
+    def __init__(self, steps: list[int], params: FrequencyGroup,
+                 clock: typing.Callable[[], float]=time.monotonic) -> None:
+        self.steps = steps
+        self.num_steps = len(steps)
+        self.params = params
+        self.clock = clock
+
+    @staticmethod
+    def get_schedule(steps: list[int], params: FrequencyGroup,
+                     clock: typing.Callable[[], float]=time.monotonic) -> 'StepSchedule':
+        '''
+        Factory to generate a class instance based on command line options
+        '''
+        if params.schedule == 'activity':
+            return ActivityWeightedSchedule(steps, params, clock)
+        elif params.schedule == 'survey':
+            return SurveySchedule(steps, params, clock)
+        else:
+            return RoundRobinSchedule(steps, params, clock)
+
+    def visit(self, step: int) -> None:
+        '''
+        The provider moved to this step
+        '''
+
+    def record_activity(self, step: int, weight: float=1.0) -> None:
+        '''
+        Something happened on this step (weight 1.0 = interesting activity)
+        '''
+
+    def carry_over(self, previous: 'StepSchedule') -> None:
+        '''
+        Take over what the previous schedule (before the steps were planned
+        again) knew about the steps that are still there
+        '''
+
+    def observe(self, center_freq: int, channels: list[int]) -> None:
+        '''
+        Channels (RF in Hz) detected in a spectrum (only if observes)
+        '''
+
+    @abstractmethod
+    def next_step(self, step: int) -> int:
+        '''
+        Step to move to after this one
+        '''
+
+    @abstractmethod
+    def dwell(self, step: int) -> float:
+        '''
+        Seconds to stay on a step without interesting activity
+        '''
+
+    def limit(self, step: int, seconds: float) -> float:
+        '''
+        Seconds to stay on a step at most, out of the seconds wanted (the
+        dwell or an active timeout)
+        '''
+        return seconds
+
+class RoundRobinSchedule(StepSchedule):
+    '''
+    Every step in turn for the quiet timeout
+    '''
+    def next_step(self, step: int) -> int:
+        return (step + 1) % self.num_steps
+
+    def dwell(self, step: int) -> float:
+        return self.params.quiet_timeout
+
+class ActivityWeightedSchedule(StepSchedule):
+    '''
+    Visits steps in proportion to their recent activity
+
+    Each step has an activity score that halves every ACTIVITY_HALF_LIFE
+    seconds.  The next step is the one with the largest score multiplied by
+    the time since its last visit, so a step with twice the activity is
+    visited about twice as often.  A step not visited for max_revisit
+    seconds goes first.  The dwell is the quiet timeout scaled by the
+    score of the step relative to the average score.
+
+    The time on a step, including the active timeout extensions, is cut
+    short so the other steps can still be visited within max_revisit in
+    order of their deadlines, each for the shortest dwell.  When a step has
+    to be left for that reason the step with the earliest deadline is next.
+    This holds as long as all the steps fit in max_revisit at the shortest
+    dwell, otherwise each late step still gets the shortest dwell.
+
+    Attributes:
+        scores (list[float]): Activity score of each step
+        last_visit (list[float]): Clock time of the last visit of each step
+    '''
+    def __init__(self, steps: list[int], params: FrequencyGroup,
+                 clock: typing.Callable[[], float]=time.monotonic) -> None:
+        super().__init__(steps, params, clock)
+        num_steps = self.num_steps
+        now = self.clock()
+        self.scores: list[float] = [0.0] * num_steps
+        self.updated: list[float] = [now] * num_steps
+        # Unvisited steps are due in step order
+        self.last_visit: list[float] = [now - (num_steps - idx)*1E-6
+                                        for idx in range(num_steps)]
+
+    def _score(self, step: int) -> float:
+        now = self.clock()
+        elapsed = now - self.updated[step]
+        if elapsed > 0:
+            self.scores[step] *= math.pow(0.5, elapsed / ACTIVITY_HALF_LIFE)
+            self.updated[step] = now
+        return self.scores[step] + QUIET_SCORE
+
+    def visit(self, step: int) -> None:
+        self.last_visit[step] = self.clock()
+
+    def record_activity(self, step: int, weight: float=1.0) -> None:
+        self._score(step)  # decay up to now first
+        self.scores[step] += weight
+
+    def carry_over(self, previous: StepSchedule) -> None:
+        if not isinstance(previous, ActivityWeightedSchedule):
+            return
+        for (step, center) in enumerate(self.steps):
+            if center in previous.steps:
+                old = previous.steps.index(center)
+                self.scores[step] = previous.scores[old]
+                self.updated[step] = previous.updated[old]
+                self.last_visit[step] = previous.last_visit[old]
+
+    def next_step(self, step: int) -> int:
+        if self.num_steps == 1:
+            return step
+        now = self.clock()
+        candidates = [idx for idx in range(self.num_steps) if idx != step]
+
+        if self._slack(step) <= REVISIT_SLACK:
+            return min(candidates, key=lambda idx: self.last_visit[idx])
+
+        return max(candidates,
+                   key=lambda idx: self._score(idx) * (now - self.last_visit[idx]))
+
+    def dwell(self, step: int) -> float:
+        scores = [self._score(idx) for idx in range(self.num_steps)]
+        average = sum(scores) / self.num_steps
+        factor = min(max(scores[step] / average, MIN_DWELL_FACTOR), MAX_DWELL_FACTOR)
+        return self.params.quiet_timeout * factor
+
+    def _slack(self, step: int) -> float:
+        '''
+        Seconds left on a step before the other steps can no longer all be
+        visited within max_revisit (earliest deadline first, each for the
+        shortest dwell)
+        '''
+        now = self.clock()
+        shortest = self.params.quiet_timeout * MIN_DWELL_FACTOR + REVISIT_SLACK
+        deadlines = sorted(self.params.max_revisit - (now - self.last_visit[idx])
+                           for idx in range(self.num_steps) if idx != step)
+        return min((deadline - order*shortest for (order, deadline) in enumerate(deadlines)),
+                   default=math.inf)
+
+    def limit(self, step: int, seconds: float) -> float:
+        slack = self._slack(step)
+        if slack <= 0:
+            # Other steps are late already, they wait for the shortest dwell
+            return min(seconds, self.params.quiet_timeout * MIN_DWELL_FACTOR)
+        return min(seconds, slack)
+
+class SurveySchedule(StepSchedule):
+    '''
+    Surveys every step for survey_dwell seconds, then visits only the steps
+    that had activity (in turn, for the quiet timeout) until the next survey
+    resurvey seconds later
+
+    During a survey the scanner keeps the demodulators off and every
+    spectrum goes into the occupancy map.  A step has activity if a channel
+    in it reached min_duty.  If no step had activity the next survey starts
+    right away.  The map is aged at the start of each survey.
+
+    Attributes:
+        occupancy (OccupancyMap): Occupancy of the whole scanned band
+        active_steps (list[int]): Steps visited between the surveys
+    '''
+    observes = True
+
+    def __init__(self, steps: list[int], params: FrequencyGroup,
+                 clock: typing.Callable[[], float]=time.monotonic) -> None:
+        super().__init__(steps, params, clock)
+        half = int(params.sample_rate * USABLE_BANDWIDTH / 2)
+        self.occupancy = OccupancyMap(min(steps) - half, max(steps) + half,
+                                      params.channel_spacing)
+        self.surveying = True
+        self.active_steps: list[int] = []
+        self.survey_start = self.clock()
+
+    def observe(self, center_freq: int, channels: list[int]) -> None:
+        self.occupancy.observe(center_freq, self.params.sample_rate, channels)
+
+    def carry_over(self, previous: StepSchedule) -> None:
+        if not isinstance(previous, SurveySchedule):
+            return
+        self.occupancy.carry_over(previous.occupancy)
+        self.surveying = previous.surveying
+        self.survey_start = previous.survey_start
+        if not self.surveying:
+            self.active_steps = [step for step in range(self.num_steps)
+                                 if self.step_duty(step) >= self.params.min_duty]
+            if not self.active_steps:
+                self._start_survey()
+
+    def step_duty(self, step: int) -> float:
+        '''
+        Highest duty cycle of the channels in view of a step (the usable
+        part of the band, as observed)
+        '''
+        half = self.params.sample_rate * USABLE_BANDWIDTH / 2
+        return self.occupancy.band_duty(self.steps[step] - half, self.steps[step] + half)
+
+    def _start_survey(self) -> int:
+        self.surveying = True
+        self.survey_start = self.clock()
+        self.occupancy.age()
+        return 0
+
+    def _end_survey(self) -> None:
+        self.active_steps = [step for step in range(self.num_steps)
+                             if self.step_duty(step) >= self.params.min_duty]
+        self.surveying = False
+        logging.debug(f'Survey done in {self.clock() - self.survey_start:.1f} s, '
+                      f'active steps: {self.active_steps}, '
+                      f'busiest: {self.occupancy.busiest()}')
+
+    def next_step(self, step: int) -> int:
+        if self.surveying:
+            if step < self.num_steps - 1:
+                return step + 1
+            self._end_survey()
+            if not self.active_steps:
+                return self._start_survey()
+            return self.active_steps[0]
+
+        if self.clock() - self.survey_start >= self.params.resurvey:
+            return self._start_survey()
+        later = [active for active in self.active_steps if active > step]
+        return later[0] if later else self.active_steps[0]
+
+    def dwell(self, step: int) -> float:
+        if self.surveying:
+            return self.params.survey_dwell
+        return self.params.quiet_timeout
+
+    def limit(self, step: int, seconds: float) -> float:
+        if self.surveying:
+            return min(seconds, self.params.survey_dwell)
+        return seconds
 
 class FrequencyProvider():
     '''
     Determines the current center frequency and provides it to the scanner
     '''
   
-    def __init__(self, params: FrequencyGroup) -> None:
+    def __init__(self, params: FrequencyGroup,
+                 clock: typing.Callable[[], float]=time.monotonic) -> None:
         logging.debug('Creating frequency provider')
 
         self.center_freq: int
@@ -62,8 +379,11 @@ class FrequencyProvider():
         self.step_task: asyncio.Task
 
         self.params = params
+        self.clock = clock
+        self.interest: list[int] = []
 
         self.steps = self._get_steps()
+        self.schedule = StepSchedule.get_schedule(self.steps, params, clock)
 
         if self.not_stepping():
             self.center_freq = self.steps[0]
@@ -74,9 +394,10 @@ class FrequencyProvider():
 
         self.step = 0
         self.center_freq = self.steps[self.step]  # start out in the first step
+        self.schedule.visit(self.step)
 
         # kick off the process
-        timeout = params.quiet_timeout
+        timeout = self.schedule.dwell(self.step)
         self.step_task = asyncio.create_task(
             self.step_if_no_activity(timeout)
         )
@@ -100,18 +421,16 @@ class FrequencyProvider():
         '''
         logging.debug(f'starting: {self.step=} {self.center_freq=}')
 
-        await asyncio.sleep(timeout)
+        await self.params.wait_settled()
+        await asyncio.sleep(self.schedule.limit(self.step, timeout))
 
-        # loop around if at the end of the steps
-        if self.step == len(self.steps) - 1:
-            self.step = 0
-        else:
-            self.step += 1
+        self.step = self.schedule.next_step(self.step)
+        self.schedule.visit(self.step)
 
         self.center_freq = self.steps[self.step]
         self.params.notify_scanner()
 
-        timeout = self.params.quiet_timeout
+        timeout = self.schedule.dwell(self.step)
         self.step_task = asyncio.create_task(self.step_if_no_activity(timeout))
 
     async def interesting_activity(self) -> None:
@@ -119,12 +438,16 @@ class FrequencyProvider():
         This routine is how the scanner will notify the provider that
         there is activity which will delay the advance to the next step.
 
-        Stay on this center frequency based on the active timeout
+        Stay on this center frequency based on the active timeout.  Not
+        during a survey: the demodulators are off then, and what they
+        report (e.g. the recordings closed when the survey started) must
+        not hold the survey step.
         '''
-        if self.not_stepping():
+        if self.not_stepping() or self.surveying:
             return
 
         logging.debug('Got something of note, setting the active timer')
+        self.schedule.record_activity(self.step)
 
         was_cancelled = self.step_task.cancel()
         try:
@@ -137,12 +460,95 @@ class FrequencyProvider():
 
         timeout = self.params.active_timeout
         self.step_task = asyncio.create_task(self.step_if_no_activity(timeout))
-        
 
-    def _get_steps(self) -> list[int]:
+    def plan_steps(self, interest: list[int]) -> bool:
+        '''
+        Place the steps of the ranges on the frequencies of interest in
+        them.  Ranges without any keep their regular steps, single
+        frequencies stay as they are.
+
+        Nothing changes unless the frequencies of interest do.  The schedule
+        keeps what it knew about the steps that are still there, and the
+        current step stays on (without a retune) unless it is gone, then
+        it starts over with the first step.
+
+        Args:
+            interest (list[int]): Frequencies of interest in Hz
+
+        Returns:
+            bool: The steps changed
+        '''
+        interest = sorted(set(interest))
+        if not self.params.ranges or interest == self.interest:
+            return False
+        self.interest = interest
+
+        steps = self._get_steps(interest)
+        if steps == self.steps:
+            return False
+        logging.debug(f'Planned {len(steps)} steps (was {len(self.steps)}): {steps}')
+
+        if not self.not_stepping():
+            self.step_task.cancel()
+        schedule = StepSchedule.get_schedule(steps, self.params, self.clock)
+        schedule.carry_over(self.schedule)
+        self.steps = steps
+        self.schedule = schedule
+
+        if self.center_freq in steps:
+            self.step = steps.index(self.center_freq)
+        else:
+            self.step = 0
+            self.center_freq = self.steps[self.step]
+            self.params.notify_scanner()
+            self.schedule.visit(self.step)
+
+        if not self.not_stepping():
+            # A step that stays on gets a new dwell from now
+            self.step_task = asyncio.create_task(
+                self.step_if_no_activity(self.schedule.dwell(self.step))
+            )
+        return True
+
+    @property
+    def surveying(self) -> bool:
+        '''
+        The scanner should only collect spectra (keep the demodulators off)
+        '''
+        return not self.not_stepping() and self.schedule.surveying
+
+    @property
+    def observes(self) -> bool:
+        '''
+        The schedule wants the channels detected in each spectrum (observe)
+        '''
+        return not self.not_stepping() and self.schedule.observes
+
+    def observe(self, center_freq: int, channels: list[int]) -> None:
+        '''
+        Channels detected in a spectrum of the current step
+
+        Args:
+            center_freq (int): Hardware RF center frequency in Hz
+            channels (list[int]): RF frequencies in Hz (no locked out ones)
+        '''
+        self.schedule.observe(center_freq, channels)
+
+    def transmission_started(self) -> None:
+        '''
+        The scanner saw a transmission start on the current step.  It only
+        counts towards the activity of the step, the dwell is unchanged.
+        '''
+        if self.not_stepping():
+            return
+        self.schedule.record_activity(self.step, DETECTION_WEIGHT)
+
+    def _get_steps(self, interest: list[int] | None=None) -> list[int]:
         '''
         Take the frequency singles/ranges and breaks them down into steps. Return a list
         of the center frequencies for each step.
+
+        Ranges with frequencies of interest (Hz) are covered by planned steps.
         '''
         # Treat single frequencies as centers
         centers = [single.freq for single in self.params.singles]
@@ -159,6 +565,14 @@ class FrequencyProvider():
 
             sample_rate = self.params.sample_rate
 
+            # Only cover what is of interest in the range
+            points = [freq for freq in interest or []
+                      if a_range.lower_freq <= freq <= a_range.upper_freq]
+            if points:
+                centers.extend(plan_centers(points, sample_rate,
+                                            dc_guard=self.params.channel_spacing))
+                continue
+
             # handle range less than sample rate
             if a_range.upper_freq - a_range.lower_freq <= sample_rate:
                 center = a_range.lower_freq + int((a_range.upper_freq - a_range.lower_freq) / 2)
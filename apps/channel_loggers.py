@@ -78,6 +78,7 @@ class ChannelLogger(ABC):
             await asyncio.sleep(self.timeout)
             await self.log(ChannelMessage(state='act',
                                     rf=msg.rf,
+                                    bb=msg.bb,
                                     channel=msg.channel))
 
 class NoOp(ChannelLogger):
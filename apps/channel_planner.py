@@ -0,0 +1,182 @@
+'''
+Decide which channels the scanner hands to which demodulators.
+
+Kept free of GNU Radio so the logic can be tested and benchmarked on its own.
+'''
+import heapq
+import math
+import time
+import numpy as np
+from numpy.typing import NDArray
+from frequency_manager import ChannelFrequency, ChannelList, FrequencyManager
+from utilities import baseband_to_frequency, baseband_to_hz
+
+# A demodulator tuned to 0 Hz baseband is not in use
+FREE = 0
+
+
+def priority_rank(priority: int | None) -> float:
+    '''
+    Sort key for a priority. 1 is the highest priority, no priority is lowest.
+    '''
+    return math.inf if priority is None else priority
+
+
+def build_channels(active_channels: NDArray, demod_freqs: list[int],
+                   center_freq: int, frequency_manager: FrequencyManager) -> ChannelList:
+    '''
+    Add metadata to the channels found in the spectrum for the scanner and GUI.
+
+    Demodulators that are tuned but not in the spectrum are waiting for the
+    hang time to end so they are added as hanging channels.  Membership tests
+    use sets and the list is ordered by one stable sort so priority channels
+    are up front (highest first) and the rest keep the detection order.
+
+    Args:
+        active_channels (NDArray): Baseband frequencies found in the spectrum
+        demod_freqs (list[int]): Baseband frequency of each demodulator
+        center_freq (int): Hardware RF center frequency in Hz
+        frequency_manager (FrequencyManager): Priorities, lockouts and labels
+
+    Returns:
+        ChannelList: Channels with metadata
+    '''
+    active = [int(channel) for channel in active_channels]
+    active_set = set(active)
+    demod_set = set(demod_freqs)
+    demod_set.discard(FREE)
+
+    # dict keeps the first occurrence order and removes duplicates
+    all_channels = dict.fromkeys(active)
+    all_channels.update(dict.fromkeys(freq for freq in demod_freqs if freq != FREE))
+
+    sweep: ChannelList = []
+    for channel in all_channels:
+        frequency = baseband_to_frequency(channel, center_freq)
+        in_demod = channel in demod_set
+        in_spectrum = channel in active_set
+        sweep.append(ChannelFrequency(bb=channel,
+                                      rf=frequency,
+                                      locked=frequency_manager.locked_out(channel),
+                                      active=in_demod and in_spectrum,
+                                      priority=frequency_manager.is_priority(channel),
+                                      hanging=in_demod and not in_spectrum,
+                                      label=frequency_manager.label_at(
+                                          baseband_to_hz(channel, center_freq))))
+
+    sweep.sort(key=lambda channel: priority_rank(channel.priority))
+
+    return sweep
+
+
+def plan_assignments(channels: ChannelList, demod_freqs: list[int],
+                     priority_enabled: bool) -> list[tuple[int, int]]:
+    '''
+    Match channels that need a demodulator to demodulators in one pass.
+
+    Channels that are locked out, hanging or already being demodulated are
+    skipped.  The rest are handled in priority order (stable for equal
+    priority).  Each channel takes the free demodulator with the lowest index.
+    When none are free, a priority channel preempts the busy demodulator with
+    the lowest priority (lowest index on a tie) if it is strictly lower than
+    the channel's priority.
+
+    Uses heaps so the cost is O((channels + demods) log n).
+
+    Args:
+        channels (ChannelList): Channels with priorities already looked up.  The
+            priorities of busy demodulators are taken from here as well.
+        demod_freqs (list[int]): Baseband frequency of each demodulator
+        priority_enabled (bool): Allow preemption of busy demodulators
+
+    Returns:
+        list[tuple[int, int]]: (demodulator index, baseband frequency) to tune
+    '''
+    busy = set(demod_freqs)
+    priorities = {channel.bb: channel.priority for channel in channels}
+
+    wanted = sorted((channel for channel in channels
+                     if not channel.hanging and not channel.locked
+                     and channel.bb not in busy),
+                    key=lambda channel: priority_rank(channel.priority))
+
+    free = [idx for idx, freq in enumerate(demod_freqs) if freq == FREE]
+    heapq.heapify(free)
+
+    # lowest priority (largest rank) on top, ties go to the lowest index
+    occupied = [(-priority_rank(priorities.get(freq)), idx)
+                for idx, freq in enumerate(demod_freqs) if freq != FREE]
+    heapq.heapify(occupied)
+
+    assignments: list[tuple[int, int]] = []
+    for channel in wanted:
+        rank = priority_rank(channel.priority)
+
+        if free:
+            idx = heapq.heappop(free)
+            heapq.heappush(occupied, (-rank, idx))
+        elif priority_enabled and occupied and -occupied[0][0] > rank:
+            _, idx = heapq.heappop(occupied)
+            heapq.heappush(occupied, (-rank, idx))
+        else:
+            # channels are in priority order so no later one can do better
+            break
+
+        assignments.append((idx, channel.bb))
+
+    return assignments
+
+
+def main() -> None:
+    """Benchmark the metadata and assignment stages
+
+    Simulates a wide band with up to 1000 simultaneous channels and prints the
+    time per scan cycle.  The time per channel should stay about constant.
+    """
+    from frequency_manager import FrequencyConfiguration
+    import asyncio
+
+    channel_spacing = 5000
+    center_freq = int(460E6)
+    num_demod = 32
+    cycles = 20
+
+    config = FrequencyConfiguration(disable_lockout=False, disable_priority=False)
+    frequency_manager = FrequencyManager(config, channel_spacing)
+
+    async def add_frequencies() -> None:
+        await frequency_manager.add({'lo': 455.0, 'hi': 456.0, 'label': 'range', 'priority': 3})
+        await frequency_manager.add({'lo': 462.0, 'hi': 463.0, 'locked': True})
+        for idx in range(20):
+            await frequency_manager.add({'single': 458.0 + idx/100, 'priority': 1 + idx % 3})
+    asyncio.run(add_frequencies())
+    frequency_manager.set_center(center_freq)
+
+    print(f'{"channels":>8} {"metadata (ms)":>14} {"assign (ms)":>12} {"us/channel":>11}')
+    for num_channels in (10, 100, 250, 500, 1000):
+        rng = np.random.default_rng(num_channels)
+        offsets = rng.choice(np.arange(-2000, 2000), num_channels, replace=False)
+        active_channels = offsets * channel_spacing
+        demod_freqs = [int(freq) for freq in active_channels[:num_demod // 2]]
+        demod_freqs += [FREE] * (num_demod - len(demod_freqs))
+
+        start = time.perf_counter()
+        for _ in range(cycles):
+            channels = build_channels(active_channels, demod_freqs, center_freq,
+                                      frequency_manager)
+        metadata = (time.perf_counter() - start) / cycles
+
+        start = time.perf_counter()
+        for _ in range(cycles):
+            plan_assignments(channels, demod_freqs, True)
+        assign = (time.perf_counter() - start) / cycles
+
+        per_channel = (metadata + assign) / num_channels * 1E6
+        print(f'{num_channels:>8} {metadata*1E3:>14.2f} {assign*1E3:>12.3f} {per_channel:>11.1f}')
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except KeyboardInterrupt:
+        pass
@@ -407,10 +407,10 @@ class LockoutWindow(object):
         has_activity = False
         for channel in self.locked_channels:
             if lockout.is_single:
-                if lockout.single == channel.rf:
+                if lockout.rf_single == channel.rf_hz:
                     has_activity = True
             else:
-                if lockout.lo <= channel.rf <= lockout.hi:
+                if lockout.rf_lo <= channel.rf_hz <= lockout.rf_hi:
                     has_activity = True
 
         return has_activity
@@ -496,6 +496,8 @@ class RxWindow(object):
         channel_log_file_name (string): Name of file for channel activity logging
         channel_log_timeout (int): Timeout delay between logging active state of channel in seconds
         log_mode (string): Log system mode (file, database type)
+        devices (list[str]): Status line per device when scanning with several
+            devices (the selected one is marked with *)
     """
     # pylint: disable=too-many-instance-attributes
 
@@ -518,6 +520,7 @@ class RxWindow(object):
         self.channel_log_target = ""
         self.gains = None
         self.classifier_params = None
+        self.devices: list[str] = []
 
         self.demod_map = {
             0: 'NBFM',
@@ -663,6 +666,15 @@ class RxWindow(object):
             self.channel_log_target_field = RxWindow.RxEntry(
                 "Log Target", 2, 'left', False)
 
+        # status lines when scanning with more than one device
+        self.device_fields: list[RxWindow.RxEntry] = []
+        if len(self.devices) > 1:
+            self.device_fields.append(RxWindow.RxEntry(
+                "Devices ('d')", 2, 'left', False))
+            for _ in self.devices:
+                self.device_fields.append(RxWindow.RxEntry(
+                    None, 2, 'left', False))
+
     def draw_rx(self) -> None:
         """Draws receiver parameters
         """
@@ -711,6 +723,11 @@ class RxWindow(object):
         if self.channel_log_target is not None:
             self.channel_log_target_field.set(self.channel_log_target)
 
+        if self.device_fields:
+            self.device_fields[0].set(f'{len(self.devices)}')
+            for field, status in zip(self.device_fields[1:], self.devices):
+                field.set(f'{status:<28}')
+
         # Hide cursor
         self.win.leaveok(1)
 
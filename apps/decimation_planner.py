@@ -0,0 +1,317 @@
+'''
+Choose the decimation cascade of a demodulator for any sample rate.
+
+A tuner filters one channel out of the hardware (or sub-band) rate, demodulates
+it and filters the audio down to the audio rate.  The planner tries every
+cascade of integer decimating FIR stages (up to max_stages for the channel and
+the audio) followed by the polyphase arbitrary resampler and keeps the one with
+the fewest multiply-accumulates per second.
+
+Stages before the last one of a cascade only need to stop the bands that
+would alias onto the channel, so they get wide transition bands and few taps.
+A decimate by 2 stage gets a half-band design (cutoff at a quarter of its
+input rate).  The last stage holds the sharp channel (or audio) filter.
+When the cascade lands exactly on the audio rate the resampler is left out.
+
+The cost model follows the GNU Radio designs: firdes.low_pass with a Hamming
+window uses 53*fs/(22*transition) taps, each output of a decimating FIR costs
+one MAC per tap (zero taps of half-band filters are not skipped by GNU Radio),
+a complex sample with real taps costs 2 and the frequency translating filter
+(complex taps) costs 4.
+
+Kept free of GNU Radio so it can be tested on its own.
+'''
+from dataclasses import dataclass, field
+from functools import lru_cache
+import logging
+from typing import Iterator
+
+# Attenuation used by GNU Radio to size windowed designs
+HAMMING_ATTENUATION = 53
+RESAMPLER_ATTENUATION = 100
+RESAMPLER_FILTERS = 32
+
+# Real MACs per tap and output sample
+XLATING = 'xlating'   # complex samples, complex (rotated) taps
+COMPLEX = 'complex'   # complex samples, real taps
+FLOAT = 'float'       # real samples, real taps
+MACS_PER_TAP = {XLATING: 4, COMPLEX: 2, FLOAT: 1}
+
+
+def estimate_taps(samp_rate: float, transition: float,
+                  attenuation: float = HAMMING_ATTENUATION) -> int:
+    '''
+    Number of taps GNU Radio designs for a windowed low pass filter
+    '''
+    ntaps = int(attenuation * samp_rate / (22.0 * transition))
+    return ntaps + 1 if ntaps % 2 == 0 else ntaps
+
+
+@dataclass(frozen=True, kw_only=True)
+class DemodProfile:
+    '''
+    Filter requirements of a demodulator type
+
+    channel_cutoff (float): Channel filter cutoff in Hz
+    channel_transition (float): Channel filter transition width in Hz
+    min_channel_rate (float): Lowest sample rate at the demodulator in sps
+    audio_cutoff (float): Audio filter cutoff in Hz
+    audio_transition (float): Audio filter transition width in Hz
+    '''
+    channel_cutoff: float
+    channel_transition: float
+    min_channel_rate: float
+    audio_cutoff: float = 3.5E3
+    audio_transition: float = 500
+
+
+NBFM_PROFILE = DemodProfile(channel_cutoff=12.5E3, channel_transition=1E3,
+                            min_channel_rate=40E3)
+AM_PROFILE = NBFM_PROFILE
+WBFM_PROFILE = DemodProfile(channel_cutoff=25E3, channel_transition=1E3,
+                            min_channel_rate=62.5E3)
+
+
+@dataclass(frozen=True)
+class FilterStage:
+    '''
+    One decimating low pass FIR filter
+
+    decim (int): Decimation
+    in_rate (float): Input sample rate in sps
+    cutoff (float): Cutoff frequency in Hz
+    transition (float): Transition width in Hz
+    kind (str): XLATING, COMPLEX or FLOAT
+    '''
+    decim: int
+    in_rate: float
+    cutoff: float
+    transition: float
+    kind: str
+
+    @property
+    def out_rate(self) -> float:
+        return self.in_rate / self.decim
+
+    @property
+    def ntaps(self) -> int:
+        return estimate_taps(self.in_rate, self.transition)
+
+    @property
+    def cost(self) -> float:
+        '''Real MACs per second'''
+        return self.ntaps * self.out_rate * MACS_PER_TAP[self.kind]
+
+
+@dataclass(frozen=True)
+class DecimationPlan:
+    '''
+    Filters of one demodulator from the input rate to the audio rate
+
+    in_rate (float): Tuner input sample rate in sps
+    audio_rate (float): Audio output rate in sps
+    channel_stages (tuple[FilterStage, ...]): Complex stages before the demod
+    audio_stages (tuple[FilterStage, ...]): Real stages after the demod
+    '''
+    in_rate: float
+    audio_rate: float
+    channel_stages: tuple[FilterStage, ...]
+    audio_stages: tuple[FilterStage, ...]
+    cost: float = field(init=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, 'cost', sum(stage.cost for stage in self.stages)
+                           + self.resampler_cost)
+
+    @property
+    def stages(self) -> tuple[FilterStage, ...]:
+        return self.channel_stages + self.audio_stages
+
+    @property
+    def channel_rate(self) -> float:
+        '''Sample rate at the demodulator'''
+        return self.channel_stages[-1].out_rate
+
+    @property
+    def resample_rate(self) -> float:
+        '''Rate of the final arbitrary resampler (output/input)'''
+        return self.audio_rate / self.audio_stages[-1].out_rate
+
+    @property
+    def needs_resampler(self) -> bool:
+        return abs(self.resample_rate - 1) > 1E-9
+
+    @property
+    def resampler_cost(self) -> float:
+        '''
+        MACs per second of pfb.arb_resampler_fff with its default design
+
+        Each output runs one filter of the bank and its derivative filter
+        '''
+        if not self.needs_resampler:
+            return 0
+        ntaps = estimate_taps(RESAMPLER_FILTERS, 0.2 * self.resample_rate,
+                              RESAMPLER_ATTENUATION)
+        return 2 * ntaps / RESAMPLER_FILTERS * self.audio_rate
+
+    def report(self) -> str:
+        '''Table of the stages and their estimated cost'''
+        lines = [f'Decimation plan {self.in_rate/1E3:.3f} ksps -> '
+                 f'{self.audio_rate/1E3:.3f} ksps '
+                 f'(channel {self.channel_rate/1E3:.3f} ksps)']
+        for stage in self.stages:
+            lines.append(f'  {stage.kind:<8} /{stage.decim:<3} '
+                         f'{stage.in_rate/1E3:>10.3f} -> {stage.out_rate/1E3:>9.3f} ksps '
+                         f'{stage.ntaps:>5} taps {stage.cost/1E6:>8.3f} MMAC/s')
+        if self.needs_resampler:
+            lines.append(f'  resample x{self.resample_rate:.5f}'
+                         f'{"":>29}{self.resampler_cost/1E6:>8.3f} MMAC/s')
+        lines.append(f'  total {self.cost/1E6:.3f} MMAC/s')
+        return '\n'.join(lines)
+
+
+def _factor_sequences(limit: int, depth: int) -> Iterator[tuple[int, ...]]:
+    '''
+    All ordered sequences of integers >= 2 with a product <= limit
+    '''
+    yield ()
+    if depth == 0:
+        return
+    for factor in range(2, limit + 1):
+        for rest in _factor_sequences(limit // factor, depth - 1):
+            yield (factor,) + rest
+
+
+def _cascade(factors: tuple[int, ...], in_rate: float, cutoff: float,
+             transition: float, first_kind: str, kind: str) -> tuple[FilterStage, ...] | None:
+    '''
+    Stages for the factors, the last one holding the sharp filter
+
+    A decimation of 1 (no factors) still needs the sharp filter.
+    Returns None if an early stage cannot protect the band.
+    '''
+    band_edge = cutoff + transition/2
+    stages: list[FilterStage] = []
+    rate = in_rate
+    for (idx, decim) in enumerate(factors or (1,)):
+        stage_kind = first_kind if idx == 0 else kind
+        if idx == len(factors) - 1 or not factors:
+            stages.append(FilterStage(decim, rate, cutoff, transition, stage_kind))
+        else:
+            # Stop only what aliases onto the band, e.g. a half-band for 2
+            out_rate = rate / decim
+            stop_width = out_rate - 2*band_edge
+            if stop_width <= 0:
+                return None
+            stages.append(FilterStage(decim, rate, out_rate/2, stop_width, stage_kind))
+        rate /= decim
+    return tuple(stages)
+
+
+def _rank(plan: DecimationPlan) -> tuple[float, int]:
+    # Fewer stages win a tie
+    return (plan.cost, len(plan.stages))
+
+
+@lru_cache(maxsize=None)
+def plan_decimation(in_rate: float, audio_rate: float, profile: DemodProfile,
+                    max_stages: int = 4) -> DecimationPlan:
+    '''
+    Cheapest cascade from the tuner input rate to the audio rate
+
+    Args:
+        in_rate (float): Tuner input sample rate in sps
+        audio_rate (float): Audio output rate in sps
+        profile (DemodProfile): Filter requirements of the demodulator
+        max_stages (int): Most decimating stages before and after the demod
+
+    Returns:
+        DecimationPlan: The chosen plan
+    '''
+    if in_rate < profile.min_channel_rate:
+        raise ValueError(f'Sample rate {in_rate} sps is below the channel '
+                         f'rate {profile.min_channel_rate} sps')
+
+    best_audio: dict[float, tuple[FilterStage, ...]] = {}
+
+    def audio_cascade(channel: tuple[FilterStage, ...]) -> tuple[FilterStage, ...]:
+        channel_rate = channel[-1].out_rate
+        if channel_rate not in best_audio:
+            limit = int(channel_rate // audio_rate)
+            options = []
+            for factors in _factor_sequences(limit, max_stages):
+                stages = _cascade(factors, channel_rate, profile.audio_cutoff,
+                                  profile.audio_transition, FLOAT, FLOAT)
+                if stages is not None:
+                    options.append(DecimationPlan(in_rate, audio_rate, channel, stages))
+            best_audio[channel_rate] = min(options, key=_rank).audio_stages
+        return best_audio[channel_rate]
+
+    channels = []
+    limit = int(in_rate // profile.min_channel_rate)
+    for factors in _factor_sequences(limit, max_stages):
+        channel = _cascade(factors, in_rate, profile.channel_cutoff,
+                           profile.channel_transition, XLATING, COMPLEX)
+        if channel is not None:
+            channels.append((sum(stage.cost for stage in channel), channel))
+
+    # Audio cascades are only planned while the channel part alone is cheaper
+    # than the best plan so far
+    channels.sort(key=lambda item: (item[0], len(item[1])))
+    best: DecimationPlan | None = None
+    for (channel_cost, channel) in channels:
+        if best is not None and channel_cost >= best.cost:
+            break
+        plan = DecimationPlan(in_rate, audio_rate, channel,
+                              audio_cascade(channel))
+        if best is None or _rank(plan) < _rank(best):
+            best = plan
+
+    assert best is not None  # decimation by 1 is always possible
+    logging.info(best.report())
+    return best
+
+
+def legacy_plan(in_rate: float, audio_rate: float, profile: DemodProfile,
+                first_decim: int) -> DecimationPlan:
+    '''
+    Plan the demodulators used before the planner (for comparison)
+
+    Two stages of first_decim with a 0.09*fs cutoff, int(in_rate/1E6), then
+    first_decim again for the audio
+    '''
+    decims = (first_decim, max(1, int(in_rate/1E6)))
+    rate = in_rate
+    channel = []
+    for decim in (decims[0], decims[0]):
+        channel.append(FilterStage(decim, rate, 0.090*rate, 0.010*rate,
+                                   COMPLEX if channel else XLATING))
+        rate /= decim
+    channel.append(FilterStage(decims[1], rate, profile.channel_cutoff,
+                               profile.channel_transition, COMPLEX))
+    rate /= decims[1]
+    audio = (FilterStage(decims[0], rate, profile.audio_cutoff,
+                         profile.audio_transition, FLOAT),)
+    return DecimationPlan(in_rate, audio_rate, tuple(channel), audio)
+
+
+def main() -> None:
+    """Print plans for common sample rates
+
+    Compares the cost with the fixed cascade the demodulators used before
+    """
+    audio_rate = 8000
+    profiles = (('NBFM/AM', NBFM_PROFILE, 5), ('WBFM', WBFM_PROFILE, 4))
+    for (name, profile, first_decim) in profiles:
+        for in_rate in (1E6, 1.024E6, 1.333333E6, 2E6, 2.4E6, 3.2E6, 4E6, 8E6, 10E6):
+            plan = plan_decimation(in_rate, audio_rate, profile)
+            legacy = legacy_plan(in_rate, audio_rate, profile, first_decim)
+            print(f'{name}: {plan.report()}')
+            print(f'  (fixed cascade {legacy.cost/1E6:.3f} MMAC/s)\n')
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,380 @@
+'''
+Demodulator pools in worker processes.
+
+A single flowgraph runs every block of every demodulator in one process and
+the scanner, loggers and classifier share its GIL.  With --demod_workers the
+demodulators are split across worker processes instead:
+
+- The receiver publishes the hardware IQ stream once over ZeroMQ (ipc)
+- Each worker subscribes to it and runs a DemodPool of its demodulators
+- Each worker publishes its summed audio, the receiver adds them for playback
+- The scanner tunes the demodulators through RemoteDemodulator proxies that
+  send the commands over a pipe, the workers send back the channel messages
+
+Recording and classification happen in the workers.  ZeroMQ drops IQ
+when a worker falls behind instead of stalling the receiver.
+
+The workers start in parallel and the receiver waits for them without
+blocking the event loop.  The flowgraph of a worker is in worker_flow.py,
+so this module does not import GNU Radio and the protocol can be tested
+on its own.
+'''
+import asyncio
+from dataclasses import dataclass, field
+import logging
+from multiprocessing.connection import Connection
+import multiprocessing
+import os
+import tempfile
+import time
+from typing import Callable, Any, TYPE_CHECKING
+
+from recording_store import StoreParams
+from tmp_recordings import TmpAreaParams
+from frequency_manager import ChannelMessage
+
+if TYPE_CHECKING:
+    # classification needs tensorflow, only the worker flowgraph uses it
+    from classification import ClassifierParams
+
+# Seconds to wait for a worker to build its flowgraph or to stop
+START_TIMEOUT = 60
+STOP_TIMEOUT = 10
+
+_address_count = 0
+
+
+def ipc_address(name: str) -> str:
+    '''
+    Unique ZeroMQ ipc address for this process
+    '''
+    global _address_count
+    _address_count += 1
+    path = os.path.join(tempfile.gettempdir(),
+                        f'ham2mon-{os.getpid()}-{_address_count}-{name}')
+    return f'ipc://{path}'
+
+
+def split_demodulators(num_demod: int, num_workers: int) -> list[int]:
+    '''
+    Number of demodulators for each worker (no empty workers)
+    '''
+    num_workers = max(1, min(num_workers, num_demod))
+    (share, extra) = divmod(num_demod, num_workers)
+    return [share + (1 if idx < extra else 0) for idx in range(num_workers)]
+
+
+@dataclass(kw_only=True)
+class WorkerParams:
+    '''
+    Everything a worker needs to build its demodulator pool
+
+    iq_address (str): ZeroMQ address of the IQ stream
+    audio_address (str): ZeroMQ address for the audio of the worker
+    samp_rate (float): IQ sample rate in sps
+    audio_rate (int): Audio sample rate in sps
+    num_demod (int): Number of demodulators in the worker
+    first_channel (int): Channel number of the first demodulator
+    log_file (str | None): Log file of the main process (debug logging)
+    The others are as for the Receiver
+    '''
+    iq_address: str
+    audio_address: str
+    samp_rate: float
+    audio_rate: int
+    num_demod: int
+    type_demod: int
+    first_channel: int
+    record: bool
+    play: bool
+    audio_bps: int
+    min_recording: float
+    classifier_params: 'ClassifierParams'
+    shared_frontend: bool = False
+    baseband_ring: str | None = None
+    record_format: str = 'wav'
+    record_store: StoreParams | None = None
+    tmp_area: TmpAreaParams = field(default_factory=TmpAreaParams)
+    log_file: str | None = None
+
+    def __post_init__(self):
+        if self.num_demod < 1:
+            raise ValueError(f'Worker needs at least one demodulator: {self.num_demod}')
+
+
+async def handle_command(demodulators: list, command: tuple) -> bool:
+    '''
+    Carry out a command of the receiver on the demodulators of a worker
+
+    Commands are tuples sent over the pipe:
+    ('tune', idx, center_freq, rf_center_freq), ('squelch', idx, squelch_db),
+    ('volume', idx, volume_db) and ('stop',)
+
+    Returns:
+        bool: False if the worker should stop
+
+    Raises:
+        ValueError: Unknown command
+    '''
+    if command[0] == 'tune':
+        (_, idx, center_freq, rf_center_freq) = command
+        await demodulators[idx].set_center_freq(center_freq, rf_center_freq)
+    elif command[0] == 'squelch':
+        (_, idx, squelch_db) = command
+        demodulators[idx].set_squelch(squelch_db)
+    elif command[0] == 'volume':
+        (_, idx, volume_db) = command
+        demodulators[idx].set_volume(volume_db)
+    elif command[0] == 'stop':
+        return False
+    else:
+        raise ValueError(f'Unknown command: {command}')
+    return True
+
+
+async def _serve(params: WorkerParams, conn: Connection, make_flow: Callable) -> None:
+    '''
+    Run the flowgraph and carry out the commands of the receiver in order
+
+    Args:
+        params (WorkerParams): Parameters of the worker
+        conn (Connection): Pipe to the receiver
+        make_flow (Callable): Builds the flowgraph from the params and the
+            channel message callback (WorkerFlow)
+    '''
+    async def notify_scanner(msg: ChannelMessage | None) -> None:
+        if msg is not None:
+            conn.send(('msg', msg))
+
+    flow = make_flow(params, notify_scanner)
+    demodulators = flow.pool.demodulators
+    flow.start()
+
+    commands: asyncio.Queue = asyncio.Queue()
+    loop = asyncio.get_running_loop()
+
+    def receive() -> None:
+        try:
+            commands.put_nowait(conn.recv())
+        except EOFError:
+            # Receiver went away without stopping us
+            loop.remove_reader(conn.fileno())
+            commands.put_nowait(('stop',))
+
+    loop.add_reader(conn.fileno(), receive)
+    conn.send(('ready', os.getpid()))
+
+    while True:
+        command = await commands.get()
+        try:
+            if not await handle_command(demodulators, command):
+                break
+        except Exception as error:
+            logging.exception(f'Worker command {command} failed')
+            conn.send(('error', f'{command[0]}: {error}'))
+
+    loop.remove_reader(conn.fileno())
+    flow.pool.close_rings()
+    flow.stop()
+    flow.wait()
+    flow.pool.finish_recordings()
+    conn.send(('stopped',))
+
+
+def run_worker(params: WorkerParams, conn: Connection,
+               make_flow: Callable | None=None) -> None:
+    '''
+    Entry point of a worker process
+
+    make_flow defaults to worker_flow.WorkerFlow
+    '''
+    if params.log_file is not None:
+        logging.basicConfig(filename=params.log_file, level=logging.DEBUG,
+                            format=f'%(asctime)s worker {os.getpid()} %(message)s')
+    try:
+        if make_flow is None:
+            # GNU Radio is only imported in the worker processes
+            from worker_flow import WorkerFlow
+            make_flow = WorkerFlow
+        asyncio.run(_serve(params, conn, make_flow))
+    except Exception as error:
+        logging.exception('Worker failed')
+        try:
+            conn.send(('error', str(error)))
+        except (BrokenPipeError, OSError):
+            pass
+
+
+class RemoteDemodulator:
+    '''
+    Stand-in for a demodulator running in a worker process
+
+    Keeps the state the scanner reads (center_freq, last_heard, time_stamp)
+    and sends the changes to the worker
+
+    Args:
+        worker (DemodWorker): Worker running the demodulator
+        idx (int): Index of the demodulator in the worker
+        channel (int): Channel number of the demodulator
+        record (bool): The demodulator records
+    '''
+
+    def __init__(self, worker: 'DemodWorker', idx: int, channel: int,
+                 record: bool) -> None:
+        self.worker = worker
+        self.idx = idx
+        self.channel = channel
+        self.record = record
+        self.center_freq: int = 0
+        self.last_heard: float = 0.0
+        self.time_stamp: float = 0.0
+
+    def set_last_heard(self, a_time: float) -> None:
+        self.last_heard = a_time
+
+    async def set_center_freq(self, center_freq: int, rf_center_freq: int) -> None:
+        """Tunes the demodulator in the worker
+
+        The worker reports the end and start of the transmissions
+
+        Args:
+            center_freq (int): Baseband center frequency in Hz
+            rf_center_freq (int): RF center in Hz (for file name)
+        """
+        self.center_freq = center_freq
+        if center_freq != 0 and self.record:
+            self.time_stamp = time.time()
+        self.worker.send(('tune', self.idx, center_freq, rf_center_freq))
+
+    def set_squelch(self, squelch_db: int) -> None:
+        self.worker.send(('squelch', self.idx, squelch_db))
+
+    def set_volume(self, volume_db: int) -> None:
+        self.worker.send(('volume', self.idx, volume_db))
+
+
+class DemodWorker:
+    '''
+    One worker process seen from the receiver
+
+    Forwards the channel messages of the worker to the scanner.  The
+    process starts right away, await ready() before relying on it.
+
+    Args:
+        params (WorkerParams): Parameters of the worker
+        notify_scanner (Callable): Called with the channel messages
+        target (Callable): Entry point of the process (run_worker)
+    '''
+
+    def __init__(self, params: WorkerParams, notify_scanner: Callable,
+                 target: Callable=run_worker) -> None:
+        self.params = params
+        self.notify_scanner = notify_scanner
+        self.tasks: set[asyncio.Task] = set()
+        self.stopped = asyncio.Event()
+        self.loop = asyncio.get_running_loop()
+        self.started: asyncio.Future = self.loop.create_future()
+
+        context = multiprocessing.get_context('spawn')
+        (self.conn, child_conn) = context.Pipe()
+        self.process = context.Process(target=target,
+                                       args=(params, child_conn),
+                                       name=f'ham2mon-demod-{params.first_channel}',
+                                       daemon=True)
+        self.process.start()
+        child_conn.close()
+
+        self.demodulators = [RemoteDemodulator(self, idx, params.first_channel + idx,
+                                               params.record)
+                             for idx in range(params.num_demod)]
+
+        self.loop.add_reader(self.conn.fileno(), self._receive)
+
+    async def ready(self, timeout: float=START_TIMEOUT) -> None:
+        """Wait until the worker runs its flowgraph
+
+        Raises:
+            Exception: The worker failed or did not start in time
+        """
+        try:
+            await asyncio.wait_for(asyncio.shield(self.started), timeout)
+        except asyncio.TimeoutError:
+            self.started.cancel()  # later failures are only logged
+            raise Exception(f'Demodulator worker {self.process.pid} did not start')
+
+    def _failed(self, reason: str) -> None:
+        if not self.started.done():
+            self.started.set_exception(
+                Exception(f'Demodulator worker {self.process.pid} failed: {reason}'))
+        else:
+            logging.error(f'Demodulator worker {self.process.pid}: {reason}')
+
+    def send(self, command: tuple) -> None:
+        try:
+            self.conn.send(command)
+        except (BrokenPipeError, OSError) as error:
+            logging.error(f'Demodulator worker {self.process.pid} is gone ({error})')
+
+    def _receive(self) -> None:
+        try:
+            reply: tuple[Any, ...] = self.conn.recv()
+        except EOFError:
+            if not self.stopped.is_set():
+                self._failed('exited')
+            self.loop.remove_reader(self.conn.fileno())
+            self.stopped.set()
+            return
+
+        if reply[0] == 'ready':
+            if not self.started.done():
+                self.started.set_result(reply[1])
+        elif reply[0] == 'msg':
+            task = self.loop.create_task(self.notify_scanner(reply[1]))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+        elif reply[0] == 'error':
+            self._failed(reply[1])
+        elif reply[0] == 'stopped':
+            self.stopped.set()
+
+    async def stop(self) -> None:
+        """Stop the worker after its pending commands
+
+        Messages sent while stopping still reach the scanner
+        """
+        self.send(('stop',))
+        try:
+            await asyncio.wait_for(self.stopped.wait(), STOP_TIMEOUT)
+        except asyncio.TimeoutError:
+            logging.error(f'Demodulator worker {self.process.pid} did not stop')
+        self.loop.remove_reader(self.conn.fileno())
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.process.join(STOP_TIMEOUT)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.conn.close()
+
+
+def log_file() -> str | None:
+    '''
+    File of the root logger so the workers log to the same place
+    '''
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, logging.FileHandler):
+            return handler.baseFilename
+    return None
+
+
+def main() -> None:
+    """Show how demodulators are split across workers"""
+    for (num_demod, num_workers) in ((4, 2), (10, 4), (32, 8), (3, 8)):
+        print(f'{num_demod} demodulators in {num_workers} workers: '
+              f'{split_demodulators(num_demod, num_workers)}')
+    print(f'IQ address: {ipc_address("iq")}')
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except KeyboardInterrupt:
+        pass
@@ -3,6 +3,10 @@
 """
 
 from gnuradio import gr  # type: ignore
+from gnuradio import blocks
+from gnuradio import filter as grfilter # Don't redefine Python's filter()
+from gnuradio.fft import window  # type: ignore
+from gnuradio.filter import pfb  # type: ignore
 from asyncio import Task
 import time
 import numpy as np
@@ -13,6 +17,12 @@ from typing import Callable
 from frequency_manager import ChannelMessage
 from utilities import baseband_to_frequency
 from classification import Classifier
+from demodulators.SharedFrontEnd import FrontEndPort
+from decimation_planner import DecimationPlan, XLATING
+from embedded_blocks import IQRingSink
+from recording_formats import RecordingEncoder, wav_subformat
+from tmp_recordings import TmpArea
+import filter_taps
 
 class BaseTuner(gr.hier_block2):
     """Some base methods that are the same between the known tuner types.
@@ -22,7 +32,8 @@ class BaseTuner(gr.hier_block2):
 
     channel: int = 0  # incremented for each new demodulator
 
-    def __init__(self, classify: Classifier | None, notify_scanner: Callable) -> None:
+    def __init__(self, classify: Classifier | None, notify_scanner: Callable,
+                 baseband_ring: str | None=None) -> None:
         BaseTuner.channel += 1
 
         # Default values
@@ -33,6 +44,91 @@ class BaseTuner(gr.hier_block2):
         self.file_name: str | None = None
         self.log_task: Task | None = None
         self.center_freq: int
+        self.frontend_port: FrontEndPort | None = None  # set if sharing a front end
+        self.baseband_ring = baseband_ring  # name prefix of the baseband ring
+        self.ring_sink: IQRingSink | None = None
+        self.encoder: RecordingEncoder | None = None  # set to encode recordings
+        self.tmp_area = TmpArea()  # replaced by the pool's (RAM backed) area
+
+    def _channel_filters(self, plan: DecimationPlan) -> list:
+        """Creates the decimating filters ahead of the demod
+
+        The first filter is the frequency translating filter that tunes
+        the channel, the last one limits the channel bandwidth
+
+        Args:
+            plan (DecimationPlan): Decimation cascade for the sample rate
+
+        Returns:
+            list: Filters in flow order
+        """
+        filters = []
+        for stage in plan.channel_stages:
+            taps = filter_taps.low_pass(1, stage.in_rate, stage.cutoff,
+                                        stage.transition, window.WIN_HAMMING)
+            if stage.kind == XLATING:
+                self.freq_xlating_fir_filter_ccc = \
+                    grfilter.freq_xlating_fir_filter_ccc(stage.decim, taps,
+                                                         self.center_freq,
+                                                         stage.in_rate)
+                filters.append(self.freq_xlating_fir_filter_ccc)
+            else:
+                # Real taps so complex samples take half the work of ccc
+                filters.append(grfilter.fir_filter_ccf(stage.decim, taps))
+        return filters
+
+    def _audio_filters(self, plan: DecimationPlan) -> list:
+        """Creates the decimating audio filters and the final resampler
+
+        The polyphase resampler takes the audio to the constant audio rate
+        It is left out when the filters already land on the audio rate
+
+        Args:
+            plan (DecimationPlan): Decimation cascade for the sample rate
+
+        Returns:
+            list: Filters in flow order
+        """
+        filters = []
+        for stage in plan.audio_stages:
+            taps = filter_taps.low_pass(1, stage.in_rate, stage.cutoff,
+                                        stage.transition, window.WIN_HAMMING)
+            filters.append(grfilter.fir_filter_fff(stage.decim, taps))
+
+        if plan.needs_resampler:
+            pfb_taps = filter_taps.arb_resampler_taps(plan.resample_rate, flt_size=32)
+            filters.append(pfb.arb_resampler_fff(plan.resample_rate, taps=pfb_taps,
+                                                 flt_size=32))
+        return filters
+
+    def _wavfile_sink(self, audio_rate: int):
+        """Creates the recording sink with the bit depth of audio_bps
+
+        Args:
+            audio_rate (int): Audio sample rate in sps
+        """
+        subformat = getattr(blocks, wav_subformat(self.audio_bps))
+        return blocks.wavfile_sink('/dev/null', 1, audio_rate,
+                                   blocks.FORMAT_WAV, subformat, False)
+
+    def _publish_baseband(self, source, channel_rate: float) -> None:
+        """Copies the channel baseband into a shared-memory ring if wanted
+
+        The ring is named after the prefix and the channel number
+        (e.g. ham2mon-bb-3) and can be read by other processes
+
+        Args:
+            source: Block with the filtered channel at its output
+            channel_rate (float): Sample rate of the channel in sps
+        """
+        if self.baseband_ring is None:
+            return
+        self.ring_sink = IQRingSink(f'{self.baseband_ring}-{self.channel}', channel_rate)
+        self.connect(source, self.ring_sink)
+
+    def close_ring(self) -> None:
+        if self.ring_sink is not None:
+            self.ring_sink.close()
 
     def set_last_heard(self, a_time: float) -> None:
         self.last_heard = a_time
@@ -71,8 +167,15 @@ class BaseTuner(gr.hier_block2):
         await self.notify_scanner(results)  # off events or nothing to note
 
         # Set the frequency of the tuner
+        # With a shared front end only the offset within the sub-band is tuned
         self.center_freq = center_freq
-        self.freq_xlating_fir_filter_ccc.set_center_freq(self.center_freq)
+        if self.frontend_port is None:
+            offset = self.center_freq
+        else:
+            offset = self.frontend_port.tune(self.center_freq)
+        self.freq_xlating_fir_filter_ccc.set_center_freq(offset)
+        if self.ring_sink is not None:
+            self.ring_sink.set_center_freq(rf_center_freq + self.center_freq)
 
         # Set the file name if recording
         if self.center_freq == 0 or not self.record:
@@ -98,7 +201,7 @@ class BaseTuner(gr.hier_block2):
         file_freq = (rf_center_freq + self.center_freq)/1E6  # TODO: use utilities function
         file_freq = np.round(file_freq, 4)
         # avoid "chatter" of possibly unwanted files by working in tmp dir initially
-        self.file_name = f'wav/tmp/{file_freq:.4f}_{tstamp}.wav'
+        self.file_name = self.tmp_area.path(f'{file_freq:.4f}_{tstamp}.wav')
 
     def _persist_wavfile(self, rf_center_freq: int) -> ChannelMessage | None:
         """Save the current wavfile if duration long enough"""
@@ -125,9 +228,7 @@ class BaseTuner(gr.hier_block2):
 
         # If not classifying then move from tmp directory
         if not self.classify:
-            name = self.file_name.replace('tmp/', '')
-            os.rename(self.file_name, name)
-            xmit_msg.file = name
+            xmit_msg.file = self._accept(None, xmit_msg)
             return xmit_msg
 
         # If user wants file of this classification
@@ -136,20 +237,40 @@ class BaseTuner(gr.hier_block2):
         (is_wanted, classification) = self.classify.is_wanted(self.file_name)
         xmit_msg.classification = classification
         if  is_wanted:
-            name = self.file_name.replace('tmp/', '')
+            name = os.path.basename(self.file_name)
             name = name.replace('.wav', '_' + classification + '.wav')
-            os.rename(self.file_name, name)
-            
-            # if using recent python3 have self.file_name be a Path
-            # new_name = PurePath(self.file_name)
-            # name = f'wav/{new_name.stem}_{is_wanted}{new_name.suffix}'
-            xmit_msg.file = name
+            xmit_msg.file = self._accept(name, xmit_msg)
             return xmit_msg
         else:
             os.unlink(self.file_name)
             xmit_msg.detail = 'Discarded unwanted classification'
             return  xmit_msg
     
+    def _accept(self, name: str | None, xmit_msg: ChannelMessage) -> str:
+        """Hand on the accepted recording in the temporary area
+
+        With a recording store it is appended to the store straight from
+        the temporary area (RAM or disk), otherwise it is moved to the wav
+        directory and queued for encoding
+
+        Args:
+            name (str | None): Final file name (default the temporary one)
+
+        Returns the final name (or store reference)
+        """
+        info = {'rf': xmit_msg.rf,
+                'start': self.time_stamp,
+                'classification': xmit_msg.classification,
+                'channel': self.channel}
+        if self.encoder is not None and self.encoder.store is not None:
+            return self.encoder.submit(self.file_name, info, name=name,
+                                       keep_dir=self.tmp_area.wav_dir)
+
+        path = self.tmp_area.accept(self.file_name, name)
+        if self.encoder is None:
+            return path
+        return self.encoder.submit(path, info)
+
     def set_squelch(self, squelch_db: int) -> None:
         """Sets the threshold for both squelches
 
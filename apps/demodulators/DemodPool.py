@@ -0,0 +1,174 @@
+"""
+@author: john
+"""
+
+from gnuradio import gr  # type: ignore
+from gnuradio import blocks
+import logging
+from typing import Callable
+
+from demodulators.BaseTuner import BaseTuner
+from demodulators.NBFM import TunerDemodNBFM
+from demodulators.AM import TunerDemodAM
+from demodulators.WBFM import TunerDemodWBFM
+from demodulators.SharedFrontEnd import SharedFrontEnd, FrontEndPort
+from decimation_planner import NBFM_PROFILE, AM_PROFILE, WBFM_PROFILE
+from classification import Classifier
+from audio_streaming import AudioStreamServer
+from embedded_blocks import AudioTap
+from recording_formats import RecordingEncoder
+from recording_store import RecordingStore, StoreParams
+from tmp_recordings import TmpArea, TmpAreaParams
+
+
+def create_demodulator(type_demod: int, samp_rate: float, audio_rate: int,
+                       record: bool, audio_bps: int, min_recording: float,
+                       classifier: Classifier | None,
+                       notify_scanner: Callable,
+                       baseband_ring: str | None=None) -> BaseTuner:
+    """Create one tuner/demodulator of the requested type
+
+    Args:
+        type_demod (int): Type of demodulator (0=NBFM, 1=AM, 2=WBFM)
+        samp_rate (float): Input baseband sample rate in sps
+        See the tuner classes for the others
+    """
+    if type_demod == 0:
+        return TunerDemodNBFM(samp_rate, audio_rate, record, audio_bps,
+                              min_recording, classifier, notify_scanner,
+                              baseband_ring=baseband_ring)
+    elif type_demod == 1:
+        return TunerDemodAM(samp_rate, audio_rate, record, audio_bps,
+                            min_recording, classifier, notify_scanner,
+                            baseband_ring=baseband_ring)
+    elif type_demod == 2:
+        return TunerDemodWBFM(samp_rate, audio_rate, record, audio_bps,
+                              min_recording, classifier, notify_scanner,
+                              baseband_ring=baseband_ring)
+
+    raise Exception(f'Invalid demodulator type: {type_demod}')
+
+
+# Filter requirements by demodulator type (sizes the shared front end)
+DEMOD_PROFILES = {0: NBFM_PROFILE, 1: AM_PROFILE, 2: WBFM_PROFILE}
+
+
+class DemodPool(gr.hier_block2):
+    """Parallel tuner/demodulators fed by one baseband stream
+
+    Used by the receiver and by the demodulator worker processes
+    The tuners take the whole stream or, with a shared front end, the
+    sub-band nearest their channel
+    If playing, the audio of all demodulators is summed to the output
+    With a streaming server each demodulator (by channel number) and the
+    sum are also streams of the server
+
+    Args:
+        samp_rate (float): Input baseband sample rate in sps (1E6 minimum)
+        num_demod (int): Number of parallel demodulators
+        type_demod (int): Type of demodulator (0=NBFM, 1=AM, 2=WBFM)
+        audio_rate (int): Output audio sample rate in sps
+        record (bool): Record audio to file if True
+        play (bool): Provide the summed audio output if True
+        audio_bps (int): Audio bit depth in bps (bits/samples)
+        min_recording (float): Minimum length of a recording in seconds
+        classifier (Classifier | None): Audio classifier
+        notify_scanner (Callable): Called with the channel messages
+        shared_frontend (bool): Tuners share a coarse sub-band decimation stage
+        baseband_ring (str | None): Name prefix of shared-memory rings for the
+            channel baseband of each tuner (None = no rings)
+        stream_server (AudioStreamServer | None): Server for the audio streams
+        mix_stream (str): Stream name of the summed audio
+        record_format (str): Format of the accepted recordings (wav, flac, opus)
+        record_store (StoreParams | None): Append the accepted recordings to
+            this recording store instead of keeping them as files
+        tmp_area (TmpAreaParams): Where the recordings are made before they
+            are accepted or discarded
+
+    Attributes:
+        demodulators (list[BaseTuner]): The tuner/demodulators
+        tuner_rate (float): Sample rate at the tuner inputs in sps
+    """
+    # pylint: disable=too-many-arguments
+
+    def __init__(self, samp_rate: float, num_demod: int, type_demod: int,
+                 audio_rate: int, record: bool, play: bool, audio_bps: int,
+                 min_recording: float, classifier: Classifier | None,
+                 notify_scanner: Callable, shared_frontend: bool=False,
+                 baseband_ring: str | None=None,
+                 stream_server: AudioStreamServer | None=None,
+                 mix_stream: str='mix', record_format: str='wav',
+                 record_store: StoreParams | None=None,
+                 tmp_area: TmpAreaParams=TmpAreaParams()):
+
+        output = gr.io_signature(1, 1, gr.sizeof_float) if play else gr.io_signature(0, 0, 0)
+        gr.hier_block2.__init__(self, "DemodPool",
+                                gr.io_signature(1, 1, gr.sizeof_gr_complex),
+                                output)
+
+        # Optionally split the band into sub-bands once for all tuners
+        # Tuners then run at the sub-band rate
+        self.tuner_rate = samp_rate
+        front_end: SharedFrontEnd | None = None
+        if shared_frontend:
+            front_end = SharedFrontEnd(samp_rate, DEMOD_PROFILES[type_demod])
+            self.tuner_rate = front_end.output_rate
+            self.connect(self, front_end)
+            logging.debug(f'Shared front end: {front_end.num_subbands} sub-bands at {self.tuner_rate} sps')
+
+        # Create N parallel demodulators as a list of objects
+        self.demodulators: list[BaseTuner] = []
+        for _ in range(num_demod):
+            self.demodulators.append(create_demodulator(type_demod, self.tuner_rate,
+                                                        audio_rate, record,
+                                                        audio_bps, min_recording,
+                                                        classifier, notify_scanner,
+                                                        baseband_ring))
+
+        # Accepted recordings are encoded and/or stored in the background
+        store = None
+        if record_store is not None:
+            store = RecordingStore.from_params(record_store)
+        self.encoder = RecordingEncoder(record_format, store)
+        self.tmp_area = TmpArea(tmp_area)
+        for demodulator in self.demodulators:
+            demodulator.encoder = self.encoder
+            demodulator.tmp_area = self.tmp_area
+
+        # Each demodulator gets the input stream or a sub-band selector
+        tuner_sources = []
+        for demodulator in self.demodulators:
+            if front_end is None:
+                tuner_sources.append(self)
+                continue
+            port = FrontEndPort(front_end)
+            for subband in range(front_end.num_subbands):
+                self.connect((front_end, subband), (port.selector, subband))
+            demodulator.frontend_port = port
+            tuner_sources.append(port.selector)
+
+        if play or stream_server is not None:
+            # Sum the demodulators to the output and/or the mix stream
+            add_ff = blocks.add_ff(1)
+            for idx, demodulator in enumerate(self.demodulators):
+                self.connect(tuner_sources[idx], demodulator, (add_ff, idx))
+            if play:
+                self.connect(add_ff, self)
+        else:
+            # Just connect each demodulator to the input
+            for idx, demodulator in enumerate(self.demodulators):
+                self.connect(tuner_sources[idx], demodulator)
+
+        if stream_server is not None:
+            for demodulator in self.demodulators:
+                self.connect(demodulator, AudioTap(stream_server, str(demodulator.channel)))
+            self.connect(add_ff, AudioTap(stream_server, mix_stream))
+
+    def finish_recordings(self) -> None:
+        """Wait for the recordings being encoded"""
+        self.encoder.shutdown()
+
+    def close_rings(self) -> None:
+        """Remove the baseband rings of the tuners"""
+        for demodulator in self.demodulators:
+            demodulator.close_ring()
@@ -0,0 +1,92 @@
+"""
+@author: john
+"""
+
+from gnuradio import gr  # type: ignore
+from gnuradio.fft import window  # type: ignore
+from gnuradio.filter import pfb  # type: ignore
+from gnuradio import blocks
+import filter_taps
+from decimation_planner import DemodProfile
+from subband_planner import plan_subbands, OVERSAMPLE
+
+
+class SharedFrontEnd(gr.hier_block2):
+    """Coarse decimation shared by all the tuners
+
+    Splits the hardware band into sub-bands with one polyphase channelizer
+    Each sub-band is oversampled by 2 so a channel is always fully inside
+    the sub-band nearest to it.  The number of sub-bands comes from the
+    channel bandwidth of the demodulator (see subband_planner.py)
+    Each tuner selects the nearest sub-band and only translates and filters
+    the remaining offset at the sub-band rate instead of the full rate
+    The channelizer cost is paid once for any number of tuners
+
+    Args:
+        samp_rate (int): Input baseband sample rate in sps (1E6 minimum)
+        profile (DemodProfile): Filter requirements of the demodulators
+
+    Attributes:
+        plan (SubbandPlan): Sub-band sizes and locate()
+        num_subbands (int): Number of sub-bands (outputs)
+        spacing (float): Distance between sub-band centers in Hz
+        output_rate (float): Sample rate of each sub-band in sps
+    """
+
+    def __init__(self, samp_rate: int, profile: DemodProfile):
+        self.plan = plan_subbands(samp_rate, profile)
+        self.num_subbands = self.plan.num_subbands
+
+        gr.hier_block2.__init__(self, "SharedFrontEnd",
+                                gr.io_signature(1, 1, gr.sizeof_gr_complex),
+                                gr.io_signature(self.num_subbands, self.num_subbands,
+                                                gr.sizeof_gr_complex))
+
+        self.spacing = self.plan.spacing
+        self.output_rate = self.plan.output_rate
+
+        # Pass the nearest channels, stop what aliases onto them
+        taps = filter_taps.low_pass(1, samp_rate, self.plan.cutoff,
+                                    self.plan.transition, window.WIN_HAMMING)
+
+        channelizer = pfb.channelizer_ccf(self.num_subbands, taps, OVERSAMPLE)
+
+        self.connect(self, channelizer)
+        for idx in range(self.num_subbands):
+            self.connect((channelizer, idx), (self, idx))
+
+    def locate(self, center_freq: float) -> tuple[int, float]:
+        """Find the sub-band for a baseband frequency (see SubbandPlan.locate)"""
+        return self.plan.locate(center_freq)
+
+
+class FrontEndPort(object):
+    """Connection from the shared front end to one tuner
+
+    A selector picks the sub-band so a tuner can move between sub-bands
+    without reconnecting the flowgraph
+
+    Args:
+        front_end (SharedFrontEnd): The shared front end
+
+    Attributes:
+        selector (blocks.selector): Connect sub-band k to input k and the
+            output to the tuner
+    """
+
+    def __init__(self, front_end: SharedFrontEnd):
+        self.front_end = front_end
+        self.selector = blocks.selector(gr.sizeof_gr_complex, 0, 0)
+
+    def tune(self, center_freq: float) -> float:
+        """Select the sub-band for a baseband frequency
+
+        Args:
+            center_freq (float): Baseband center frequency in Hz
+
+        Returns:
+            float: Offset the tuner needs to translate within the sub-band
+        """
+        (index, offset) = self.front_end.locate(center_freq)
+        self.selector.set_input_index(index)
+        return offset
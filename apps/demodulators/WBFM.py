@@ -3,16 +3,15 @@
 """
 
 from gnuradio import gr  # type: ignore
-from gnuradio import filter as grfilter # Don't redefine Python's filter()
 from gnuradio.fft import window  # type: ignore
 from gnuradio import analog
-from gnuradio.filter import pfb  # type: ignore
 from gnuradio import blocks
 import ctcss_tones as ct
 import logging
 from typing import Callable
 
 from demodulators.BaseTuner import BaseTuner
+from decimation_planner import plan_decimation, WBFM_PROFILE
 from classification import Classifier
 from channel_loggers import ChannelLogger
 
@@ -22,17 +21,13 @@ class TunerDemodWBFM(BaseTuner):
     Kept as it's own class so multiple can be instantiated in parallel
     Accepts complex baseband samples at 1 Msps minimum
     Frequency translating FIR filter tunes from -samp_rate/2 to +samp_rate/2
-    The following sample rates assume 1 Msps input
-    First two stages of decimation are 4 each for a total of 16
-    Thus first two stages brings 1 Msps down to 40 ksps
-    The third stage decimates by int(samp_rate/1E6)
-    Thus output rate will vary from 40 ksps to 79.99 ksps
+    The decimation cascade is planned for the sample rate (decimation_planner)
+    The channel stages take the rate down to 62.5 ksps or a little above
     The channel is filtered to 25.0 KHz bandwidth followed by squelch
     The squelch is non-blocking since samples will be added with other demods
-    The quadrature demod is followed by a fourth stage of decimation by 4
-    This brings the sample rate down to 8 ksps to 15.98 ksps
+    The quadrature demod is followed by the audio decimation stages
     The audio is low-pass filtered to 3.5 kHz bandwidth
-    The polyphase resampler resamples by samp_rate/(decims[1] * decims[0]**3)
+    The polyphase resampler takes the remaining fractional rate change
     Audio rate is configurable at 8 or 16 ksps
     This results in a constant 8/16 ksps, irrespective of RF sample rate
     The audio may then be CTCSS squelch blocked if configured, with a tone
@@ -53,6 +48,8 @@ class TunerDemodWBFM(BaseTuner):
         min_file_size (int): Minimum saved wav file size
         ctcss_filter (bool): Filter on set CTCSS tone if True
         ctcss_tone_block (bool): Prevent CTCSS tones in audio output if True
+        baseband_ring (str | None): Name prefix of a shared-memory ring for
+            the channel baseband (None = no ring)
 
     Attributes:
         center_freq (float): Baseband center frequency in Hz
@@ -68,13 +65,14 @@ class TunerDemodWBFM(BaseTuner):
 
     def __init__(self, samp_rate: int, audio_rate: int, record: bool,
                  audio_bps: int, min_recording: float, classify: Classifier | None,
-                 notify_scanner: Callable, ctcss_filter: bool=False, ctcss_tone_block: bool=False):
+                 notify_scanner: Callable, ctcss_filter: bool=False, ctcss_tone_block: bool=False,
+                 baseband_ring: str | None=None):
 
         gr.hier_block2.__init__(self, "TunerDemodWBFM",
                                 gr.io_signature(1, 1, gr.sizeof_gr_complex),
                                 gr.io_signature(1, 1, gr.sizeof_float))
 
-        super().__init__(classify, notify_scanner)
+        super().__init__(classify, notify_scanner, baseband_ring)
         
         # Default values
         self.center_freq = 0
@@ -89,33 +87,12 @@ class TunerDemodWBFM(BaseTuner):
         self.ctcss_tone_block = ctcss_tone_block
         self.ctcss_level = 0.001 # little value in configuring this from testing so far
 
-        # Decimation values for four stages of decimation
-        decims = (4, int(samp_rate/1E6))
+        # Decimation cascade chosen for the sample rate
+        plan = plan_decimation(samp_rate, audio_rate, WBFM_PROFILE)
 
-        # Low pass filter taps for decimation by 5
-        low_pass_filter_taps_0 = \
-            grfilter.firdes.low_pass(1, 1, 0.090, 0.010,
-                    window.WIN_HAMMING)
-
-        # Frequency translating FIR filter decimating by 5
-        self.freq_xlating_fir_filter_ccc = \
-            grfilter.freq_xlating_fir_filter_ccc(decims[0],
-                                                 low_pass_filter_taps_0,
-                                                 self.center_freq, samp_rate)
-
-        # FIR filter decimating by 5
-        fir_filter_ccc_0 = grfilter.fir_filter_ccc(decims[0],
-                                                   low_pass_filter_taps_0)
-
-        # Low pass filter taps for decimation from samp_rate/25 to 40-79.9 ksps
-        # In other words, decimation by int(samp_rate/1E6)
-        # 25.0 kHz cutoff for WBFM channel bandwidth
-        low_pass_filter_taps_1 = grfilter.firdes.low_pass(
-            1, samp_rate/decims[0]**2, 25.0E3, 1E3, window.WIN_HAMMING)
-
-        # FIR filter decimation by int(samp_rate/1E6)
-        fir_filter_ccc_1 = grfilter.fir_filter_ccc(decims[1],
-                                                   low_pass_filter_taps_1)
+        # Frequency translating FIR filter followed by decimating filters
+        # The last one has the 25.0 kHz cutoff for WBFM channel bandwidth
+        channel_filters = self._channel_filters(plan)
 
         # Non blocking power squelch
         self.analog_pwr_squelch_cc = analog.pwr_squelch_cc(squelch_db,
@@ -126,20 +103,10 @@ class TunerDemodWBFM(BaseTuner):
         self.analog_quadrature_demod_cf = \
             analog.quadrature_demod_cf(self.quad_demod_gain)
 
-        # 3.5 kHz cutoff for audio bandwidth
-        low_pass_filter_taps_2 = grfilter.firdes.low_pass(1,\
-                        samp_rate/(decims[1] * decims[0]**2),\
-                        3.5E3, 500, window.WIN_HAMMING)
-
-        # FIR filter decimating by 5 from 40-79.9 ksps to 8-15.98 ksps
-        fir_filter_fff_0 = grfilter.fir_filter_fff(decims[0],
-                                                   low_pass_filter_taps_2)
-
-        # Polyphase resampler allows arbitary RF sample rates
-        # Takes 8-15.98 ksps to a constant 8 ksps for audio
-        pfb_resamp = audio_rate/float(samp_rate/(decims[1] * decims[0]**3))
-        pfb_arb_resampler_fff = pfb.arb_resampler_fff(pfb_resamp, taps=None,
-                                                      flt_size=32)
+        # Decimating filters with 3.5 kHz cutoff for audio bandwidth
+        # Polyphase resampler (if needed) for a constant audio rate
+        audio_filters = self._audio_filters(plan)
+        audio_out = audio_filters[-1]
 
         # Need to set this to a very low value of -200 since it is after demod
         # Only want it to gate when the previous squelch has gone to zero
@@ -186,44 +153,36 @@ class TunerDemodWBFM(BaseTuner):
         analog_pwr_squelch_ff = analog.pwr_squelch_ff(-200, 1e-1, 0, True)
 
         # Connect the blocks for the demod
-        self.connect(self, self.freq_xlating_fir_filter_ccc)
-        self.connect(self.freq_xlating_fir_filter_ccc, fir_filter_ccc_0)
-        self.connect(fir_filter_ccc_0, fir_filter_ccc_1)
-        self.connect(fir_filter_ccc_1, self.analog_pwr_squelch_cc)
-        self.connect(self.analog_pwr_squelch_cc,
-                     self.analog_quadrature_demod_cf)
-        self.connect(self.analog_quadrature_demod_cf, fir_filter_fff_0)
-        self.connect(fir_filter_fff_0, pfb_arb_resampler_fff)
-        self.connect(pfb_arb_resampler_fff, self)
+        self.connect(self, *channel_filters, self.analog_pwr_squelch_cc,
+                     self.analog_quadrature_demod_cf, *audio_filters, self)
+
+        # Optionally share the channel baseband with other processes
+        self._publish_baseband(channel_filters[-1], plan.channel_rate)
 
         if (self.ctcss_filter and ~self.ctcss_tone_block):
             # Connect the blocks for CTCSS squelch filtering, keeping tone in audio
-            self.connect(pfb_arb_resampler_fff, self.analog_ctcss_squelch_ff_0)
+            self.connect(audio_out, self.analog_ctcss_squelch_ff_0)
             self.connect(self.analog_ctcss_squelch_ff_0, analog_pwr_squelch_ff)
         elif (self.ctcss_filter and self.ctcss_tone_block):
             # Connect the blocks for CTCSS squelch filtering, removing tone in audio
-            self.connect(pfb_arb_resampler_fff, self.analog_ctcss_squelch_ff_0)
+            self.connect(audio_out, self.analog_ctcss_squelch_ff_0)
             self.connect(self.analog_ctcss_squelch_ff_0, self.high_pass_filter_0)
             self.connect(self.high_pass_filter_0, analog_pwr_squelch_ff)
         elif (self.ctcss_tone_block):
             # Connect the blocks for removing CTCSS tones from audio
-            self.connect(pfb_arb_resampler_fff, self.high_pass_filter_0)
+            self.connect(audio_out, self.high_pass_filter_0)
             self.connect(self.high_pass_filter_0, analog_pwr_squelch_ff)
 #        elif (self.ctcss_tone_detect):
 #            # Connect tone detection PLL
 #            self.connect(pfb_arb_resampler_fff,
         else:
             # Connect without CTCSS
-            self.connect(pfb_arb_resampler_fff, analog_pwr_squelch_ff)
+            self.connect(audio_out, analog_pwr_squelch_ff)
 
         # Connect the blocks for recording
-        # File sink with single channel and bits/sample
+        # File sink with single channel and the audio_bps bits/sample
         if (self.record):
-            self.blocks_wavfile_sink = blocks.wavfile_sink('/dev/null', 1,
-                                                       audio_rate,
-                                                       blocks.FORMAT_WAV,
-                                                       blocks.FORMAT_PCM_16,
-                                                       False)
+            self.blocks_wavfile_sink = self._wavfile_sink(audio_rate)
             self.connect(analog_pwr_squelch_ff, self.blocks_wavfile_sink)
         else:
             null_sink1 = blocks.null_sink(gr.sizeof_float)
@@ -0,0 +1,290 @@
+'''
+Detection profile used to build the FFT flow that feeds channel estimation.
+
+The profile trades CPU against frequency resolution and detection latency.
+For example, a coarse FFT at a low vector rate is suited to a Raspberry Pi
+while a fine FFT (e.g. 6.25 kHz bins) can be used on a faster host.
+
+After a retune the averaged spectra still hold vectors of the previous
+center frequency (and of the hardware settling).  RetuneTracker tells which
+spectra only hold vectors from after the retune so the scanner can skip
+the others instead of waiting a fixed time.
+
+SpectrumPacer runs the scan cycle once per new spectrum, no faster than
+needed when nothing can change.
+'''
+import asyncio
+from dataclasses import dataclass, field
+import math
+import threading
+import time
+import typing
+
+import numpy as np
+
+AVERAGE_MODES = ('boxcar', 'exponential', 'peak')
+THRESHOLD_MODES = ('absolute', 'relative')
+
+# Scan cycle pacing in seconds
+IDLE_CYCLE_INTERVAL = 0.1   # no faster than 10 Hz when nothing can change
+MAX_CYCLE_WAIT = 0.5        # give up waiting for a new spectrum
+
+
+@dataclass(kw_only=True)
+class DetectionParams:
+    '''
+    Holds detection flow command line options provided by the user
+
+    fft_length (int): FFT size in bins (0 = derive from sample rate)
+    resolution (float): Requested bin size in Hz, used if fft_length is 0 (0 = default)
+    fft_rate (float): FFT vectors per second to keep (decimation of the FFT input)
+    average (str): Video averaging mode (boxcar, exponential or peak hold)
+    alpha (float): Exponential averaging factor (0 = equivalent to the boxcar length)
+    probe_rate (float): Averaged spectra per second delivered to the scanner
+    threshold (str): Threshold is absolute or relative to the noise floor
+    floor_window (float): Seconds of spectra used to estimate the noise floor
+    floor_percentile (float): Per bin percentile of the window used as the floor
+    retune_settle (float): Seconds of vectors discarded after a retune
+    '''
+    fft_length: int = field(default=0)
+    resolution: float = field(default=0)
+    fft_rate: float = field(default=1000)
+    average: str = field(default='boxcar')
+    alpha: float = field(default=0)
+    probe_rate: float = field(default=10)
+    threshold: str = field(default='absolute')
+    floor_window: float = field(default=3)
+    floor_percentile: float = field(default=25)
+    retune_settle: float = field(default=0.05)
+
+    def __post_init__(self):
+        if self.fft_length < 0:
+            raise ValueError('FFT length must be >= 0')
+
+        if self.fft_length and self.fft_length & (self.fft_length - 1):
+            raise ValueError('FFT length must be a power of two')
+
+        if self.resolution < 0:
+            raise ValueError('FFT resolution must be >= 0')
+
+        if self.fft_rate <= 0 or self.probe_rate <= 0:
+            raise ValueError('FFT and probe rates must be positive')
+
+        if self.probe_rate > self.fft_rate:
+            raise ValueError('Probe rate cannot be larger than FFT rate')
+
+        if self.average not in AVERAGE_MODES:
+            raise ValueError(f'Average must be one of {AVERAGE_MODES}')
+
+        if not 0 <= self.alpha <= 1:
+            raise ValueError('Alpha must be between 0 and 1')
+
+        if self.threshold not in THRESHOLD_MODES:
+            raise ValueError(f'Threshold must be one of {THRESHOLD_MODES}')
+
+        if self.floor_window <= 0:
+            raise ValueError('Noise floor window must be positive')
+
+        if not 0 <= self.floor_percentile <= 100:
+            raise ValueError('Noise floor percentile must be between 0 and 100')
+
+        if self.retune_settle < 0:
+            raise ValueError('Retune settle time must be >= 0')
+
+    def get_fft_length(self, samp_rate: float) -> int:
+        '''
+        FFT size for the sample rate.  A power of two is always returned.
+
+        NBFM channel is about 10 KHz wide
+        Want about 3 FFT bins to span a channel
+        The default (256 bins per Msps rounded up to a power of two) keeps
+        the bin size constant for power of two sampling rates
+        e.g. 4 Msps / 1024 = 3906.25 Hz/bin
+        '''
+        if self.fft_length:
+            return self.fft_length
+
+        if self.resolution:
+            return int(pow(2, np.ceil(np.log2(samp_rate/self.resolution))))
+
+        samp_ratio = samp_rate / 1E6
+        return 256 * int(pow(2, np.ceil(np.log(samp_ratio)/np.log(2))))
+
+    def get_decimation(self, samp_rate: float, fft_length: int) -> int:
+        '''
+        Keep one in N vectors so that about fft_rate vectors/sec are transformed.
+        Vectors never overlap so the rate is limited to samp_rate/fft_length.
+        '''
+        return max(1, int(round(samp_rate/fft_length/self.fft_rate)))
+
+    def get_integration(self, samp_rate: float, fft_length: int) -> int:
+        '''
+        Number of vectors averaged for each spectrum provided to the scanner
+        '''
+        vector_rate = samp_rate/fft_length/self.get_decimation(samp_rate, fft_length)
+        return max(1, int(round(vector_rate/self.probe_rate)))
+
+    def get_alpha(self, integration: int) -> float:
+        '''
+        Exponential smoothing factor.  By default use the factor that gives
+        the same noise reduction as a boxcar of the integration length while
+        weighting the most recent vectors (lower detection latency).
+        '''
+        if self.alpha:
+            return self.alpha
+
+        return 2.0/(integration + 1)
+
+    def get_floor_depth(self, probe_rate: float) -> int:
+        '''
+        Number of spectra kept to estimate the noise floor
+        '''
+        return max(1, int(round(self.floor_window*probe_rate)))
+
+
+class RetuneTracker:
+    '''
+    Tracks which detection spectra are clean after a retune
+
+    Vectors are counted at the input of the averager, spectra at its output
+    (the probe).  Spectrum n averages vectors [n*integration, (n+1)*integration).
+    The first vector seen settle seconds after the retune is the first clean
+    one, so the first clean spectrum is the first one that starts at or
+    after it.  Called from the flowgraph (vectors) and the scanner (retune,
+    clean) threads.
+
+    Args:
+        integration (int): Vectors averaged for each spectrum
+        settle (float): Seconds of vectors discarded after a retune
+        clock (Callable): Time source in seconds
+
+    Attributes:
+        clean_from (int | None): Index of the first clean spectrum
+            (None = not known yet)
+        retunes (int): Number of retunes
+    '''
+    def __init__(self, integration: int, settle: float,
+                 clock: typing.Callable[[], float]=time.monotonic) -> None:
+        self.integration = integration
+        self.settle = settle
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.deadline: float | None = None
+        self.clean_from: int | None = 0
+        self.retunes = 0
+
+    def retune(self) -> None:
+        """The center frequency just changed"""
+        with self.lock:
+            self.clean_from = None
+            self.deadline = self.clock() + self.settle
+            self.retunes += 1
+
+    def vectors(self, first: int) -> int | None:
+        """Vectors arrived at the averager
+
+        Args:
+            first (int): Index of the first of them
+
+        Returns:
+            int | None: Index of the first clean vector if it is among them
+                (the averager starts over there), else None
+        """
+        with self.lock:
+            if self.deadline is None or self.clock() < self.deadline:
+                return None
+            self.deadline = None
+            self.clean_from = math.ceil(first / self.integration)
+            return first
+
+    def clean(self, seq: int) -> bool:
+        """Whether the latest spectrum is clean
+
+        Args:
+            seq (int): Number of spectra received so far (probe seq)
+        """
+        clean_from = self.clean_from
+        return clean_from is not None and seq - 1 >= clean_from
+
+
+def cycle_interval(channels: list, demod_freqs: list[int]) -> float:
+    '''
+    Minimum time between scan cycles.  With activity and a free demodulator
+    every spectrum is processed to minimize the time to demodulation.
+    Otherwise the rate is limited to save CPU with fast probe rates.
+
+    Args:
+        channels (list[ChannelFrequency]): Channels of the last scan cycle
+        demod_freqs (list[int]): Baseband frequencies of the demodulators
+            (0 = free)
+    '''
+    channels = [channel for channel in channels if not channel.locked]
+    if len(channels) == 0:
+        return IDLE_CYCLE_INTERVAL
+
+    if 0 in demod_freqs:
+        return 0.0
+
+    # All demodulators are busy so only priority channels can change things
+    if any(channel.priority is not None and not channel.active for channel in channels):
+        return 0.0
+
+    return IDLE_CYCLE_INTERVAL
+
+
+class SpectrumPacer:
+    '''
+    Paces the scan cycles on the spectra of the probe
+
+    The flowgraph calls arrived() (through loop.call_soon_threadsafe) for
+    each spectrum so the scanner is woken up instead of polling.
+
+    Args:
+        probe (SpectrumProbe): Probe with the spectrum count (seq)
+        max_wait (float): Seconds to wait for a new spectrum at most
+        clock (Callable): Time source in seconds
+
+    Attributes:
+        last_cycle (float): Time the last scan cycle started
+    '''
+    def __init__(self, probe, max_wait: float=MAX_CYCLE_WAIT,
+                 clock: typing.Callable[[], float]=time.monotonic) -> None:
+        self.probe = probe
+        self.max_wait = max_wait
+        self.clock = clock
+        self.event = asyncio.Event()
+        self.last_cycle = 0.0
+
+    def arrived(self) -> None:
+        """A new spectrum is in the probe (runs in the event loop)"""
+        self.event.set()
+
+    def cycle_started(self) -> None:
+        self.last_cycle = self.clock()
+
+    async def wait(self, seq: int, interval: float) -> None:
+        """Wait until the next scan cycle is due
+
+        This is when a spectrum newer than seq is in the probe and interval
+        has passed since the last cycle.  Returns after max_wait even without
+        a new spectrum so the caller (e.g. user interface) is not stalled.
+
+        Args:
+            seq (int): Probe count of the spectrum of the last cycle
+            interval (float): Minimum seconds between cycles
+        """
+        elapsed = self.clock() - self.last_cycle
+        if elapsed < interval:
+            await asyncio.sleep(interval - elapsed)
+
+        if self.probe.seq != seq:
+            return
+
+        self.event.clear()
+        if self.probe.seq != seq:  # arrived while clearing
+            return
+
+        try:
+            await asyncio.wait_for(self.event.wait(), self.max_wait)
+        except asyncio.TimeoutError:
+            pass
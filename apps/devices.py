@@ -0,0 +1,28 @@
+'''
+SDR devices (or channels of one device) scanned by a single ham2mon process.
+
+Each device gets its own detection flow, demodulator pool and center
+frequencies.  The first device comes from the -a/-f options and the others
+from --device.
+'''
+from dataclasses import dataclass
+from center_frequency_provider import FrequencyGroup
+
+
+@dataclass(kw_only=True)
+class DeviceParams:
+    '''
+    Holds the command line options of one device
+
+    hw_args (str): Argument string to pass to hardware (osmosdr)
+    frequency_params (FrequencyGroup): Center frequencies or ranges of the device
+    '''
+    hw_args: str
+    frequency_params: FrequencyGroup
+
+    def __post_init__(self):
+        if not self.hw_args:
+            raise ValueError('Device hardware args must not be empty')
+
+        if not self.frequency_params.singles and not self.frequency_params.ranges:
+            raise ValueError(f'Device {self.hw_args} needs at least one frequency')
@@ -0,0 +1,232 @@
+"""
+Python (embedded) GNU Radio blocks for things the stock blocks do not provide.
+
+The work functions operate on whole buffers with numpy so the per vector
+cost stays small compared to the FFT.
+"""
+
+from gnuradio import gr  # type: ignore
+import numpy as np
+
+from iq_ring import IQRingWriter
+from audio_streaming import AudioStreamServer
+from detection import RetuneTracker
+
+
+class SpectrumAverager(gr.decim_block):
+    """Video average of power spectrum vectors with decimation
+
+    Modes:
+        exponential: Single pole IIR per bin, output every decim vectors
+        peak: Maximum per bin over each group of decim vectors (peak hold)
+
+    The output is scaled by decim so levels match the boxcar sum of
+    blocks.integrate_ff.  For exponential the threshold/display settings
+    carry over.  Peak hold puts the noise several dB above the boxcar sum
+    (the maximum of the noise, not its average), so absolute thresholds do
+    not carry over to it.
+
+    Args:
+        vlen (int): Vector length (FFT size)
+        decim (int): Number of input vectors per output vector
+        mode (str): 'exponential' or 'peak'
+        alpha (float): Exponential smoothing factor (0 < alpha <= 1)
+        tracker (RetuneTracker | None): Starts the average over at the first
+            clean vector after a retune
+    """
+
+    def __init__(self, vlen: int, decim: int, mode: str, alpha: float,
+                 tracker: RetuneTracker | None=None):
+        gr.decim_block.__init__(self,
+                                name="SpectrumAverager",
+                                in_sig=[(np.float32, vlen)],
+                                out_sig=[(np.float32, vlen)],
+                                decim=decim)
+        self.vlen = vlen
+        self.decim = decim
+        self.mode = mode
+        self.alpha = alpha
+        self.state = np.zeros(vlen, dtype=np.float32)
+        self.primed = False
+        self.tracker = tracker
+        # A group folds into the state as state*(1-alpha)**decim plus the
+        # vectors weighted alpha*(1-alpha)**(decim-1-k)
+        self.decay = (1 - alpha) ** np.arange(decim - 1, -1, -1, dtype=np.float64)
+        self.weights = alpha * self.decay
+        self.group_decay = (1 - alpha) ** decim
+
+    def reset(self) -> None:
+        """Forget the average (e.g. after a retune)"""
+        self.primed = False
+
+    def work(self, input_items, output_items):
+        in0 = input_items[0]
+        out = output_items[0]
+        num_out = len(out)
+        groups = in0[:num_out*self.decim].reshape(num_out, self.decim, self.vlen)
+
+        # Peak hold has no memory between outputs, so only the exponential
+        # average needs to start over after a retune
+        restart = -1
+        if self.tracker is not None:
+            first = self.nitems_read(0)
+            clean = self.tracker.vectors(first)
+            if clean is not None:
+                restart = clean - first
+
+        if self.mode == 'peak':
+            out[:] = groups.max(axis=1) * self.decim
+            return num_out
+
+        # Only the state carries from group to group
+        folded = np.einsum('k,ikv->iv', self.weights, groups)
+        for idx in range(num_out):
+            start = restart - idx*self.decim
+            if not 0 <= start < self.decim:
+                start = None if self.primed else 0
+            if start is None:
+                self.state[:] = self.group_decay * self.state + folded[idx]
+            else:
+                # The average starts at vector start of the group
+                group = groups[idx]
+                self.state[:] = (self.decay[start] * group[start] +
+                                 self.weights[start + 1:] @ group[start + 1:])
+                self.primed = True
+            out[idx] = self.state * self.decim
+
+        return num_out
+
+
+class RetuneMarker(gr.sync_block):
+    """Counts the vectors into blocks.integrate_ff for a RetuneTracker
+
+    Connected next to the boxcar integrator (same input stream) since the
+    stock block cannot report its vector count
+
+    Args:
+        vlen (int): Vector length (FFT size)
+        tracker (RetuneTracker): Tracker of the receiver
+    """
+
+    def __init__(self, vlen: int, tracker: RetuneTracker):
+        gr.sync_block.__init__(self,
+                               name="RetuneMarker",
+                               in_sig=[(np.float32, vlen)],
+                               out_sig=None)
+        self.tracker = tracker
+
+    def work(self, input_items, output_items):
+        self.tracker.vectors(self.nitems_read(0))
+        return len(input_items[0])
+
+
+class SpectrumProbe(gr.sync_block):
+    """Probe for the latest spectrum vector with a frame counter
+
+    Unlike blocks.probe_signal_vf the scanner can tell when a new spectrum
+    arrived (seq) and be woken up by a callback instead of polling.
+    The callback runs in the flowgraph thread so it must be thread safe
+    (e.g. loop.call_soon_threadsafe).
+
+    Args:
+        vlen (int): Vector length (FFT size)
+
+    Attributes:
+        seq (int): Number of spectra received so far
+    """
+
+    def __init__(self, vlen: int):
+        gr.sync_block.__init__(self,
+                               name="SpectrumProbe",
+                               in_sig=[(np.float32, vlen)],
+                               out_sig=None)
+        self.spectrum = np.zeros(vlen, dtype=np.float32)
+        self.seq = 0
+        self.callback = None
+
+    def set_callback(self, callback) -> None:
+        """Set the function called when a new spectrum arrives"""
+        self.callback = callback
+
+    def level(self) -> np.ndarray:
+        """Latest spectrum (same as blocks.probe_signal_vf)"""
+        return self.spectrum
+
+    def work(self, input_items, output_items):
+        in0 = input_items[0]
+        if len(in0) == 0:
+            return 0
+
+        self.spectrum = in0[-1].copy()
+        self.seq += len(in0)
+        if self.callback is not None:
+            self.callback()
+
+        return len(in0)
+
+
+class IQRingSink(gr.sync_block):
+    """Copies complex samples into a shared-memory ring (iq_ring.py)
+
+    Other processes read the ring with iq_ring.IQRingReader.
+    The writer never waits for them so the flowgraph is not slowed down.
+
+    Args:
+        name (str): Shared memory name of the ring
+        samp_rate (float): Sample rate in sps
+        center_freq (float): RF frequency at 0 Hz in Hz
+        seconds (float): Length of the ring in seconds of samples
+        settle (float): Seconds after a retune until the samples of the new
+            center frequency reach the ring
+    """
+
+    def __init__(self, name: str, samp_rate: float, center_freq: float=0,
+                 seconds: float=1.0, settle: float=0.0):
+        gr.sync_block.__init__(self,
+                               name="IQRingSink",
+                               in_sig=[np.complex64],
+                               out_sig=None)
+        self.samp_rate = samp_rate
+        self.settle = settle
+        self.writer = IQRingWriter(name, max(1, int(samp_rate*seconds)),
+                                   center_freq, samp_rate)
+
+    def set_center_freq(self, center_freq: float) -> None:
+        """Metadata for the samples after a retune (applied in work())"""
+        self.writer.set_metadata(center_freq, self.samp_rate, self.settle)
+
+    def close(self) -> None:
+        """Remove the ring name (safe while the flowgraph runs)"""
+        self.writer.unlink()
+
+    def work(self, input_items, output_items):
+        in0 = input_items[0]
+        self.writer.write(in0)
+        return len(in0)
+
+
+class AudioTap(gr.sync_block):
+    """Hands the audio of a stream to the streaming server (audio_streaming.py)
+
+    Buffers are only copied while the stream has clients.  The encoding and
+    the network writes happen in the event loop, never in the flowgraph.
+
+    Args:
+        server (AudioStreamServer): Server of the streams
+        stream (str): Stream name (e.g. the demodulator channel number)
+    """
+
+    def __init__(self, server: AudioStreamServer, stream: str):
+        gr.sync_block.__init__(self,
+                               name="AudioTap",
+                               in_sig=[np.float32],
+                               out_sig=None)
+        self.server = server
+        self.stream = stream
+        server.register(stream)
+
+    def work(self, input_items, output_items):
+        in0 = input_items[0]
+        if self.server.wanted(self.stream):
+            self.server.publish_threadsafe(self.stream, in0.copy())
+        return len(in0)
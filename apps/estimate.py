@@ -19,13 +19,8 @@ def avg_freq(data):
     Returns:
         float: Fractional index into spectrum
     """
-
-    weighted_power = 0
-    sum_power = 0
-    for index, sample in enumerate(data):
-        weighted_power += index*sample
-        sum_power += sample
-    return weighted_power / float(sum_power)
+    data = np.asarray(data, dtype=float)
+    return float(np.dot(np.arange(len(data)), data) / np.sum(data))
 
 
 def channel_estimate(spectrum, threshold):
@@ -35,33 +30,98 @@ def channel_estimate(spectrum, threshold):
 
     Args:
         spectrum (numpy.ndarray): FFT power spectrum in linear, not dB
-        threshold (float): Threshold value in linear, not dB
+        threshold (float or numpy.ndarray): Threshold value in linear, not dB
+            Either a single value or one value per bin
 
     Returns:
         List[float]: List of fractional indices into spectrum of channel center
     """
+    spectrum = np.asarray(spectrum, dtype=float)
+    above = spectrum > threshold
+
+    # Pad with zeros to handle first/last bin above threshold
+    edges = np.diff(np.concatenate(([0], above.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+
+    return [int(start) + avg_freq(spectrum[start:end])
+            for start, end in zip(starts, ends)]
+
+
+class NoiseFloor(object):
+    """Per bin noise floor estimate
+
+    Keeps the spectra of the last N probe spectra and uses a per bin
+    percentile as the floor.  A low percentile tracks the floor under
+    intermittent transmissions and follows changes in gain or band noise
+    within the window.  Bins above the threshold keep their floor while the
+    signal lasts, so a long transmission does not become its own floor.
+
+    The window is counted in probe spectra (seq), not in updates: the
+    scanner consumes at most one spectrum per cycle and may skip some.
+
+    Args:
+        depth (int): Number of probe spectra in the window
+        percentile (float): Percentile (0-100) of the window used as floor
+
+    Attributes:
+        floor (numpy.ndarray): Current floor in linear, not dB (empty if none)
+    """
 
-    # Append a zero to handle last bin above threshold
-    spectrum = np.append(spectrum, np.zeros(1))
-
-    length = len(spectrum)
-    bins = []
-    channels = []
-    index = 0
-    while index < length:
-        if spectrum[index] > threshold:
-            # If spectrum > threshold then append to bins list
-            bins.append(spectrum[index])
-            index += 1
-        elif len(bins) != 0:
-            # Spectrum < threshold so find average freq and append to channels
-            channels.append(index - len(bins) + avg_freq(bins))
-            index += 1
-            bins = []
-        else:
-            # Spectrum < threshold so move on
-            index += 1
-    return channels
+    # Above this share of bins over the threshold the level changed (gain,
+    # band noise) and all the bins are updated
+    LEVEL_CHANGE = 0.5
+
+    def __init__(self, depth, percentile):
+        self.depth = depth
+        self.percentile = percentile
+        self.reset()
+
+    def reset(self):
+        """Forget the history (e.g. after a retune)"""
+        self.history = None
+        self.seqs = None
+        self.count = 0
+        self.seq = None
+        self.floor = np.empty(0)
+
+    def update(self, spectrum, seq=None, threshold=None):
+        """Add a spectrum to the window and return the new floor
+
+        Args:
+            spectrum (numpy.ndarray): FFT power spectrum in linear, not dB
+            seq (int): Probe sequence number of the spectrum (None counts
+                each update as the next spectrum).  A spectrum already
+                added is not added again.
+            threshold (float): Bins above floor * threshold hold their floor
+
+        Returns:
+            numpy.ndarray: Floor per bin in linear, not dB
+        """
+        spectrum = np.asarray(spectrum, dtype=float)
+        if seq is None:
+            seq = 0 if self.seq is None else self.seq + 1
+        elif seq == self.seq and len(self.floor) == len(spectrum):
+            return self.floor
+
+        if self.history is None or self.history.shape[1] != len(spectrum):
+            self.history = np.empty((self.depth, len(spectrum)))
+            self.seqs = np.full(self.depth, -np.inf)
+            self.count = 0
+            self.floor = np.empty(0)
+
+        if threshold is not None and len(self.floor) == len(spectrum):
+            above = spectrum > self.floor * threshold
+            if np.mean(above) < self.LEVEL_CHANGE:
+                spectrum = np.where(above, self.floor, spectrum)
+
+        self.history[self.count % self.depth] = spectrum
+        self.seqs[self.count % self.depth] = seq
+        self.count += 1
+        self.seq = seq
+        in_window = self.seqs > seq - self.depth
+        self.floor = np.percentile(self.history[in_window], self.percentile, axis=0)
+        return self.floor
 
 
 def main():
@@ -93,6 +153,20 @@ def main():
         print("Test Fail")
     print("")
 
+    # Test channel_estimate() with a threshold relative to a noise floor
+    print("Testing NoiseFloor()")
+    noise_floor = NoiseFloor(3, 50)
+    for _ in range(3):
+        noise_floor.update(np.full(8, 0.1))
+    floor = noise_floor.update(data)
+    result = channel_estimate(data, floor * 2)
+    print("Channels at " + str(result))
+    if result == [1.5, 6.0]:
+        print("Test Pass")
+    else:
+        print("Test Fail")
+    print("")
+
 
 if __name__ == '__main__':
     try:
@@ -0,0 +1,177 @@
+'''
+Filter tap design shared by all the tuners.
+
+Every tuner uses the same handful of filters so the taps are designed once
+and memoized.  Designs are also kept in an on-disk cache so a cold start
+with many demodulators (e.g. on a slow ARM board) skips the filter design.
+The cache file name includes the GNU Radio version because designs may
+change between releases.
+'''
+import json
+import logging
+from pathlib import Path
+from typing import Callable
+from gnuradio import gr  # type: ignore
+from gnuradio import filter as grfilter # Don't redefine Python's filter()
+from gnuradio.filter import optfir  # type: ignore
+from gnuradio.fft import window  # type: ignore
+from utilities import cache_dir, atomic_write
+
+
+class TapCache(object):
+    '''
+    Memoized filter designs backed by a JSON file
+
+    The file is read on first use and rewritten when a new design is added.
+    A missing or unreadable file just means the taps get designed again.
+
+    Args:
+        path (Path | None): Cache file (None = memory only)
+    '''
+    def __init__(self, path: Path | None) -> None:
+        self.path = path
+        self.taps: dict[str, list[float]] | None = None
+
+    def _load(self) -> dict[str, list[float]]:
+        if self.path is None:
+            return {}
+        try:
+            with open(self.path, encoding='utf-8') as file:
+                data = json.load(file)
+            if isinstance(data, dict):
+                return data
+            logging.warning(f'Ignoring filter tap cache {self.path}: unexpected format')
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as error:
+            logging.warning(f'Ignoring filter tap cache {self.path}: {error}')
+        return {}
+
+    def _save(self) -> None:
+        if self.path is None:
+            return
+        try:
+            atomic_write(self.path, json.dumps(self.taps).encode('utf-8'))
+        except OSError as error:
+            logging.warning(f'Could not write filter tap cache {self.path}: {error}')
+
+    def get(self, key: tuple, design: Callable[[], list[float]]) -> list[float]:
+        '''
+        Return the taps for key, calling design() only if they are not cached
+
+        Args:
+            key (tuple): Design parameters (must have a stable repr)
+            design (Callable[[], list[float]]): Designs the taps
+
+        Returns:
+            list[float]: The taps (a copy so callers cannot change the cache)
+        '''
+        if self.taps is None:
+            self.taps = self._load()
+
+        name = repr(key)
+        if name not in self.taps:
+            self.taps[name] = [float(tap) for tap in design()]
+            logging.debug(f'Designed {len(self.taps[name])} taps for {name}')
+            self._save()
+
+        return list(self.taps[name])
+
+
+def _default_path() -> Path | None:
+    try:
+        return cache_dir() / f'filter_taps-{gr.version()}.json'
+    except OSError as error:
+        logging.warning(f'Filter tap cache disabled: {error}')
+        return None
+
+
+_cache = TapCache(_default_path())
+
+
+def low_pass(gain: float, samp_rate: float, cutoff: float, transition: float,
+             win: window.win_type = window.WIN_HAMMING) -> list[float]:
+    '''
+    Same as firdes.low_pass but designed once per set of parameters
+
+    Args:
+        gain (float): Filter gain
+        samp_rate (float): Sample rate in sps
+        cutoff (float): Cutoff frequency in Hz
+        transition (float): Transition width in Hz
+        win (window.win_type): Window
+
+    Returns:
+        list[float]: Filter taps
+    '''
+    key = ('low_pass', float(gain), float(samp_rate), float(cutoff),
+           float(transition), int(win))
+    return _cache.get(key, lambda: grfilter.firdes.low_pass(
+        gain, samp_rate, cutoff, transition, win))
+
+
+def arb_resampler_taps(rate: float, flt_size: int = 32,
+                       atten: float = 100) -> list[float]:
+    '''
+    Prototype filter for pfb.arb_resampler_fff designed once per rate
+
+    Same design pfb.arb_resampler_fff does itself when taps=None, i.e. pass
+    80% of the output half band (or the input half band when upsampling)
+
+    Args:
+        rate (float): Resampling rate (output/input)
+        flt_size (int): Number of filters in the bank
+        atten (float): Stop band attenuation in dB
+
+    Returns:
+        list[float]: Filter taps
+    '''
+    def design() -> list[float]:
+        percent = 0.80
+        if rate < 1:
+            halfband = 0.5 * rate
+            bw = percent * halfband
+            tb = (percent / 2.0) * halfband
+            # optfir has trouble converging with narrow bands
+            return grfilter.firdes.low_pass_2(flt_size, flt_size, bw, tb, atten,
+                                              window.WIN_BLACKMAN_HARRIS)
+
+        halfband = 0.5
+        bw = percent * halfband
+        tb = (percent / 2.0) * halfband
+        ripple = 0.1
+        while True:
+            try:
+                return optfir.low_pass(flt_size, flt_size, bw, bw + tb,
+                                       ripple, atten)
+            except RuntimeError:
+                ripple += 0.01
+                if ripple >= 1.0:
+                    raise RuntimeError('optfir could not generate an appropriate filter.')
+
+    key = ('arb_resampler', float(rate), int(flt_size), float(atten))
+    return _cache.get(key, design)
+
+
+def main() -> None:
+    """Test the functions in this module
+
+    Designs the NBFM taps twice and shows the second call comes from memory
+    """
+    import time
+    logging.basicConfig(level=logging.DEBUG)
+    print(f'Cache file: {_cache.path}')
+
+    for attempt in range(2):
+        start = time.perf_counter()
+        low_pass(1, 1, 0.090, 0.010)
+        low_pass(1, 4E6/25, 12.5E3, 1E3)
+        arb_resampler_taps(8000/12800)
+        print(f'Pass {attempt}: {(time.perf_counter() - start)*1E3:.3f} ms')
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except KeyboardInterrupt:
+        pass
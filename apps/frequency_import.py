@@ -0,0 +1,258 @@
+'''
+Bulk import of frequency lists from CSV files.
+
+Frequency lists kept in spreadsheets or exported by scanner programming
+tools can be used as the frequency file (-F) directly or converted to the
+YAML format with this module.  The columns are found by their header
+(case is ignored):
+
+- single: single, frequency, freq, frequency output (RadioReference)
+- lo, hi: lo/low and hi/high (a range)
+- label: label, alpha tag (RadioReference), name (CHIRP), description, comment
+- locked: locked, lockout (true/false, yes/no, 1/0, x)
+- priority: priority
+
+So ham2mon style CSV files, CHIRP exports and RadioReference frequency
+exports all work.  Frequencies are in MHz.
+
+All the rows are checked at once with numpy arrays (the same rules as
+ConfigFrequency).  Invalid rows are reported and skipped.  Duplicates and
+overlapping ranges are found in one pass over the sorted frequencies: the
+first of the duplicates is kept, overlaps are only reported.
+'''
+import argparse
+import csv
+from dataclasses import dataclass, field
+import io
+import logging
+
+import numpy as np
+from numpy.typing import NDArray
+import yaml
+
+from frequency_manager import ConfigFrequency, FrequencyList
+
+COLUMNS = {'single': ('single', 'frequency', 'freq', 'frequency output'),
+           'lo': ('lo', 'low'),
+           'hi': ('hi', 'high'),
+           'label': ('label', 'alpha tag', 'name', 'description', 'comment'),
+           'locked': ('locked', 'lockout'),
+           'priority': ('priority',)}
+
+TRUE_VALUES = ('true', 'yes', 'y', '1', 'x')
+FALSE_VALUES = ('', 'false', 'no', 'n', '0')
+
+MAX_REPORTED = 10  # rows listed in a report
+
+
+@dataclass(kw_only=True)
+class ImportResult:
+    '''
+    Outcome of an import
+
+    Attributes:
+        frequencies (FrequencyList): The valid entries without duplicates
+            (in file order)
+        errors (list[str]): Rows skipped as invalid
+        duplicates (list[str]): Rows skipped as a duplicate of an earlier row
+        overlaps (list[str]): Ranges overlapping an earlier range (kept)
+    '''
+    frequencies: FrequencyList = field(default_factory=list)
+    errors: list[str] = field(default_factory=list)
+    duplicates: list[str] = field(default_factory=list)
+    overlaps: list[str] = field(default_factory=list)
+
+    def log(self, source: str) -> None:
+        """Log a summary and the first problems"""
+        logging.debug(f'Imported {len(self.frequencies)} frequencies from {source}')
+        for (kind, rows) in (('invalid', self.errors), ('duplicate', self.duplicates),
+                             ('overlapping', self.overlaps)):
+            if not rows:
+                continue
+            log = logging.warning if kind != 'overlapping' else logging.debug
+            log(f'{source}: {len(rows)} {kind} rows')
+            for row in rows[:MAX_REPORTED]:
+                log(f'  {row}')
+
+
+def _column(rows: list[dict], header: dict[str, str], name: str) -> NDArray:
+    # Stripped text of a column ('' where missing)
+    for alias in COLUMNS[name]:
+        if alias in header:
+            key = header[alias]
+            return np.array([(row.get(key) or '').strip() for row in rows], dtype=object)
+    return np.full(len(rows), '', dtype=object)
+
+
+def _numbers(text: NDArray) -> tuple[NDArray, NDArray]:
+    # Float values (nan where empty) and where the text is not a number
+    values = np.full(len(text), np.nan)
+    given = text != ''
+    try:
+        values[given] = np.asarray(text[given], dtype=np.float64)
+        return (values, np.zeros(len(text), dtype=bool))
+    except ValueError:
+        bad = np.zeros(len(text), dtype=bool)
+        for idx in np.flatnonzero(given):
+            try:
+                values[idx] = float(text[idx])
+            except ValueError:
+                bad[idx] = True
+        return (values, bad)
+
+
+def _validate(single: NDArray, lo: NDArray, hi: NDArray, priority: NDArray,
+              locked_text: NDArray, bad: NDArray) -> list[tuple[NDArray, str]]:
+    '''
+    Masks of the rows breaking each ConfigFrequency rule
+    '''
+    has_single = ~np.isnan(single)
+    has_lo = ~np.isnan(lo)
+    has_hi = ~np.isnan(hi)
+    with np.errstate(invalid='ignore'):
+        bad_priority = ~np.isnan(priority) & ((priority < 1) | (np.mod(priority, 1) != 0))
+        negative = (single < 0) | (lo < 0)
+        order = has_lo & has_hi & (lo >= hi)
+    lowered = np.array([text.lower() for text in locked_text], dtype=object)
+    bad_locked = ~np.isin(lowered, TRUE_VALUES + FALSE_VALUES)
+    return [(bad, 'frequency and priority must be numbers'),
+            (bad_locked, 'Locked must be a boolean'),
+            (bad_priority, 'Priority must be an integer >= 1'),
+            (~has_single & ~has_lo & ~has_hi, 'Frequency must be specified as single or range'),
+            (has_single & (has_lo | has_hi), 'Frequency cannot be specified as both single and range'),
+            (has_lo != has_hi, 'Both lo and hi must be specified for a frequency range'),
+            (negative, 'Frequencies must be positive numbers'),
+            (order, 'Upper frequency (hi) must be larger than lower frequency (lo)')]
+
+
+def import_rows(rows: list[dict]) -> ImportResult:
+    '''
+    Validated entries of CSV rows (csv.DictReader)
+
+    Args:
+        rows (list[dict]): Rows by header name
+
+    Returns:
+        ImportResult: Entries and the rows skipped or overlapping
+    '''
+    result = ImportResult()
+    if not rows:
+        return result
+    header = {name.strip().lower(): name for name in rows[0] if name is not None}
+    line = np.arange(len(rows)) + 2  # line in the file (after the header)
+
+    (single, bad_single) = _numbers(_column(rows, header, 'single'))
+    (lo, bad_lo) = _numbers(_column(rows, header, 'lo'))
+    (hi, bad_hi) = _numbers(_column(rows, header, 'hi'))
+    (priority, bad_priority) = _numbers(_column(rows, header, 'priority'))
+    locked_text = _column(rows, header, 'locked')
+    labels = _column(rows, header, 'label')
+
+    # The first rule a row breaks is reported
+    valid = np.ones(len(rows), dtype=bool)
+    errors = []
+    rules = _validate(single, lo, hi, priority, locked_text,
+                      bad_single | bad_lo | bad_hi | bad_priority)
+    for (broken, message) in rules:
+        errors += [(idx, message) for idx in np.flatnonzero(broken & valid)]
+        valid &= ~broken
+    result.errors = [f'line {line[idx]}: {message}' for (idx, message) in sorted(errors)]
+
+    # One pass over the valid entries sorted by frequency.  Equal
+    # (start, end, kind) in integer Hz (as ConfigFrequency.key, see
+    # mhz_to_hz) are duplicates, kept is the first in the file.
+    is_range = ~np.isnan(lo)
+    start = np.where(is_range, lo, single)
+    end = np.where(is_range, hi, single)
+    rows_left = np.flatnonzero(valid)
+    start_hz = np.zeros(len(rows), dtype=np.int64)
+    end_hz = np.zeros(len(rows), dtype=np.int64)
+    start_hz[rows_left] = np.rint(start[rows_left] * 1E6).astype(np.int64)
+    end_hz[rows_left] = np.rint(end[rows_left] * 1E6).astype(np.int64)
+    order = rows_left[np.lexsort((rows_left, is_range[rows_left],
+                                  end_hz[rows_left], start_hz[rows_left]))]
+    same = ((start_hz[order][1:] == start_hz[order][:-1]) &
+            (end_hz[order][1:] == end_hz[order][:-1]) &
+            (is_range[order][1:] == is_range[order][:-1]))
+    duplicate = np.zeros(len(rows), dtype=bool)
+    duplicate[order[1:][same]] = True
+    for idx in np.flatnonzero(duplicate):
+        result.duplicates.append(f'line {line[idx]}: {labels[idx] or ""} '
+                                 f'{start[idx]}{"-" + str(end[idx]) if is_range[idx] else ""}')
+
+    # A range overlaps if it starts before the earlier ranges end
+    ranges = order[is_range[order] & ~duplicate[order]]
+    reach = np.maximum.accumulate(end[ranges])
+    overlapping = start[ranges][1:] <= reach[:-1]
+    for (idx, up_to) in zip(ranges[1:][overlapping], reach[:-1][overlapping]):
+        result.overlaps.append(f'line {line[idx]}: {start[idx]}-{end[idx]} '
+                               f'overlaps a range up to {up_to}')
+
+    locked = np.isin(np.array([text.lower() for text in locked_text], dtype=object),
+                     TRUE_VALUES)
+    for idx in np.flatnonzero(valid & ~duplicate):
+        entry: dict = {'label': labels[idx] or None, 'locked': bool(locked[idx]),
+                       'saved': True}
+        if not np.isnan(priority[idx]):
+            entry['priority'] = int(priority[idx])
+        if is_range[idx]:
+            entry.update(lo=float(lo[idx]), hi=float(hi[idx]))
+        else:
+            entry['single'] = float(single[idx])
+        result.frequencies.append(ConfigFrequency(**entry))
+
+    return result
+
+
+def import_csv(text: str) -> ImportResult:
+    '''
+    Validated entries of the text of a CSV file (see import_rows)
+    '''
+    return import_rows(list(csv.DictReader(io.StringIO(text))))
+
+
+def to_yaml(frequencies: FrequencyList) -> str:
+    '''
+    Frequency file (YAML) with the entries
+    '''
+    entries = []
+    for frequency in frequencies:
+        entry: dict = {}
+        if frequency.label:
+            entry['label'] = frequency.label
+        if frequency.is_single:
+            entry['single'] = frequency.single
+        else:
+            entry.update(lo=frequency.lo, hi=frequency.hi)
+        if frequency.locked:
+            entry['locked'] = True
+        if frequency.priority is not None:
+            entry['priority'] = frequency.priority
+        entries.append(entry)
+    return yaml.safe_dump({'frequencies': entries}, sort_keys=False, allow_unicode=True)
+
+
+def main() -> None:
+    """Convert a CSV export to a frequency file"""
+    parser = argparse.ArgumentParser(description='Frequency list import')
+    parser.add_argument('file', help='CSV file (ham2mon columns, CHIRP or RadioReference export)')
+    parser.add_argument('-o', '--out', help='Write the frequency file (YAML) here')
+    options = parser.parse_args()
+
+    with open(options.file, encoding='utf-8-sig', newline='') as file:
+        result = import_csv(file.read())
+
+    print(f'{len(result.frequencies)} frequencies, {len(result.errors)} invalid, '
+          f'{len(result.duplicates)} duplicate and {len(result.overlaps)} overlapping rows')
+    for row in (result.errors + result.duplicates + result.overlaps)[:MAX_REPORTED]:
+        print(f'  {row}')
+    if options.out:
+        with open(options.out, 'w', encoding='utf-8') as file:
+            file.write(to_yaml(result.frequencies))
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except KeyboardInterrupt:
+        pass
@@ -1,16 +1,49 @@
 """
 Handle frequency data used for internal proccessing and the user interface.
 
-TODO: Save function
+The frequency file is parsed with the libyaml (C) loader when PyYAML has
+it.  The validated frequencies are pickled in the ham2mon cache directory
+together with a hash of the file, so loading an unchanged file (at startup
+or when the lockouts are cleared) skips the parsing and validation.
+
+The frequency file can also be a CSV file (e.g. a CHIRP or RadioReference
+export), see frequency_import.py.
+
+With --watch-frequencies the scanner polls the file (mtime and size) and
+reload() applies only the entries added, removed or changed in the file
+since it was loaded.  Entries added at run time (mode: add) and run time
+changes of entries the file did not change are kept.
+
+Frequencies are matched by integer Hz keys (rf_single/rf_lo/rf_hi, rf_hz),
+never by comparing MHz floats.  The lookups by RF or baseband frequency use
+dicts for the singles and numpy arrays for the ranges.  They are rebuilt
+when the entries or the center frequency change.
+
+Changes made while scanning (lockouts, auto priority) are unsaved entries
+(saved is False).  They are written to a runtime file (by default next to
+the frequency file, see --runtime-frequencies) and applied again at
+startup.  Writes are debounced: the first change starts a timer and all
+the changes until it fires go into one write.  The file is replaced
+atomically so a crash never leaves a partial file.
 """
 
 
 from dataclasses import dataclass, field
 from typing import Optional, TypeAlias  # TypeAlias needed for python < 3.12
 from pathlib import Path
+import asyncio
+import hashlib
+import pickle
 import yaml
 import logging
-from utilities import frequency_to_baseband
+import numpy as np
+from utilities import frequency_to_baseband, mhz_to_hz, cache_dir, atomic_write
+
+# libyaml is much faster for large files
+YamlLoader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+CACHE_VERSION = 2  # bump when ConfigFrequency changes
+SAVE_DELAY = 5.0  # seconds from a run time change to the write of the runtime file
 
 
 @dataclass(kw_only=True)
@@ -39,12 +72,17 @@ class ConfigFrequency(FrequencyInfo):
     A frequency specified in the configuration file.
 
     The baseband frequencies are not provided by the user.  They are
-    calculated at run time
+    calculated at run time.  The rf_ fields are the frequencies in Hz used
+    as keys (the MHz values are for the file and display).
     '''
     single: float | None = field(default=None)
     lo: float | None = field(default=None)
     hi: float | None = field(default=None)
 
+    rf_single: int | None = field(default=None, init=False)
+    rf_lo: int | None = field(default=None, init=False)
+    rf_hi: int | None = field(default=None, init=False)
+
     bb_single: int | None = field(default=None)
     bb_lo: int | None = field(default=None)
     bb_hi: int | None = field(default=None)
@@ -65,6 +103,13 @@ class ConfigFrequency(FrequencyInfo):
             self.bb_hi = frequency_to_baseband(
                 self.hi, center_freq, channel_spacing)
 
+    @property
+    def key(self) -> tuple:
+        """Identity of the entry, equal keys are duplicates (as __eq__)"""
+        if self.is_single:
+            return ('single', self.rf_single)
+        return ('range', self.rf_lo, self.rf_hi)
+
     def locks_out(self, bb: int) -> bool:
         if not self.locked:
             return False
@@ -103,6 +148,11 @@ class ConfigFrequency(FrequencyInfo):
 
         # Set state
         self.is_single = self.single is not None
+        if self.is_single:
+            self.rf_single = mhz_to_hz(self.single)
+        else:
+            self.rf_lo = mhz_to_hz(self.lo)
+            self.rf_hi = mhz_to_hz(self.hi)
 
     def _validate_frequency_types(self):
         """Ensure all frequency values are floats if provided"""
@@ -149,11 +199,7 @@ class ConfigFrequency(FrequencyInfo):
         if not isinstance(other, ConfigFrequency):
             return NotImplemented
 
-        if self.single and other.single:
-            return self.single == other.single
-
-        if self.lo and other.lo:
-            return self.lo == other.lo and self.hi == other.hi
+        return self.key == other.key
 
 
 @dataclass(kw_only=True)
@@ -166,6 +212,11 @@ class ChannelFrequency(FrequencyInfo):
     bb: int
     active: bool
     hanging: bool
+    rf_hz: int = field(init=False)
+
+    def __post_init__(self):
+        super().__post_init__()
+        self.rf_hz = mhz_to_hz(self.rf)
 
 
 @dataclass(kw_only=True)
@@ -184,6 +235,11 @@ class ChannelMessage(FrequencyInfo):
     file: Optional[str] = None
     classification: Optional[str] = None
     detail: Optional[str] = None
+    rf_hz: int = field(init=False)
+
+    def __post_init__(self):
+        super().__post_init__()
+        self.rf_hz = mhz_to_hz(self.rf)
 
 
 FrequencyList: TypeAlias = list[ConfigFrequency]
@@ -198,16 +254,133 @@ class FrequencyConfiguration:
     file_name: Optional[Path] = None
     disable_lockout: bool
     disable_priority: bool
+    watch: bool = False   # apply changes of the file while scanning
+    runtime_file: Optional[Path] = None   # run time changes (None = not kept)
+
+
+class _Lookup:
+    '''
+    Indexes of the entries for the per channel lookups
+
+    Args:
+        frequencies (FrequencyList): Entries (in list order)
+        with_baseband (bool): The baseband frequencies are set
+    '''
+
+    def __init__(self, frequencies: FrequencyList, with_baseband: bool) -> None:
+        self.singles_bb: dict[int, FrequencyList] = {}
+        self.ranges = [frequency for frequency in frequencies if not frequency.is_single]
+        self.rf_lo = np.array([frequency.rf_lo for frequency in self.ranges], dtype=np.int64)
+        self.rf_hi = np.array([frequency.rf_hi for frequency in self.ranges], dtype=np.int64)
+        self.bb_lo = np.empty(0, dtype=np.int64)
+        self.bb_hi = np.empty(0, dtype=np.int64)
+        if not with_baseband:
+            return
+        for frequency in frequencies:
+            if frequency.is_single:
+                self.singles_bb.setdefault(frequency.bb_single, []).append(frequency)
+        self.bb_lo = np.array([frequency.bb_lo for frequency in self.ranges], dtype=np.int64)
+        self.bb_hi = np.array([frequency.bb_hi for frequency in self.ranges], dtype=np.int64)
+
+    def ranges_at_bb(self, bb: int) -> list[ConfigFrequency]:
+        if len(self.bb_lo) == 0:
+            return []
+        return [self.ranges[idx] for idx in np.flatnonzero((self.bb_lo <= bb) & (bb <= self.bb_hi))]
+
+    def ranges_at_rf(self, rf_hz: int) -> list[ConfigFrequency]:
+        if len(self.rf_lo) == 0:
+            return []
+        return [self.ranges[idx] for idx in np.flatnonzero((self.rf_lo <= rf_hz) & (rf_hz <= self.rf_hi))]
+
+
+def runtime_file_for(file_name: Optional[Path]) -> Path:
+    '''
+    Default runtime file: next to the frequency file (frequencies.yaml ->
+    frequencies.runtime.yaml) or in the working directory without one
+    '''
+    if file_name is None:
+        return Path('frequencies.runtime.yaml')
+    return file_name.with_name(f'{file_name.stem}.runtime.yaml')
+
+
+def _values(frequency: ConfigFrequency) -> tuple:
+    # What an entry of the file sets besides its frequency
+    return (frequency.label, frequency.locked, frequency.priority)
+
+
+class FrequencyCache:
+    '''
+    Validated frequencies of the frequency files, one pickle file each
+
+    An entry is only used if the hash of the frequency file matches.  A
+    missing or unreadable cache just means the file gets parsed again.
+
+    Args:
+        directory (Path | None): Cache directory (None = no caching)
+    '''
+
+    def __init__(self, directory: Path | None) -> None:
+        self.directory = directory
+
+    @staticmethod
+    def digest(data: bytes) -> str:
+        return hashlib.sha256(data).hexdigest()
+
+    def _path(self, file: Path) -> Path:
+        name = hashlib.sha1(str(file.resolve()).encode('utf-8')).hexdigest()[:16]
+        return self.directory / f'frequencies-{name}.pickle'
+
+    def get(self, file: Path, digest: str) -> FrequencyList | None:
+        """Cached frequencies of the file (None if not cached or changed)"""
+        if self.directory is None:
+            return None
+        try:
+            with open(self._path(file), 'rb') as cache:
+                (version, cached_digest, frequencies) = pickle.load(cache)
+        except FileNotFoundError:
+            return None
+        except Exception as error:
+            logging.warning(f'Ignoring frequency cache of {file}: {error}')
+            return None
+        if version != CACHE_VERSION or cached_digest != digest:
+            return None
+        return frequencies
+
+    def put(self, file: Path, digest: str, frequencies: FrequencyList) -> None:
+        if self.directory is None:
+            return
+        try:
+            atomic_write(self._path(file),
+                         pickle.dumps((CACHE_VERSION, digest, frequencies),
+                                      protocol=pickle.HIGHEST_PROTOCOL))
+        except OSError as error:
+            logging.warning(f'Could not write frequency cache of {file}: {error}')
+
+
+def _default_cache() -> FrequencyCache:
+    try:
+        return FrequencyCache(cache_dir())
+    except OSError as error:
+        logging.warning(f'Frequency cache disabled: {error}')
+        return FrequencyCache(None)
 
 
 class FrequencyManager:
 
-    def __init__(self, config: FrequencyConfiguration, channel_spacing: int) -> None:
+    def __init__(self, config: FrequencyConfiguration, channel_spacing: int,
+                 cache: FrequencyCache | None=None) -> None:
 
         self.channel_spacing = channel_spacing   # used for frequency conversions
         self.center_freq = None
         self.config = config
         self.frequencies: FrequencyList = []
+        self.index: dict[tuple, ConfigFrequency] = {}  # by ConfigFrequency.key
+        self.cache = cache if cache is not None else _default_cache()
+        # mtime/size and entry values of the file when it was last read
+        self.file_stat: tuple[int, int] | None = None
+        self.file_entries: dict[tuple, tuple] = {}
+        self.save_handle: asyncio.TimerHandle | None = None
+        self._lookup: _Lookup | None = None   # built on first use after a change
 
     async def process_frequencies_data(self, frequencies_config) -> FrequencyList:
         """Process pre-loaded frentryequencies configuration data."""
@@ -220,31 +393,144 @@ class FrequencyManager:
         return self.frequencies
 
     async def load(self) -> FrequencyList:
-        """Load frequencies from the configured file."""
+        """Load frequencies from the configured file.
+
+        Replaces the frequencies (including those added at run time)
+        """
+        if any(not frequency.saved for frequency in self.frequencies):
+            self.schedule_save()  # the run time changes are dropped
+        self.frequencies = []
+        self.index = {}
+        self._lookup = None
+        self.file_stat = None
+        self.file_entries = {}
 
         if not self.config.file_name:
-            self.frequencies = []
-            return []
+            return self.frequencies
 
         file = self.config.file_name
         if not file.exists():
             raise FileNotFoundError(f'Frequency file does not exist: {file}')
 
+        (frequencies, self.file_stat) = self._read_file(file)
+        for frequency in frequencies:
+            self._insert(frequency)
+        self.file_entries = {frequency.key: _values(frequency) for frequency in frequencies}
+        return self.frequencies
+
+    async def reload(self) -> bool:
+        """Apply the changes of the frequency file since it was read
+
+        Returns at once if the modification time and size of the file are
+        unchanged.  The file is read in a thread so the scan goes on.  An
+        invalid file is logged and the frequencies are left as they are.
+
+        Returns:
+            bool: The frequencies changed
+        """
+        file = self.config.file_name
+        if not file:
+            return False
+        try:
+            stat = file.stat()
+        except FileNotFoundError:
+            return False  # being replaced, try again later
+        if (stat.st_mtime_ns, stat.st_size) == self.file_stat:
+            return False
+
+        try:
+            (frequencies, self.file_stat) = await asyncio.to_thread(self._read_file, file)
+        except Exception as error:
+            logging.error(f'Keeping the frequencies, could not reload {file}: {error}')
+            self.file_stat = (stat.st_mtime_ns, stat.st_size)  # wait for the next change
+            return False
+
+        return self._apply_file(frequencies)
+
+    def _apply_file(self, frequencies: FrequencyList) -> bool:
+        # Compare with the file as last read so run time changes of the
+        # entries that did not change in the file are kept
+        entries = {frequency.key: frequency for frequency in frequencies}
+        (added, changed) = (0, 0)
+        dropped = False  # run time changes replaced or removed by the file
+        for (key, frequency) in entries.items():
+            values = _values(frequency)
+            if self.file_entries.get(key) == values:
+                continue
+            existing = self.index.get(key)
+            if existing is None:
+                self._insert(frequency)
+                added += 1
+            else:  # changed in the file or now in the file (added at run time)
+                dropped = dropped or not existing.saved
+                (existing.label, existing.locked, existing.priority) = values
+                existing.saved = True
+                existing.mode = None
+                changed += 1
+
+        removed = {key for key in self.file_entries if key not in entries}
+        if removed:
+            dropped = dropped or any(not self.index[key].saved
+                                     for key in removed if key in self.index)
+            self.frequencies[:] = [frequency for frequency in self.frequencies
+                                   if frequency.key not in removed]
+            for key in removed:
+                self.index.pop(key, None)
+            self._lookup = None
+
+        self.file_entries = {key: _values(frequency) for (key, frequency) in entries.items()}
+        if dropped:
+            self.schedule_save()  # so restore() does not bring them back
+        logging.debug(f'Reloaded {self.config.file_name}: {added} added, '
+                      f'{len(removed)} removed, {changed} changed')
+        return bool(added or removed or changed)
+
+    def _read_file(self, file: Path) -> tuple[FrequencyList, tuple[int, int]]:
+        # Validated entries of the file (from the cache if it is unchanged)
+        # and its modification time and size.  Does not change the manager.
+        stat = file.stat()
+        file_stat = (stat.st_mtime_ns, stat.st_size)
+        data = file.read_bytes()
+        digest = self.cache.digest(data)
+        cached = self.cache.get(file, digest)
+        if cached is not None:
+            logging.debug(f'Loading {len(cached)} frequencies of {file} from cache')
+            return (cached, file_stat)
+
         logging.debug(f'Loading frequencies from {file}')
-        with file.open(mode='r') as file:
-            try:
-                frequencies_config = yaml.safe_load(file)
-            except yaml.YAMLError as e:
-                if hasattr(e, 'problem_mark'):
-                    logging.error(
-                        f'{e.problem_mark} {e.problem} {e.context if e.context else ""}')
-                else:
-                    logging.error(
-                        f'Something went wrong while parsing yaml file: {file}')
-                raise Exception(
-                    "Invalid yaml frequency file (enable debugging for more info)")
-
-            return await self.process_frequencies_data(frequencies_config)
+        if file.suffix.lower() == '.csv':
+            # Local import avoids a circular import (the import builds ConfigFrequency)
+            from frequency_import import import_csv
+
+            result = import_csv(data.decode('utf-8-sig'))
+            result.log(str(file))
+            self.cache.put(file, digest, result.frequencies)
+            return (result.frequencies, file_stat)
+
+        try:
+            frequencies_config = yaml.load(data, Loader=YamlLoader)
+        except yaml.YAMLError as e:
+            if hasattr(e, 'problem_mark'):
+                logging.error(
+                    f'{e.problem_mark} {e.problem} {e.context if e.context else ""}')
+            else:
+                logging.error(
+                    f'Something went wrong while parsing yaml file: {file}')
+            raise Exception(
+                "Invalid yaml frequency file (enable debugging for more info)")
+
+        frequencies: FrequencyList = []
+        keys: set[tuple] = set()
+        if 'frequencies' in frequencies_config:
+            for freq in frequencies_config['frequencies']:
+                wanted = ConfigFrequency(**{**freq, 'saved': True})
+                if wanted.key in keys:
+                    raise ValueError(f'Frequency {wanted} already occurs in list')
+                keys.add(wanted.key)
+                frequencies.append(wanted)
+
+        self.cache.put(file, digest, frequencies)
+        return (frequencies, file_stat)
 
     async def add(self, entry: dict) -> FrequencyList:
         '''
@@ -266,21 +552,22 @@ class FrequencyManager:
         '''
         wanted = ConfigFrequency(**entry)
 
-        # use the dataclass __eq__ functions to look for matches
-        matching_frequencies = [existing for existing in self.frequencies
-                                if wanted == existing]
-
-        if len(matching_frequencies) > 0:  # Already one occurance so this is an error
+        if wanted.key in self.index:  # Already one occurance so this is an error
             raise ValueError(
                 f'Frequency {wanted} already occurs in list')
 
+        self._insert(wanted)
+
+        return self.frequencies
+
+    def _insert(self, frequency: ConfigFrequency) -> None:
         # add the basband if center frequency has been set
         if self.center_freq:
-            wanted.calculate_baseband(self.center_freq, self.channel_spacing)
+            frequency.calculate_baseband(self.center_freq, self.channel_spacing)
 
-        self.frequencies.append(wanted)
-
-        return self.frequencies
+        self.frequencies.append(frequency)
+        self.index[frequency.key] = frequency
+        self._lookup = None
 
     async def change(self, entry: dict) -> FrequencyList:
         '''
@@ -299,22 +586,93 @@ class FrequencyManager:
         new_values = ConfigFrequency(**entry)
 
         # Find the matching frequency
-        for frequency in self.frequencies:
-            # Use the __eq__ method that's already defined in ConfigFrequency
-            if frequency == new_values:
-                # Update fields if they exist in the entry
-                for field in ['label', 'priority', 'locked']:
-                    if field in entry:
-                        setattr(frequency, field, entry[field])
+        frequency = self.index.get(new_values.key)
+        if frequency is not None:
+            # Update fields if they exist in the entry
+            for field in ['label', 'priority', 'locked']:
+                if field in entry:
+                    setattr(frequency, field, entry[field])
+            frequency.saved = False
+            self.schedule_save()
 
-                return self.frequencies
+            return self.frequencies
 
         if 'mode' in entry and entry['mode'] == 'add':
-            return await self.add(entry)
+            frequencies = await self.add(entry)
+            self.schedule_save()
+            return frequencies
 
         raise ValueError(
             f'Frequency {entry} not found in frequencies list')
 
+    def runtime_entries(self) -> list[dict]:
+        '''
+        The unsaved entries as written to the runtime file
+        '''
+        entries = []
+        for frequency in self.frequencies:
+            if frequency.saved:
+                continue
+            if frequency.is_single:
+                entry = {'single': frequency.single}
+            else:
+                entry = {'lo': frequency.lo, 'hi': frequency.hi}
+            entry.update(label=frequency.label, locked=frequency.locked,
+                         priority=frequency.priority)
+            entries.append(entry)
+        return entries
+
+    def schedule_save(self) -> None:
+        '''
+        Write the runtime file SAVE_DELAY seconds after the first change
+        (later changes until then are written along)
+        '''
+        if self.config.runtime_file is None or self.save_handle is not None:
+            return
+        self.save_handle = asyncio.get_running_loop().call_later(SAVE_DELAY, self.save)
+
+    def save(self) -> None:
+        '''
+        Write the runtime file now (if a write is due)
+        '''
+        if self.save_handle is None:
+            return
+        self.save_handle.cancel()
+        self.save_handle = None
+
+        file = self.config.runtime_file
+        entries = self.runtime_entries()
+        data = yaml.safe_dump({'frequencies': entries}, sort_keys=False)
+        try:
+            atomic_write(file, data.encode('utf-8'))
+            logging.debug(f'Saved {len(entries)} run time frequencies to {file}')
+        except OSError as error:
+            logging.error(f'Could not save run time frequencies to {file}: {error}')
+
+    async def restore(self) -> FrequencyList:
+        '''
+        Apply the run time changes of the previous session (runtime file).
+        Entries that are no longer valid are logged and skipped.
+        '''
+        file = self.config.runtime_file
+        if file is None or not file.exists():
+            return self.frequencies
+
+        try:
+            runtime_config = yaml.load(file.read_bytes(), Loader=YamlLoader) or {}
+        except (OSError, yaml.YAMLError) as error:
+            logging.error(f'Ignoring run time frequencies {file}: {error}')
+            return self.frequencies
+
+        for entry in runtime_config.get('frequencies') or []:
+            try:
+                await self.change({**entry, 'mode': 'add'})
+            except (TypeError, ValueError) as error:
+                logging.error(f'Ignoring run time frequency {entry}: {error}')
+
+        logging.debug(f'Restored {len(self.runtime_entries())} run time frequencies from {file}')
+        return self.frequencies
+
     def set_center(self, center_freq: int) -> FrequencyList:
         '''
         When the center frequency changes, we need to regenerate the baseband frequencies.
@@ -340,11 +698,10 @@ class FrequencyManager:
         if self.config.disable_lockout:
             return False
 
-        for frequency in self.frequencies:
-            if frequency.locks_out(bb):
-                return True
-
-        return False
+        lookup = self.lookup()
+        if any(frequency.locked for frequency in lookup.singles_bb.get(bb, ())):
+            return True
+        return any(frequency.locked for frequency in lookup.ranges_at_bb(bb))
 
     def is_priority(self, bb: int) -> int | None:
         '''
@@ -359,17 +716,14 @@ class FrequencyManager:
         Args:
             bb (int): Baseband frequency of tuned channel
         '''
-        lowest: int | None = None
-        for frequency in self.frequencies:
-            priority = frequency.get_priority_at(bb)
-            if priority is not None:
-                if frequency.single:
-                    return priority
-                else:
-                    if lowest is None or priority < lowest:
-                        lowest = priority
+        lookup = self.lookup()
+        for frequency in lookup.singles_bb.get(bb, ()):
+            if frequency.priority is not None:
+                return frequency.priority
 
-        return lowest
+        priorities = [frequency.priority for frequency in lookup.ranges_at_bb(bb)
+                      if frequency.priority is not None]
+        return min(priorities, default=None)
 
     def is_higher_priority(self, channel_bb: int, demod_freq: int) -> bool:
         '''
@@ -402,6 +756,24 @@ class FrequencyManager:
             return False
 
 
+    def interest_frequencies(self) -> list[int]:
+        '''
+        Frequencies in Hz worth placing the range steps on: the unlocked
+        singles and ranges (at the channel spacing) that have a priority or
+        a label
+        '''
+        interest: list[int] = []
+        for frequency in self.frequencies:
+            if frequency.locked or (frequency.priority is None and not frequency.label):
+                continue
+            if frequency.is_single:
+                interest.append(frequency.rf_single)
+            else:
+                interest.extend(range(frequency.rf_lo, frequency.rf_hi + 1,
+                                      self.channel_spacing))
+
+        return interest
+
     def generate_baseband_frequencies(self) -> None:
         '''
         Generate frequencies in baseband.  The scanner
@@ -410,6 +782,15 @@ class FrequencyManager:
         for frequency in self.frequencies:
             frequency.calculate_baseband(
                 self.center_freq, self.channel_spacing)
+        self._lookup = None
+
+    def lookup(self) -> _Lookup:
+        '''
+        Indexes for the lookups (built again after a change)
+        '''
+        if self._lookup is None:
+            self._lookup = _Lookup(self.frequencies, bool(self.center_freq))
+        return self._lookup
 
 
     def get_label(self, rf: float) -> str | None:
@@ -418,18 +799,20 @@ class FrequencyManager:
         return the label for the range of frequencies (if any)
 
         Args:
-            rf (float): Radio frequency of tuned channel
+            rf (float): Radio frequency of tuned channel in MHz
         '''
-        range_label: str | None = None
-        for freq_entry in self.frequencies:
-            if freq_entry.is_single:
-                if freq_entry.single == rf:
-                    return freq_entry.label
-            else:
-                if freq_entry.lo <= rf <= freq_entry.hi:
-                    range_label = freq_entry.label
+        return self.label_at(mhz_to_hz(rf))
+
+    def label_at(self, rf_hz: int) -> str | None:
+        '''
+        Same as get_label for a radio frequency in Hz
+        '''
+        single = self.index.get(('single', rf_hz))
+        if single is not None:
+            return single.label
 
-        return range_label
+        ranges = self.lookup().ranges_at_rf(rf_hz)
+        return ranges[-1].label if ranges else None
 
 
 async def main() -> None:  # pragma: no cover
@@ -8,18 +8,37 @@ Created on Sat Jul 18 15:21:33 2015
 
 # from optparse import OptionParser
 from argparse import ArgumentParser
+import os
 from pathlib import Path
 from channel_loggers import ChannelLogParams
 from classification import ClassifierParams
-from center_frequency_provider import FrequencyRangeParams, FrequencySingleParams, FrequencyGroup
-from frequency_manager import FrequencyConfiguration
+from center_frequency_provider import FrequencyRangeParams, FrequencySingleParams, FrequencyGroup, SCHEDULES
+from frequency_manager import FrequencyConfiguration, runtime_file_for
+from detection import DetectionParams, AVERAGE_MODES, THRESHOLD_MODES
+from devices import DeviceParams
+from recording_formats import WAV_SUBFORMATS, RECORD_FORMATS, check_record_format
+from recording_store import StoreParams, SEGMENT_MB
+from tmp_recordings import TmpAreaParams, RAM_DIR, BUDGET_MB, area_directory
 
 class CLParser(object):
     """Command line parser
 
     Attributes:
         hw_args (string): Argument string to pass to hardware
+        devices (list[DeviceParams]): Hardware args and frequencies of each device
+            (the first one is from the -a and -f options)
         num_demod (int): Number of parallel demodulators
+        shared_frontend (bool): Demodulators share a sub-band decimation front end
+        demod_workers (int): Worker processes for the demodulators (0 = none)
+        iq_ring (str | None): Shared-memory ring name for the hardware IQ
+        baseband_ring (str | None): Shared-memory ring name prefix for the
+            baseband of each demodulator
+        stream_port (int): TCP port for the audio streams (0 = no streaming)
+        record_format (str): Format of the recordings (wav, flac or opus)
+        record_store (StoreParams | None): Recording store options (None = one
+            file per recording)
+        tmp_area (TmpAreaParams): RAM backed directory and memory budget for
+            the recordings that are not accepted yet
         frequency_params (FrequencyParams): Requested RF center frequency or range in Hz
         ask_samp_rate (int): Asking sample rate of hardware in sps (1E6 min)
         gains : Enumerated gain types and values
@@ -31,6 +50,8 @@ class CLParser(object):
         frequency_file_name (Path): Name of file with frequencies
         disable_lockout (bool): Disable locking out of channels
         disable_priority (bool): Disable prioritization out of channels
+        watch_frequencies (bool): Apply changes of the frequency file while scanning
+        runtime_frequencies (Path | None): File keeping the changes made while scanning
         auto_priority (bool): Automatically set priority channels
         channel_log_target (string): Name of file or endpoint for channel logging
         channel_log_type (string): Log file type for channel detection
@@ -43,6 +64,7 @@ class CLParser(object):
         freq_low (int): Low frequency for channels
         freq_high (int): High frequency for channels
         min_duration (float): Minimum length of a recording in seconds
+        detection_params (DetectionParams): FFT size and rates for channel detection
     """
     # pylint: disable=too-few-public-methods
     # pylint: disable=too-many-instance-attributes
@@ -64,9 +86,37 @@ class CLParser(object):
                           default=0,
                           help="Type of demodulator (0=NBFM, 1=AM and 2=WBFM)")
 
+        parser.add_argument("--shared_frontend", dest="shared_frontend",
+                          action="store_true",
+                          help="Demodulators share a sub-band decimation front end")
+
+        parser.add_argument("--demod_workers", type=int, dest="demod_workers",
+                          default=0,
+                          help="Run the demodulators in this many worker processes (0=in process)")
+
+        parser.add_argument("--iq_ring", type=str, dest="iq_ring",
+                          default=None,
+                          help="Publish the hardware IQ to this shared-memory ring")
+
+        parser.add_argument("--baseband_ring", type=str, dest="baseband_ring",
+                          default=None,
+                          help="Publish the baseband of each demodulator to "
+                          "shared-memory rings with this prefix (PREFIX-<channel>)")
+
+        parser.add_argument("--stream_port", type=int, dest="stream_port",
+                          default=0,
+                          help="Stream the audio of each demodulator and the mix "
+                          "on this local TCP port (0=off)")
+
         parser.add_argument("-f", "--freq", type=str, dest="freq_spec",
                           nargs='+', default=["146"],
                           help="Hardware RF center frequency or range in Mhz")
+
+        parser.add_argument("--device", type=str, dest="device_spec",
+                          nargs='+', action='append', default=[],
+                          metavar=('HW_ARGS', 'FREQ'),
+                          help="Additional device: hardware args followed by "
+                          "its center frequencies or ranges in Mhz (repeat for more devices)")
         
         parser.add_argument("--quiet_timeout", type=int,
                           dest="quiet_timeout", default=12,
@@ -76,6 +126,34 @@ class CLParser(object):
                           dest="active_timeout", default=20,
                           help="Timeout when there is activity")
 
+        parser.add_argument("--schedule", type=str, dest="schedule",
+                          default='round_robin', choices=list(SCHEDULES),
+                          help="Order and dwell of the range steps (activity = "
+                          "busy steps more often and longer)")
+
+        parser.add_argument("--max_revisit", type=float, dest="max_revisit",
+                          default=120,
+                          help="Longest time in seconds before a step is "
+                          "visited again (activity schedule)")
+
+        parser.add_argument("--plan_steps", dest="plan_steps",
+                          action="store_true",
+                          help="Place the range steps on the labelled and "
+                          "priority frequencies of the frequency file")
+
+        parser.add_argument("--survey_dwell", type=float, dest="survey_dwell",
+                          default=1.0,
+                          help="Seconds on each step during a survey (survey schedule)")
+
+        parser.add_argument("--resurvey", type=float, dest="resurvey",
+                          default=600,
+                          help="Seconds between surveys (survey schedule)")
+
+        parser.add_argument("--min_duty", type=float, dest="min_duty",
+                          default=0.01,
+                          help="Duty cycle of a channel that makes its step "
+                          "active (survey schedule)")
+
         parser.add_argument("-r", "--rate", type=float, dest="ask_samp_rate",
                           default=4E6,
                           help="Hardware ask sample rate in sps (1E6 minimum)")
@@ -125,6 +203,46 @@ class CLParser(object):
                           dest="threshold_db", default=10,
                           help="Threshold in dB")
 
+        parser.add_argument("--fft_length", type=int, dest="fft_length",
+                          default=0,
+                          help="Detection FFT size in bins, power of two (0 = based on sample rate)")
+
+        parser.add_argument("--fft_resolution", type=float, dest="fft_resolution",
+                          default=0,
+                          help="Detection FFT bin size in Hz, used if no FFT size (0 = default)")
+
+        parser.add_argument("--fft_rate", type=float, dest="fft_rate",
+                          default=1000,
+                          help="Detection FFT vectors per second")
+
+        parser.add_argument("--average", type=str, dest="average",
+                          default="boxcar", choices=AVERAGE_MODES,
+                          help="Detection spectrum averaging mode")
+
+        parser.add_argument("--alpha", type=float, dest="alpha",
+                          default=0,
+                          help="Exponential averaging factor (0 = based on probe rate)")
+
+        parser.add_argument("--probe_rate", type=float, dest="probe_rate",
+                          default=10,
+                          help="Detection spectra per second provided to the scanner")
+
+        parser.add_argument("--threshold_mode", type=str, dest="threshold_mode",
+                          default="absolute", choices=THRESHOLD_MODES,
+                          help="Threshold is absolute or relative to the noise floor")
+
+        parser.add_argument("--floor_window", type=float, dest="floor_window",
+                          default=3,
+                          help="Seconds of spectra used to estimate the noise floor")
+
+        parser.add_argument("--floor_percentile", type=float, dest="floor_percentile",
+                          default=25,
+                          help="Percentile of the noise floor window used as the floor")
+
+        parser.add_argument("--retune_settle", type=float, dest="retune_settle",
+                          default=0.05,
+                          help="Seconds of spectrum discarded after a retune")
+
         parser.add_argument("-w", "--write",
                           dest="record", default=False, action="store_true",
                           help="Record (write) channels to disk")
@@ -132,12 +250,22 @@ class CLParser(object):
         parser.add_argument("-F", "--frequencies", type=Path,
                           dest="frequency_file_name",
                           default=None,
-                          help="YAML file containing frequencies and ranges in Mhz")
+                          help="YAML (or CSV) file containing frequencies and ranges in Mhz")
 
         parser.add_argument("--disable-lockout", action="store_true",
                           dest="disable_lockout",
                           help="Disable locking out of channels")
 
+        parser.add_argument("--watch-frequencies", action="store_true",
+                          dest="watch_frequencies",
+                          help="Apply changes of the frequency file while scanning")
+
+        parser.add_argument("--runtime-frequencies", type=str,
+                          dest="runtime_frequencies", default=None,
+                          help="YAML file keeping lockouts and priorities added "
+                          "while scanning (default next to the frequency file, "
+                          "none = not kept)")
+
         parser.add_argument("--disable-priority", action="store_true",
                           dest="disable_priority",
                           help="Disable prioritization of channels")
@@ -170,8 +298,32 @@ class CLParser(object):
                           help="Mute audio from speaker (still allows recording)")
 
         parser.add_argument("-b", "--bps", type=int, dest="audio_bps",
-                          default=16,
+                          default=16, choices=sorted(WAV_SUBFORMATS),
                           help="Audio bit depth (bps)")
+
+        parser.add_argument("--record_format", type=str, dest="record_format",
+                          default='wav', choices=list(RECORD_FORMATS),
+                          help="Format of the recordings (flac and opus are "
+                          "encoded in the background)")
+
+        parser.add_argument("--record_store", type=str, dest="record_store",
+                          default=None,
+                          help="Append the recordings to segment files with an "
+                          "index in this directory")
+
+        parser.add_argument("--segment_mb", type=int, dest="segment_mb",
+                          default=SEGMENT_MB,
+                          help="Size of the recording store segment files in MiB")
+
+        parser.add_argument("--tmp_dir", type=str, dest="tmp_dir",
+                          default=RAM_DIR,
+                          help="RAM backed directory for recordings that are "
+                          "not accepted yet ('none' = wav/tmp on disk)")
+
+        parser.add_argument("--tmp_budget_mb", type=int, dest="tmp_budget_mb",
+                          default=BUDGET_MB,
+                          help="Most MiB of recordings kept in the RAM backed "
+                          "directory before recording to disk")
         
         parser.add_argument("-M", "--max_db", type=float, dest="max_db",
                           default=50,
@@ -217,41 +369,32 @@ class CLParser(object):
         self.hw_args = str(options.hw_args)
         self.num_demod = int(options.num_demod)
         self.type_demod = int(options.type_demod)
+        self.shared_frontend = bool(options.shared_frontend)
+        self.demod_workers = int(options.demod_workers)
+        if self.demod_workers < 0:
+            parser.error(f'--demod_workers must not be negative: {self.demod_workers}')
+        self.iq_ring = options.iq_ring
+        self.baseband_ring = options.baseband_ring
+        self.stream_port = int(options.stream_port)
+        if not 0 <= self.stream_port <= 65535:
+            parser.error(f'--stream_port must be a TCP port: {self.stream_port}')
 
         self.ask_samp_rate = int(options.ask_samp_rate)
 
         # this handles multiple -f option (frequency or frequency range in Hz)
-        single_freq: int
-        lower_freq: int
-        upper_freq: int
-        single_params: list[FrequencySingleParams] = []
-        range_params: list[FrequencyRangeParams] = []
         self.frequency_params: FrequencyGroup
-        for freq_entry in options.freq_spec:
-            try:
-                (lower_freq, upper_freq) = freq_entry.split('-')
-                # there are 2 values provided
-                try:
-                    if lower_freq:
-                        lower_freq = int(float(lower_freq)*1E6)
-                    if upper_freq:
-                        upper_freq = int(float(upper_freq)*1E6)
-                except ValueError as err:
-                    raise Exception(f'Frequencies must be integers: {err}')
-                range_params.append(FrequencyRangeParams(lower_freq=lower_freq, upper_freq=upper_freq))
-            except ValueError:
-                # there is a single value provided
-                try:
-                    single_freq = int(float(freq_entry)*1E6)
-                    single_params.append(FrequencySingleParams(freq=single_freq))
-                except ValueError as err:
-                    raise Exception(f'Frequency must be integers: {err}')
+        self.frequency_params = self._frequency_group(options.freq_spec, options)
+
+        # first device is the -a/-f one, then any --device
+        self.devices: list[DeviceParams] = [
+            DeviceParams(hw_args=self.hw_args, frequency_params=self.frequency_params)]
+        for device_spec in options.device_spec:
+            if len(device_spec) < 2:
+                parser.error(f'--device needs hardware args and at least one frequency: {device_spec}')
+            self.devices.append(DeviceParams(
+                hw_args=device_spec[0],
+                frequency_params=self._frequency_group(device_spec[1:], options)))
 
-        self.frequency_params =  FrequencyGroup(ranges=range_params, singles=single_params,
-                                                sample_rate=self.ask_samp_rate,
-                                                quiet_timeout=int(options.quiet_timeout),
-                                                active_timeout=int(options.active_timeout))
-        
         self.gains = [
             { "name": "RF", "value": float(options.rf_gain_db) },
             { "name": "LNA","value": float(options.lna_gain_db) },
@@ -268,15 +411,35 @@ class CLParser(object):
         self.squelch_db = int(options.squelch_db)
         self.volume_db = int(options.volume_db)
         self.threshold_db = int(options.threshold_db)
+        self.detection_params = DetectionParams(
+            fft_length=int(options.fft_length),
+            resolution=float(options.fft_resolution),
+            fft_rate=float(options.fft_rate),
+            average=str(options.average),
+            alpha=float(options.alpha),
+            probe_rate=float(options.probe_rate),
+            threshold=str(options.threshold_mode),
+            floor_window=float(options.floor_window),
+            floor_percentile=float(options.floor_percentile),
+            retune_settle=float(options.retune_settle)
+        )
         self.record = bool(options.record)
         self.play = bool(options.play)
         self.auto_priority = bool(options.auto_priority)
 
         file_name = Path(options.frequency_file_name) if options.frequency_file_name else None
+        if options.runtime_frequencies is None:
+            runtime_file = runtime_file_for(file_name)
+        elif options.runtime_frequencies.lower() == 'none':
+            runtime_file = None
+        else:
+            runtime_file = Path(options.runtime_frequencies)
         self.frequency_configuration = FrequencyConfiguration(
             file_name=file_name,
             disable_lockout=bool(options.disable_lockout),
-            disable_priority=bool(options.disable_priority)
+            disable_priority=bool(options.disable_priority),
+            watch=bool(options.watch_frequencies),
+            runtime_file=runtime_file
         )
 
         self.channel_log_params = ChannelLogParams(
@@ -286,6 +449,29 @@ class CLParser(object):
         )
         self.freq_correction = int(options.freq_correction)
         self.audio_bps = int(options.audio_bps)
+        self.record_format = options.record_format
+        try:
+            check_record_format(self.record_format)
+        except ValueError as error:
+            parser.error(str(error))
+
+        self.record_store: StoreParams | None = None
+        if options.record_store is not None:
+            try:
+                self.record_store = StoreParams(directory=options.record_store,
+                                                segment_mb=int(options.segment_mb))
+            except ValueError as error:
+                parser.error(str(error))
+        # The RAM backed directory is only used if it exists
+        tmp_dir = None
+        if options.tmp_dir.lower() != 'none' and os.path.isdir(options.tmp_dir):
+            tmp_dir = area_directory(options.tmp_dir)
+        try:
+            self.tmp_area = TmpAreaParams(directory=tmp_dir,
+                                          budget_mb=int(options.tmp_budget_mb))
+        except ValueError as error:
+            parser.error(str(error))
+
         self.max_db = float(options.max_db)
         self.min_db = float(options.min_db)
         self.channel_spacing = int(options.channel_spacing)
@@ -313,6 +499,49 @@ class CLParser(object):
 
         self.debug = bool(options.debug)
 
+    def _frequency_group(self, freq_spec: list[str], options) -> FrequencyGroup:
+        """Convert frequencies and ranges (-f format) in MHz to a FrequencyGroup
+
+        Args:
+            freq_spec (list[str]): Frequencies (e.g. 146) or ranges (e.g. 144-148)
+            options: Parsed options for the sample rate and timeouts
+        """
+        single_freq: int
+        lower_freq: int
+        upper_freq: int
+        single_params: list[FrequencySingleParams] = []
+        range_params: list[FrequencyRangeParams] = []
+        for freq_entry in freq_spec:
+            try:
+                (lower_freq, upper_freq) = freq_entry.split('-')
+                # there are 2 values provided
+                try:
+                    if lower_freq:
+                        lower_freq = int(float(lower_freq)*1E6)
+                    if upper_freq:
+                        upper_freq = int(float(upper_freq)*1E6)
+                except ValueError as err:
+                    raise Exception(f'Frequencies must be integers: {err}')
+                range_params.append(FrequencyRangeParams(lower_freq=lower_freq, upper_freq=upper_freq))
+            except ValueError:
+                # there is a single value provided
+                try:
+                    single_freq = int(float(freq_entry)*1E6)
+                    single_params.append(FrequencySingleParams(freq=single_freq))
+                except ValueError as err:
+                    raise Exception(f'Frequency must be integers: {err}')
+
+        return FrequencyGroup(ranges=range_params, singles=single_params,
+                              sample_rate=self.ask_samp_rate,
+                              quiet_timeout=int(options.quiet_timeout),
+                              active_timeout=int(options.active_timeout),
+                              schedule=options.schedule,
+                              max_revisit=float(options.max_revisit),
+                              survey_dwell=float(options.survey_dwell),
+                              resurvey=float(options.resurvey),
+                              min_duty=float(options.min_duty),
+                              plan_steps=bool(options.plan_steps))
+
 def main():
     """Test the parser"""
 
@@ -321,12 +550,27 @@ def main():
     print("hw_args:             " + parser.hw_args)
     print("num_demod:           " + str(parser.num_demod))
     print("type_demod:          " + str(parser.type_demod))
+    print("shared_frontend:     " + str(parser.shared_frontend))
+    print("demod_workers:       " + str(parser.demod_workers))
+    print("iq_ring:             " + str(parser.iq_ring))
+    print("baseband_ring:       " + str(parser.baseband_ring))
+    print("stream_port:         " + str(parser.stream_port))
     single_freqs = [f'{single.freq}' for single in parser.frequency_params.singles]
     range_freqs = [f'{range.lower_freq}-{range.upper_freq}' for range in parser.frequency_params.ranges]
     print("single frequencies:  " + str(single_freqs))
     print("range frequencies:   " + str(range_freqs))
     print("quiet timeout:       " + str(parser.frequency_params.quiet_timeout))
     print("active timeout:      " + str(parser.frequency_params.active_timeout))
+    print("schedule:            " + parser.frequency_params.schedule)
+    print("max revisit:         " + str(parser.frequency_params.max_revisit))
+    print("survey dwell:        " + str(parser.frequency_params.survey_dwell))
+    print("resurvey:            " + str(parser.frequency_params.resurvey))
+    print("min duty:            " + str(parser.frequency_params.min_duty))
+    print("plan steps:          " + str(parser.frequency_params.plan_steps))
+    for device in parser.devices[1:]:
+        singles = [f'{single.freq}' for single in device.frequency_params.singles]
+        ranges = [f'{range.lower_freq}-{range.upper_freq}' for range in device.frequency_params.ranges]
+        print("device:              " + device.hw_args + " " + str(singles + ranges))
     print("ask_samp_rate:       " + str(parser.ask_samp_rate))
     for gain in parser.gains:
         #print(str(gain["value"]))
@@ -335,6 +579,16 @@ def main():
     print("squelch_db:          " + str(parser.squelch_db))
     print("volume_db:           " + str(parser.volume_db))
     print("threshold_db:        " + str(parser.threshold_db))
+    print("fft_length:          " + str(parser.detection_params.fft_length))
+    print("fft_resolution:      " + str(parser.detection_params.resolution))
+    print("fft_rate:            " + str(parser.detection_params.fft_rate))
+    print("average:             " + str(parser.detection_params.average))
+    print("alpha:               " + str(parser.detection_params.alpha))
+    print("probe_rate:          " + str(parser.detection_params.probe_rate))
+    print("threshold_mode:      " + str(parser.detection_params.threshold))
+    print("floor_window:        " + str(parser.detection_params.floor_window))
+    print("floor_percentile:    " + str(parser.detection_params.floor_percentile))
+    print("retune_settle:       " + str(parser.detection_params.retune_settle))
     print("record:              " + str(parser.record))
     print("play:                " + str(parser.play))
     print("frequency_file_name: " + str(parser.frequency_configuration.file_name))
@@ -343,6 +597,9 @@ def main():
     print("channel_log type:    " + str(parser.channel_log_params.type))
     print("freq_correction:     " + str(parser.freq_correction))
     print("audio_bps:           " + str(parser.audio_bps))
+    print("record_format:       " + parser.record_format)
+    print("record_store:        " + str(parser.record_store))
+    print("tmp_area:            " + str(parser.tmp_area))
     print("max_db:              " + str(parser.max_db))
     print("min_db:              " + str(parser.min_db))
     print("channel_spacing:     " + str(parser.channel_spacing))
@@ -355,6 +612,8 @@ def main():
     print("auto_priority:       " + str(parser.auto_priority))
     print("disable_lockout:     " + str(parser.frequency_configuration.disable_lockout))
     print("disable_priority:    " + str(parser.frequency_configuration.disable_priority))
+    print("watch_frequencies:   " + str(parser.frequency_configuration.watch))
+    print("runtime_frequencies: " + str(parser.frequency_configuration.runtime_file))
     print("debug:               " + str(parser.debug))
 
 if __name__ == '__main__':
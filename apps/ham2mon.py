@@ -28,7 +28,7 @@ class MyDisplay():
         curs_set(0)
         self.stdscr.nodelay(True)
 
-        self.scanner = await self.init_scanner()
+        self.group = await self.init_scanner()
 
         await self.make_display()
 
@@ -37,16 +37,19 @@ class MyDisplay():
 
             if char == ord('Q'):
                 break
-            if char == ERR:
-                await asyncio.sleep(0.1)
-            elif char == KEY_RESIZE:
+            if char == KEY_RESIZE:
                 await self.make_display()
-            else:
+            elif char != ERR:
                 await self.handle_char(char)
 
             await self.cycle()
 
-        await self.scanner.clean_up()
+        await self.group.clean_up()
+
+    @property
+    def scanner(self) -> scnr.Scanner:
+        """Scanner of the device selected in the interface"""
+        return self.group.scanner
 
     async def make_display(self) -> None:
         """Start scanner with GUI interface
@@ -66,8 +69,8 @@ class MyDisplay():
         self.lockoutwin = cursesgui.LockoutWindow(self.stdscr)
         self.rxwin = cursesgui.RxWindow(self.stdscr)
 
-        # Get the initial settings for GUI
-        self.rxwin.gains = self.scanner.filter_and_set_gains(PARSER.gains)
+        # Get the settings of the selected device for GUI
+        self.rxwin.gains = self.scanner.gains
         self.rxwin.center_freq = self.scanner.center_freq
         self.rxwin.step = self.scanner.step
         self.rxwin.steps = self.scanner.steps
@@ -89,6 +92,7 @@ class MyDisplay():
         self.specwin.min_db = PARSER.min_db
         self.rxwin.classifier_params = PARSER.classifier_params
         self.specwin.threshold_db = self.scanner.threshold_db
+        self.rxwin.devices = self.group.status()
 
         self.chanwin.draw_frame()
         self.lockoutwin.draw_frame()
@@ -99,26 +103,27 @@ class MyDisplay():
     async def cycle(self) -> None:
         # Initiate a scan cycle
 
-        # No need to go faster than 10 Hz rate of GNU Radio probe
-        await asyncio.sleep(0.1)
+        # Wait for the next spectrum from the GNU Radio probe(s)
+        await self.group.wait_for_spectrum()
 
-        await self.scanner.scan_cycle()
+        await self.group.scan_cycle()
 
         # Update the spectrum, channel, and rx displays
         self.specwin.draw_spectrum(self.scanner.spectrum)
         self.chanwin.draw_channels(self.scanner.channels)
         self.lockoutwin.draw_channels(self.scanner.frequencies, self.scanner.channels)
+        self.rxwin.devices = self.group.status()
         self.rxwin.draw_rx()
 
         # Update physical screen
         self.stdscr.refresh()
 
-    async def init_scanner(self) -> scnr.Scanner:
-        # Create scanner object
+    async def init_scanner(self) -> scnr.ScannerGroup:
+        # Create a scanner for each device
         ask_samp_rate = PARSER.ask_samp_rate
         num_demod = PARSER.num_demod
         type_demod = PARSER.type_demod
-        hw_args = PARSER.hw_args
+        devices = PARSER.devices
         record = PARSER.record
         play = PARSER.play
         frequency_configuration = PARSER.frequency_configuration
@@ -127,8 +132,8 @@ class MyDisplay():
         audio_bps = PARSER.audio_bps
         channel_spacing = PARSER.channel_spacing
 
-        frequency_params = PARSER.frequency_params
-        frequency_params.notify_interface = self.center_freq_changed
+        for device in devices:
+            device.frequency_params.notify_interface = self.center_freq_changed
 
         agc = PARSER.agc
 
@@ -139,21 +144,39 @@ class MyDisplay():
 
         auto_priority = PARSER.auto_priority
 
-        scanner = scnr.Scanner(ask_samp_rate, num_demod, type_demod, hw_args,
-                               freq_correction, record, frequency_configuration,
-                               channel_log_params,
-                               play, audio_bps, channel_spacing,
-                               frequency_params, min_recording, max_recording,
-                               classifier_params, auto_priority, agc)
-
-        await scanner.load_frequencies()
+        detection_params = PARSER.detection_params
+        shared_frontend = PARSER.shared_frontend
+        demod_workers = PARSER.demod_workers
+        iq_ring = PARSER.iq_ring
+        baseband_ring = PARSER.baseband_ring
+        stream_port = PARSER.stream_port
+        record_format = PARSER.record_format
+        record_store = PARSER.record_store
+        tmp_area = PARSER.tmp_area
+
+        group = scnr.ScannerGroup(devices, ask_samp_rate, num_demod, type_demod,
+                                  freq_correction, record, frequency_configuration,
+                                  channel_log_params,
+                                  play, audio_bps, channel_spacing,
+                                  min_recording, max_recording,
+                                  classifier_params, auto_priority, agc,
+                                  detection_params, shared_frontend,
+                                  demod_workers, iq_ring, baseband_ring,
+                                  stream_port, record_format, record_store,
+                                  tmp_area)
+
+        await group.wait_ready()
+        await group.load_frequencies()
+        await group.start_streaming()
         # Set the parameters
-        scanner.set_center_freq(scanner.center_freq)
-        scanner.set_squelch(PARSER.squelch_db)
-        scanner.set_volume(PARSER.volume_db)
-        scanner.set_threshold(PARSER.threshold_db)
+        for scanner in group.scanners:
+            scanner.set_center_freq(scanner.center_freq)
+            scanner.filter_and_set_gains(PARSER.gains)
+            scanner.set_squelch(PARSER.squelch_db)
+            scanner.set_volume(PARSER.volume_db)
+            scanner.set_threshold(PARSER.threshold_db)
 
-        return scanner
+        return group
 
     def center_freq_changed(self):
         '''
@@ -165,6 +188,12 @@ class MyDisplay():
         self.rxwin.steps = self.scanner.steps
 
     async def handle_char(self, keyb: int) -> None:
+        # Switch the interface to the next device
+        if keyb == ord('d') and len(self.group.scanners) > 1:
+            self.group.select_next()
+            await self.make_display()
+            return
+
         # Send keystroke to spectrum window and update scanner if True
         if self.specwin.proc_keyb(keyb):
             self.scanner.set_threshold(self.specwin.threshold_db)
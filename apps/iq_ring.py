@@ -0,0 +1,337 @@
+'''
+Named shared-memory ring buffer of complex samples.
+
+Lets other local processes (POCSAG, APRS or P25 decoders...) read the IQ of
+the receiver, or the baseband of a demodulator, without a second device and
+without adding blocks to the flowgraph for them.  There is one writer per
+ring and any number of readers.  The writer never waits for the readers, a
+reader that falls behind loses the oldest samples and is told how many.
+
+Layout: a 128 byte header followed by capacity complex64 samples.  Samples
+are addressed by their sequence number (count of samples written before
+them), sample seq is at index seq % capacity.
+
+- reserved: the writer is writing up to this sequence number
+- head: samples below this sequence number are complete
+- center_freq, samp_rate and meta_start: the metadata in effect from
+  sample meta_start on, with prev_center_freq/prev_samp_rate before it
+- timestamp: time.time() when the sample before head was written
+- gen: even when the metadata is consistent (seqlock)
+
+Samples in [reserved - capacity, head) are valid.  A reader copies samples
+and then checks reserved again, so it never hands out overwritten data.
+
+Only the thread that writes the samples changes the header.  A metadata
+change (e.g. a retune from the scanner thread) is queued and applied by the
+next write at or after its settle time, when the samples of the new
+center frequency reach the ring.
+'''
+from dataclasses import dataclass
+from multiprocessing import shared_memory, resource_tracker
+import threading
+import time
+import typing
+
+import numpy as np
+
+MAGIC = 0x4832_4D51  # 'H2MQ'
+VERSION = 1
+HEADER_SIZE = 128
+SAMPLE = np.dtype(np.complex64)
+
+HEADER = np.dtype([('magic', '<u4'), ('version', '<u4'),
+                   ('capacity', '<u8'), ('gen', '<u8'),
+                   ('reserved', '<u8'), ('head', '<u8'),
+                   ('meta_start', '<u8'),
+                   ('center_freq', '<f8'), ('samp_rate', '<f8'),
+                   ('prev_center_freq', '<f8'), ('prev_samp_rate', '<f8'),
+                   ('timestamp', '<f8')])
+assert HEADER.itemsize <= HEADER_SIZE
+
+# Rings written by this process (their readers must keep them registered)
+_written: set[str] = set()
+
+
+@dataclass
+class IQBlock:
+    '''
+    Contiguous samples with one set of metadata
+
+    seq (int): Sequence number of the first sample
+    samples (np.ndarray): complex64 samples (a view if read without copy)
+    center_freq (float): RF frequency of the samples at 0 Hz in Hz
+    samp_rate (float): Sample rate in sps
+    timestamp (float): Estimated time.time() of the first sample
+    '''
+    seq: int
+    samples: np.ndarray
+    center_freq: float
+    samp_rate: float
+    timestamp: float
+
+
+def _attach(shm: shared_memory.SharedMemory) -> tuple[np.ndarray, np.ndarray]:
+    header = np.ndarray((), dtype=HEADER, buffer=shm.buf)
+    capacity = int(header['capacity'])
+    data = np.ndarray((capacity,), dtype=SAMPLE, buffer=shm.buf, offset=HEADER_SIZE)
+    return (header, data)
+
+
+class IQRingWriter:
+    '''
+    Creates the ring and writes samples into it
+
+    A stale ring of the same name (e.g. after a crash) is replaced
+
+    Args:
+        name (str): Shared memory name (readers attach with it)
+        capacity (int): Number of samples kept
+        center_freq (float): Initial RF frequency at 0 Hz in Hz
+        samp_rate (float): Initial sample rate in sps
+        clock (Callable): Time source in seconds for the settle times
+    '''
+
+    def __init__(self, name: str, capacity: int, center_freq: float=0,
+                 samp_rate: float=0,
+                 clock: typing.Callable[[], float]=time.monotonic) -> None:
+        if capacity < 1:
+            raise ValueError(f'Ring capacity must be positive: {capacity}')
+
+        size = HEADER_SIZE + capacity*SAMPLE.itemsize
+        try:
+            self.shm = shared_memory.SharedMemory(name, create=True, size=size)
+        except FileExistsError:
+            stale = shared_memory.SharedMemory(name)
+            stale.close()
+            stale.unlink()
+            self.shm = shared_memory.SharedMemory(name, create=True, size=size)
+
+        self.name = name
+        _written.add(name)
+        self.header = np.ndarray((), dtype=HEADER, buffer=self.shm.buf)
+        self.header[()] = (MAGIC, VERSION, capacity, 0, 0, 0, 0,
+                           center_freq, samp_rate, center_freq, samp_rate,
+                           time.time())
+        (_, self.data) = _attach(self.shm)
+        self.capacity = capacity
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.pending: tuple[float, float, float] | None = None
+
+    def write(self, samples: np.ndarray, timestamp: float | None=None) -> None:
+        """Append samples, overwriting the oldest ones
+
+        Args:
+            samples (np.ndarray): Samples (converted to complex64)
+            timestamp (float | None): time.time() of the last sample (None = now)
+        """
+        count = len(samples)
+        if count == 0:
+            return
+        self._apply_pending()
+        head = int(self.header['head'])
+
+        # Only the newest capacity samples can be kept
+        if count > self.capacity:
+            head += count - self.capacity
+            samples = samples[-self.capacity:]
+            count = self.capacity
+
+        self.header['reserved'] = head + count
+        pos = head % self.capacity
+        first = min(count, self.capacity - pos)
+        self.data[pos:pos+first] = samples[:first]
+        self.data[:count-first] = samples[first:]
+
+        self.header['gen'] += 1
+        self.header['head'] = head + count
+        self.header['timestamp'] = time.time() if timestamp is None else timestamp
+        self.header['gen'] += 1
+
+    def set_metadata(self, center_freq: float, samp_rate: float,
+                     settle: float=0.0) -> None:
+        """Change the metadata of the samples written from settle seconds on
+
+        Safe to call from any thread: the change is applied by write()
+
+        Args:
+            center_freq (float): RF frequency at 0 Hz in Hz
+            samp_rate (float): Sample rate in sps
+            settle (float): Seconds until the samples with the new metadata
+                reach the ring (e.g. the flowgraph buffers after a retune)
+        """
+        with self.lock:
+            self.pending = (center_freq, samp_rate, self.clock() + settle)
+
+    def _apply_pending(self) -> None:
+        # Called by write() only, so the header has a single writer
+        with self.lock:
+            pending = self.pending
+            if pending is None or self.clock() < pending[2]:
+                return
+            self.pending = None
+        (center_freq, samp_rate, _) = pending
+        header = self.header
+        if center_freq == header['center_freq'] and samp_rate == header['samp_rate']:
+            return
+        header['gen'] += 1
+        header['prev_center_freq'] = header['center_freq']
+        header['prev_samp_rate'] = header['samp_rate']
+        header['meta_start'] = header['head']
+        header['center_freq'] = center_freq
+        header['samp_rate'] = samp_rate
+        header['gen'] += 1
+
+    def unlink(self) -> None:
+        """Remove the name of the ring so no new readers attach
+
+        Writing still works, the memory goes away with the last mapping
+        """
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+        _written.discard(self.name)
+
+    def close(self) -> None:
+        """Remove the ring (attached readers keep their mapping)"""
+        self.unlink()
+        del self.header, self.data
+        self.shm.close()
+
+
+class IQRingReader:
+    '''
+    Reads the samples of a ring created by another process
+
+    Args:
+        name (str): Shared memory name of the ring
+        oldest (bool): Start with the oldest samples kept instead of new ones
+
+    Attributes:
+        seq (int): Sequence number of the next sample to read
+        dropped (int): Samples lost because the reader fell behind
+    '''
+
+    def __init__(self, name: str, oldest: bool=False) -> None:
+        self.shm = shared_memory.SharedMemory(name)
+        header = np.ndarray((), dtype=HEADER, buffer=self.shm.buf)
+        if header['magic'] != MAGIC or header['version'] != VERSION:
+            del header
+            self.shm.close()
+            raise ValueError(f'{name} is not a ham2mon IQ ring')
+        del header
+
+        # The writer owns the ring, do not remove it when this process exits
+        if name not in _written:
+            resource_tracker.unregister(self.shm._name, 'shared_memory')  # pylint: disable=protected-access
+
+        (self.header, self.data) = _attach(self.shm)
+
+        self.capacity = len(self.data)
+        head = int(self.header['head'])
+        self.seq = max(0, int(self.header['reserved']) - self.capacity) if oldest else head
+        self.dropped = 0
+
+    def _snapshot(self) -> tuple:
+        header = self.header
+        while True:
+            gen = int(header['gen'])
+            if gen % 2 == 0:
+                snapshot = (int(header['head']), int(header['meta_start']),
+                            float(header['center_freq']), float(header['samp_rate']),
+                            float(header['prev_center_freq']), float(header['prev_samp_rate']),
+                            float(header['timestamp']))
+                if int(header['gen']) == gen:
+                    return snapshot
+            time.sleep(0)
+
+    def _skip_overwritten(self) -> None:
+        oldest = int(self.header['reserved']) - self.capacity
+        if self.seq < oldest:
+            self.dropped += oldest - self.seq
+            self.seq = oldest
+
+    def read(self, max_items: int | None=None, copy: bool=True) -> IQBlock | None:
+        """Read the next available samples
+
+        A block never wraps around the end of the ring or spans a metadata
+        change, so more samples may be available after it
+
+        Args:
+            max_items (int | None): Most samples to return
+            copy (bool): Copy the samples, otherwise return a view into the
+                ring that is only valid until the writer wraps around
+                (see valid())
+
+        Returns:
+            IQBlock | None: The samples or None if there are no new ones
+        """
+        (head, meta_start, center_freq, samp_rate,
+         prev_center_freq, prev_samp_rate, timestamp) = self._snapshot()
+        self._skip_overwritten()
+        if self.seq >= head:
+            return None
+
+        end = head
+        if self.seq < meta_start:
+            end = meta_start
+            center_freq = prev_center_freq
+            samp_rate = prev_samp_rate
+        pos = self.seq % self.capacity
+        end = min(end, self.seq + self.capacity - pos)
+        if max_items is not None:
+            end = min(end, self.seq + max_items)
+
+        samples = self.data[pos:pos + end - self.seq]
+        if copy:
+            samples = samples.copy()
+            # Drop what the writer overwrote while copying
+            lost = int(self.header['reserved']) - self.capacity - self.seq
+            if lost > 0:
+                samples = samples[lost:]
+                self.dropped += lost
+                self.seq += lost
+                if len(samples) == 0:
+                    return self.read(max_items, copy)
+
+        seq = self.seq
+        self.seq = end
+        if samp_rate > 0:
+            timestamp -= (head - seq)/samp_rate
+        return IQBlock(seq, samples, center_freq, samp_rate, timestamp)
+
+    def valid(self, block: IQBlock) -> bool:
+        """Whether the samples of a block read without copy are intact"""
+        return int(self.header['reserved']) - self.capacity <= block.seq
+
+    def close(self) -> None:
+        del self.header, self.data
+        self.shm.close()
+
+
+def main() -> None:
+    """Write a tone into a ring and read it back"""
+    name = 'ham2mon-iq-ring-test'
+    writer = IQRingWriter(name, 4096, center_freq=146E6, samp_rate=1E6)
+    reader = IQRingReader(name)
+    try:
+        tone = np.exp(2j*np.pi*0.01*np.arange(10000)).astype(np.complex64)
+        for idx in range(0, len(tone), 1000):
+            if idx == 5000:
+                writer.set_metadata(146.5E6, 1E6)
+            writer.write(tone[idx:idx+1000])
+            while (block := reader.read()) is not None:
+                print(f'seq {block.seq:>6} {len(block.samples):>5} samples '
+                      f'at {block.center_freq/1E6:.3f} MHz')
+        print(f'dropped {reader.dropped}')
+    finally:
+        reader.close()
+        writer.close()
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,131 @@
+'''
+Band occupancy map built from the detection spectra.
+
+For each channel (at the channel spacing) the map counts the spectra in
+which the channel was in view and those in which it was detected.  The
+ratio is the duty cycle of the channel.  The counts are aged (halved) at the
+start of each survey so the map follows changes in the band.
+
+Used by the survey schedule (center_frequency_provider.py) to find the
+steps worth dwelling on.
+'''
+import numpy as np
+
+from step_planner import USABLE_BANDWIDTH
+
+
+class OccupancyMap:
+    '''
+    Duty cycle of the channels from lower_freq to upper_freq
+
+    Args:
+        lower_freq (int): Lowest frequency in Hz
+        upper_freq (int): Highest frequency in Hz
+        channel_spacing (int): Channel spacing in Hz
+
+    Attributes:
+        observed (np.ndarray): Spectra in which each channel was in view
+        active (np.ndarray): Spectra in which each channel was detected
+    '''
+
+    def __init__(self, lower_freq: int, upper_freq: int, channel_spacing: int) -> None:
+        if channel_spacing <= 0:
+            raise ValueError(f'Channel spacing must be positive: {channel_spacing}')
+        self.channel_spacing = channel_spacing
+        self.first = int(round(lower_freq / channel_spacing))
+        size = int(round(upper_freq / channel_spacing)) - self.first + 1
+        self.observed = np.zeros(max(size, 1), dtype=np.float64)
+        self.active = np.zeros(max(size, 1), dtype=np.float64)
+
+    def _index(self, freq: float) -> int:
+        return int(round(freq / self.channel_spacing)) - self.first
+
+    def _span(self, lower_freq: float, upper_freq: float) -> slice:
+        start = max(self._index(lower_freq), 0)
+        stop = min(self._index(upper_freq) + 1, len(self.observed))
+        return slice(start, max(start, stop))
+
+    def observe(self, center_freq: int, samp_rate: float, channels: list[int]) -> None:
+        """Add one spectrum
+
+        Args:
+            center_freq (int): Hardware RF center frequency in Hz
+            samp_rate (float): Hardware sample rate in sps
+            channels (list[int]): RF frequencies in Hz detected in the spectrum
+        """
+        half = samp_rate * USABLE_BANDWIDTH / 2
+        span = self._span(center_freq - half, center_freq + half)
+        self.observed[span] += 1
+        if len(channels) == 0:
+            return
+        # Only channels in view count (not e.g. aliases at the band edges)
+        indexes = np.array([self._index(freq) for freq in channels])
+        indexes = indexes[(indexes >= span.start) & (indexes < span.stop)]
+        np.add.at(self.active, np.unique(indexes), 1)
+
+    def duty(self, freq: float) -> float:
+        """Duty cycle of the channel at freq (0 if never observed)"""
+        idx = self._index(freq)
+        if not 0 <= idx < len(self.observed) or self.observed[idx] == 0:
+            return 0.0
+        return float(self.active[idx] / self.observed[idx])
+
+    def band_duty(self, lower_freq: float, upper_freq: float) -> float:
+        """Highest duty cycle of the channels in a band"""
+        span = self._span(lower_freq, upper_freq)
+        observed = self.observed[span]
+        if not np.any(observed):
+            return 0.0
+        duty = np.divide(self.active[span], observed,
+                         out=np.zeros_like(observed), where=observed > 0)
+        return float(duty.max())
+
+    def carry_over(self, previous: 'OccupancyMap') -> None:
+        """Take the counts of the channels also in a previous map (same spacing)"""
+        if previous.channel_spacing != self.channel_spacing:
+            return
+        start = max(self.first, previous.first)
+        stop = min(self.first + len(self.observed), previous.first + len(previous.observed))
+        if start >= stop:
+            return
+        mine = slice(start - self.first, stop - self.first)
+        theirs = slice(start - previous.first, stop - previous.first)
+        self.observed[mine] = previous.observed[theirs]
+        self.active[mine] = previous.active[theirs]
+
+    def age(self, factor: float=0.5) -> None:
+        """Scale the counts down so newer spectra weigh more"""
+        self.observed *= factor
+        self.active *= factor
+
+    def busiest(self, count: int=5) -> list[tuple[int, float]]:
+        """The channels with the highest duty cycle
+
+        Returns:
+            list[tuple[int, float]]: Frequency in Hz and duty cycle
+        """
+        duty = np.divide(self.active, self.observed,
+                         out=np.zeros_like(self.observed), where=self.observed > 0)
+        order = np.argsort(duty)[::-1][:count]
+        return [((self.first + int(idx)) * self.channel_spacing, float(duty[idx]))
+                for idx in order if duty[idx] > 0]
+
+
+def main() -> None:
+    """Build a map of a simulated band with two busy channels"""
+    rng = np.random.default_rng(1)
+    occupancy = OccupancyMap(450_000_000, 470_000_000, 12_500)
+    busy = {452_500_000: 0.3, 461_000_000: 0.05}
+    for center in range(452_000_000, 470_000_000, 2_000_000):
+        for _ in range(20):
+            heard = [freq for (freq, duty) in busy.items() if rng.random() < duty]
+            occupancy.observe(center, 2.56E6, heard)
+    for (freq, duty) in occupancy.busiest():
+        print(f'{freq/1E6:.4f} MHz {duty:.0%}')
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except KeyboardInterrupt:
+        pass
@@ -12,18 +12,48 @@ from gnuradio import blocks
 from gnuradio import fft
 from gnuradio.fft import window  # type: ignore
 from gnuradio import audio
+from gnuradio import zeromq  # type: ignore
+import asyncio
 import os
-import glob
-import errno
 import time
 import numpy as np
 import logging
 from typing import Callable
 
-from demodulators.NBFM import TunerDemodNBFM
-from demodulators.AM import TunerDemodAM
-from demodulators.WBFM import TunerDemodWBFM
+from demodulators.BaseTuner import BaseTuner
+from demodulators.DemodPool import DemodPool
+from demod_workers import (DemodWorker, RemoteDemodulator, WorkerParams,
+                           ipc_address, log_file, split_demodulators)
 from classification import ClassificationNotWanted, Classifier, ClassifierParams
+from detection import DetectionParams, RetuneTracker
+from embedded_blocks import (AudioTap, IQRingSink, RetuneMarker,
+                             SpectrumAverager, SpectrumProbe)
+from audio_streaming import AudioStreamServer
+from recording_store import StoreParams
+from tmp_recordings import TmpArea, TmpAreaParams
+AUDIO_RATE = 8000
+
+
+def create_classifier(classifier_params: ClassifierParams,
+                      audio_rate: int=AUDIO_RATE) -> Classifier | None:
+    """Create the audio classifier if classification is wanted
+
+    Args:
+        classifier_params (ClassifierParams): Parameters for channel classification
+        audio_rate (int): Audio sample rate of the recordings in sps
+
+    Returns:
+        Classifier | None: The classifier or None if not wanted
+    """
+    try:
+        return Classifier(classifier_params, audio_rate)
+    except ClassificationNotWanted:
+        return None
+    except Exception as error:
+        msg = f'Could not create classifier ({error})'
+        logging.error(msg)
+        raise Exception(msg)
+
 
 class Receiver(gr.top_block):
     """Receiver for NBFM and AM modulation
@@ -39,10 +69,29 @@ class Receiver(gr.top_block):
         freq_correction (int): Frequency correction in ppm
         record (bool): Record audio to file if True
         audio_bps (int): Audio bit depth in bps (bits/samples)
+        detection_params (DetectionParams): FFT size and rates for the detection flow
+        shared_frontend (bool): Tuners share a coarse sub-band decimation stage
+        classifier (Classifier | None): Existing classifier to use (None = create
+            one from classifier_params)
+        demod_workers (int): Run the demodulators in this many worker processes
+            (0 = in this flowgraph)
+        iq_ring (str | None): Name of a shared-memory ring for the hardware IQ
+        baseband_ring (str | None): Name prefix of shared-memory rings for the
+            channel baseband of each demodulator (name-<channel>)
+        stream_server (AudioStreamServer | None): Server that streams the audio
+            of each demodulator and the mix
+        mix_stream (str): Stream name of the mix
+        record_format (str): Format of the accepted recordings (wav, flac, opus)
+        record_store (StoreParams | None): Recording store for the accepted
+            recordings (None = one file each)
+        tmp_area (TmpAreaParams): RAM backed directory and memory budget for
+            the recordings before they are accepted
 
     Attributes:
         center_freq (int): Hardware RF center frequency in Hz
         samp_rate (int): Hardware sample rate in sps (1E6 min)
+        fft_length (int): Number of bins in the detection spectrum
+        probe_rate (float): Rate of spectra provided by the probe in Hz
         gain_db (int): Hardware RF gain in dB
         squelch_db (int): Squelch in dB
         volume_dB (int): Volume in dB
@@ -55,28 +104,28 @@ class Receiver(gr.top_block):
                  hw_args: str, freq_correction: int, record: bool, play: bool,
                  audio_bps: int, min_recording: float,
                  classifier_params: ClassifierParams, notify_scanner: Callable,
-                 agc: bool):
+                 agc: bool, detection_params: DetectionParams=DetectionParams(),
+                 shared_frontend: bool=False, classifier: Classifier | None=None,
+                 demod_workers: int=0, iq_ring: str | None=None,
+                 baseband_ring: str | None=None,
+                 stream_server: AudioStreamServer | None=None,
+                 mix_stream: str='mix', record_format: str='wav',
+                 record_store: StoreParams | None=None,
+                 tmp_area: TmpAreaParams=TmpAreaParams()):
 
         # Call the initialization method from the parent class
         gr.top_block.__init__(self, "Receiver")
 
-        # Make sure the 'wav' directory exists
-        try:
-            os.makedirs('wav/tmp')
-        except OSError as error:  # will need to add something here for Win support
-            if error.errno == errno.EEXIST:
-                # remove any existing wav files
-                for f in glob.glob('wav/tmp/*.wav'):
-                    os.unlink(f)
-            else:
-                raise
+        # Make sure the 'wav' directories exist and remove old recordings
+        self.tmp_area = TmpArea(tmp_area)
+        self.tmp_area.prepare()
 
         # Default values
         self.center_freq: int = int(144E6)
         self.samp_rate: int
         self.squelch_db = -60
         self.volume_db = 0
-        audio_rate = 8000
+        audio_rate = AUDIO_RATE
 
         # Setup the USRP source, or use the USRP sim
         self.src = osmosdr.source(args="numchan=" + str(1) + " " + hw_args)
@@ -101,15 +150,16 @@ class Receiver(gr.top_block):
         # Set the I/Q bandwidth to 80 % of sample rate
         self.src.set_bandwidth(0.8 * self.samp_rate)
 
-        # NBFM channel is about 10 KHz wide
-        # Want  about 3 FFT bins to span a channel
-        # Use length FFT so 4 Msps / 1024 = 3906.25 Hz/bin
-        # This also means 3906.25 vectors/second
-        # Using below formula keeps FFT size a power of two
-        # Also keeps bin size constant for power of two sampling rates
-        # Use of 256 sets 3906.25 Hz/bin; increase to reduce bin size
-        samp_ratio = self.samp_rate / 1E6
-        fft_length = 256 * int(pow(2, np.ceil(np.log(samp_ratio)/np.log(2))))
+        # FFT size, decimation and integration come from the detection profile
+        # Default is 256 bins per Msps (3906.25 Hz/bin) at about 1000 vectors/sec
+        # which is then averaged down to 10 spectra/sec
+        fft_length = detection_params.get_fft_length(self.samp_rate)
+        amount = detection_params.get_decimation(self.samp_rate, fft_length)
+        integration = detection_params.get_integration(self.samp_rate, fft_length)
+        self.fft_length = fft_length
+        self.probe_rate = self.samp_rate/fft_length/amount/integration
+        logging.debug(f'Detection flow: {fft_length=} {amount=} {integration=} '
+                      f'bin={self.samp_rate/fft_length:.1f} Hz rate={self.probe_rate:.2f} Hz')
 
         # -----------Flow for FFT--------------
 
@@ -117,8 +167,7 @@ class Receiver(gr.top_block):
         stream_to_vector = blocks.stream_to_vector(gr.sizeof_gr_complex*1,
                                                    fft_length)
 
-        # Want about 1000 vector/sec
-        amount = int(round(self.samp_rate/fft_length/1000))
+        # Keep one in N vectors to get the requested FFT rate
         keep_one_in_n = blocks.keep_one_in_n(gr.sizeof_gr_complex*
                                              fft_length, amount)
 
@@ -129,76 +178,143 @@ class Receiver(gr.top_block):
         # Compute the power
         complex_to_mag_squared = blocks.complex_to_mag_squared(fft_length)
 
-        # Video average and decimate from 1000 vector/sec to 10 vector/sec
-        integrate_ff = blocks.integrate_ff(100, fft_length)
+        # Spectra averaging vectors from before a retune are marked stale
+        self.retune = RetuneTracker(integration, detection_params.retune_settle)
 
-        # Probe vector
-        self.probe_signal_vf = blocks.probe_signal_vf(fft_length)
+        # Video average and decimate to the probe rate
+        # Boxcar (sum) is cheapest, exponential and peak hold detect sooner
+        if detection_params.average == 'boxcar':
+            average_ff = blocks.integrate_ff(integration, fft_length)
+            self.connect(complex_to_mag_squared,
+                         RetuneMarker(fft_length, self.retune))
+        else:
+            average_ff = SpectrumAverager(fft_length, integration,
+                                          detection_params.average,
+                                          detection_params.get_alpha(integration),
+                                          self.retune)
+
+        # Probe vector that counts spectra so the scanner can wait on them
+        self.spectrum_probe = SpectrumProbe(fft_length)
 
         # Connect the blocks
         self.connect(self.src, stream_to_vector, keep_one_in_n,
                      fft_vcc, complex_to_mag_squared,
-                     integrate_ff, self.probe_signal_vf)
+                     average_ff, self.spectrum_probe)
 
-        classifier: Classifier | None
-        try:
-          classifier = Classifier(classifier_params, audio_rate)
-        except ClassificationNotWanted:
-            classifier = None   
-        except Exception as error:
-            msg = f'Could not create classifier ({error})'
-            logging.error(msg)
-            raise Exception(msg)
+        # Share the hardware IQ with other processes
+        self.iq_ring_sink: IQRingSink | None = None
+        if iq_ring is not None:
+            self.iq_ring_sink = IQRingSink(iq_ring, self.samp_rate, self.center_freq,
+                                           settle=detection_params.retune_settle)
+            self.connect(self.src, self.iq_ring_sink)
 
+        # Receivers of several devices share one classifier
+        # Worker processes create their own
+        if classifier is None and demod_workers == 0:
+            classifier = create_classifier(classifier_params, audio_rate)
 
-        # -----------Flow for Demod--------------
-
-        # Create N parallel demodulators as a list of objects
-        # Default to NBFM demod
-        self.demodulators = []
-        for idx in range(num_demod):
-            if type_demod == 0:
-                self.demodulators.append(TunerDemodNBFM(self.samp_rate,
-                                                        audio_rate, record,
-                                                        audio_bps,
-                                                        min_recording,
-                                                        classifier,
-                                                        notify_scanner))
-            elif type_demod == 1:
-                self.demodulators.append(TunerDemodAM(self.samp_rate,
-                                                      audio_rate, record,
-                                                      audio_bps,
-                                                      min_recording,
-                                                      classifier,
-                                                      notify_scanner))
-            elif type_demod == 2:
-                self.demodulators.append(TunerDemodWBFM(self.samp_rate,
-                                                        audio_rate, record,
-                                                        audio_bps,
-                                                        min_recording,
-                                                        classifier,
-                                                        notify_scanner))
-            else:
-                raise Exception(f'Invalid demodulator type: {type_demod}')
 
-        if play:
-            # Create an adder
-            add_ff = blocks.add_ff(1)
+        # -----------Flow for Demod--------------
 
-            # Connect the demodulators between the source and adder
-            for idx, demodulator in enumerate(self.demodulators):
-                self.connect(self.src, demodulator, (add_ff, idx))
+        self.pool: DemodPool | None = None
+        self.workers: list[DemodWorker] = []
+        self.worker_addresses: list[str] = []
+        if demod_workers > 0:
+            self.demodulators = self._start_workers(demod_workers, num_demod,
+                                                    type_demod, audio_rate,
+                                                    record, play, audio_bps,
+                                                    min_recording,
+                                                    classifier_params,
+                                                    notify_scanner,
+                                                    shared_frontend,
+                                                    baseband_ring,
+                                                    stream_server, mix_stream,
+                                                    record_format, record_store,
+                                                    tmp_area)
+            return
 
-            # Audio sink
-            audio_sink = audio.sink(audio_rate)
+        # Demodulators in this flowgraph
+        self.pool = DemodPool(self.samp_rate, num_demod, type_demod, audio_rate,
+                              record, play, audio_bps, min_recording, classifier,
+                              notify_scanner, shared_frontend, baseband_ring,
+                              stream_server, mix_stream, record_format,
+                              record_store, tmp_area)
+        self.demodulators = self.pool.demodulators
 
+        if play:
             # Connect the summed outputs to the audio sink
-            self.connect(add_ff, audio_sink)
+            audio_sink = audio.sink(audio_rate)
+            self.connect(self.src, self.pool, audio_sink)
         else:
-            # Just connect each demodulator to the receiver source
-            for demodulator in self.demodulators:
-                self.connect(self.src, demodulator)
+            self.connect(self.src, self.pool)
+
+    def _start_workers(self, demod_workers: int, num_demod: int,
+                       type_demod: int, audio_rate: int, record: bool,
+                       play: bool, audio_bps: int, min_recording: float,
+                       classifier_params: ClassifierParams,
+                       notify_scanner: Callable, shared_frontend: bool,
+                       baseband_ring: str | None,
+                       stream_server: AudioStreamServer | None,
+                       mix_stream: str,
+                       record_format: str,
+                       record_store: StoreParams | None,
+                       tmp_area: TmpAreaParams) -> list[RemoteDemodulator]:
+        """Run the demodulators in worker processes
+
+        The IQ stream is published to the workers and their audio is summed
+        for the audio sink and the mix stream
+        (the demodulators are not streamed one by one)
+        The workers start in the background, see wait_workers()
 
+        Returns:
+            list[RemoteDemodulator]: Proxies of the demodulators of all workers
+        """
+        iq_address = ipc_address('iq')
+        self.worker_addresses.append(iq_address)
+        iq_sink = zeromq.pub_sink(gr.sizeof_gr_complex, 1, iq_address,
+                                  100, False, -1)
+        self.connect(self.src, iq_sink)
+
+        for size in split_demodulators(num_demod, demod_workers):
+            audio_address = ipc_address('audio')
+            self.worker_addresses.append(audio_address)
+            params = WorkerParams(iq_address=iq_address,
+                                  audio_address=audio_address,
+                                  samp_rate=self.samp_rate,
+                                  audio_rate=audio_rate,
+                                  num_demod=size,
+                                  type_demod=type_demod,
+                                  first_channel=BaseTuner.channel + 1,
+                                  record=record,
+                                  play=play or stream_server is not None,
+                                  audio_bps=audio_bps,
+                                  min_recording=min_recording,
+                                  classifier_params=classifier_params,
+                                  shared_frontend=shared_frontend,
+                                  baseband_ring=baseband_ring,
+                                  record_format=record_format,
+                                  record_store=record_store,
+                                  tmp_area=tmp_area,
+                                  log_file=log_file())
+            # Keep the channel numbers unique in this process
+            BaseTuner.channel += size
+            self.workers.append(DemodWorker(params, notify_scanner))
+
+
+        if play or stream_server is not None:
+            add_ff = blocks.add_ff(1)
+            for (idx, worker) in enumerate(self.workers):
+                audio_source = zeromq.sub_source(gr.sizeof_float, 1,
+                                                 worker.params.audio_address,
+                                                 100, False, -1)
+                self.connect(audio_source, (add_ff, idx))
+            if play:
+                self.connect(add_ff, audio.sink(audio_rate))
+            if stream_server is not None:
+                self.connect(add_ff, AudioTap(stream_server, mix_stream))
+
+        return [demodulator for worker in self.workers
+                for demodulator in worker.demodulators]
 
     def set_center_freq(self, center_freq: int) -> None:
         """Sets RF center frequency of hardware
@@ -208,10 +324,19 @@ class Receiver(gr.top_block):
         """
         # Tune the hardware
         self.src.set_center_freq(center_freq)
+        self.retune.retune()
 
         # Update center frequency with hardware center frequency
         # Do this to account for slight hardware offsets
         self.center_freq = self.src.get_center_freq()
+        if self.iq_ring_sink is not None:
+            self.iq_ring_sink.set_center_freq(self.center_freq)
+
+    def spectrum_clean(self) -> bool:
+        """Whether the latest spectrum only holds samples from after the
+        last retune (and its settle time)
+        """
+        return self.retune.clean(self.spectrum_probe.seq)
 
     def get_gain_names(self) -> list[dict]:
         """Get the list of supported gain elements
@@ -274,13 +399,54 @@ class Receiver(gr.top_block):
             center_freqs.append(demodulator.center_freq)
         return center_freqs
 
+    async def wait_workers(self) -> None:
+        """Wait until the demodulator workers (if any) run their flowgraphs
+
+        The workers start in parallel and the event loop keeps running
+
+        Raises:
+            Exception: A worker failed or did not start in time
+        """
+        if not self.workers:
+            return
+        await asyncio.gather(*(worker.ready() for worker in self.workers))
+        logging.debug(f'{len(self.demodulators)} demodulators in '
+                      f'{len(self.workers)} worker processes')
+
+    async def stop_workers(self) -> None:
+        """Stop the demodulator worker processes (if any)
+
+        Call after parking the demodulators so the recordings are closed
+        """
+        for worker in self.workers:
+            await worker.stop()
+        self.workers = []
+
+        # Remove the ipc socket files
+        for address in self.worker_addresses:
+            try:
+                os.unlink(address.removeprefix('ipc://'))
+            except OSError:
+                pass
+        self.worker_addresses = []
+
+    def finish_recordings(self) -> None:
+        """Wait for the recordings being encoded in this process"""
+        if self.pool is not None:
+            self.pool.finish_recordings()
+
+    def close_rings(self) -> None:
+        """Remove the shared-memory rings of this process"""
+        if self.iq_ring_sink is not None:
+            self.iq_ring_sink.close()
+        if self.pool is not None:
+            self.pool.close_rings()
+
     def __del__(self):
         """Called when the object is destroyed."""
         # Make a best effort attempt to clean up our wavfile if it's empty
         try:
-            for f in glob.glob('wav/tmp/*.wav'):
-                os.unlink(f)
-            os.rmdir('wav/tmp')
+            self.tmp_area.remove()
         except Exception:
             pass  # oh well, we're dying anyway
 
@@ -378,7 +544,7 @@ async def main():
         time.sleep(1)
 
         # Grab the FFT data and print max value
-        spectrum = receiver.probe_signal_vf.level()
+        spectrum = receiver.spectrum_probe.level()
         print("Max spectrum of %.3f" % (np.max(spectrum)))
 
     # Stop the receiver
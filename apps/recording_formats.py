@@ -0,0 +1,204 @@
+'''
+Recording file formats.
+
+The demodulators always record WAV (the classifier needs 16 bit WAV) with
+the bit depth of the --bps option.  With --record_format flac or opus the
+accepted recordings are encoded in background threads so the demodulators
+and the scan cycle never wait for an encoder.  The channel log reports the
+final file name; the file appears there (renamed into place) once encoded
+and the WAV is removed.  If encoding fails the WAV is kept.
+
+With a recording store (recording_store.py) the same threads append the
+(encoded) recordings to the store straight from the temporary recording
+area (tmp_recordings.py), so they are never written to wav/ as files.
+
+FLAC and Opus need the soundfile module (libsndfile 1.0.29+ for Opus).
+'''
+from concurrent.futures import Future, ThreadPoolExecutor
+import logging
+import os
+from pathlib import Path
+import shutil
+
+from recording_store import RecordingStore, wav_duration
+
+try:
+    import soundfile  # type: ignore
+except ImportError:
+    soundfile = None
+
+# --bps to the GNU Radio wavfile_sink subformat (blocks.FORMAT_...)
+WAV_SUBFORMATS = {8: 'FORMAT_PCM_U8', 16: 'FORMAT_PCM_16',
+                  24: 'FORMAT_PCM_24', 32: 'FORMAT_PCM_32'}
+
+# --record_format to the file extension and soundfile format/subtype
+RECORD_FORMATS = {'wav': ('.wav', None, None),
+                  'flac': ('.flac', 'FLAC', None),
+                  'opus': ('.opus', 'OGG', 'OPUS')}
+
+ENCODER_THREADS = 2
+
+
+def wav_subformat(audio_bps: int) -> str:
+    '''
+    Name of the wavfile_sink subformat for a bit depth
+
+    Raises:
+        ValueError: Unsupported bit depth
+    '''
+    try:
+        return WAV_SUBFORMATS[audio_bps]
+    except KeyError:
+        raise ValueError(f'Unsupported audio bit depth {audio_bps} '
+                         f'(use one of {sorted(WAV_SUBFORMATS)})') from None
+
+
+def check_record_format(record_format: str) -> None:
+    '''
+    Raises:
+        ValueError: Unknown format or the encoder is not available
+    '''
+    if record_format not in RECORD_FORMATS:
+        raise ValueError(f'Unknown recording format {record_format} '
+                         f'(use one of {sorted(RECORD_FORMATS)})')
+    if record_format != 'wav' and soundfile is None:
+        raise ValueError(f'Recording format {record_format} needs the soundfile module')
+
+
+def encoded_name(wav_name: str, record_format: str) -> str:
+    '''
+    Final file name of a WAV recording in a format
+    '''
+    return str(Path(wav_name).with_suffix(RECORD_FORMATS[record_format][0]))
+
+
+def encode_file(wav_name: str, target: str, record_format: str) -> None:
+    '''
+    Encode a WAV file and remove it
+
+    The target is written under a temporary name and renamed into place
+    '''
+    (_, file_format, subtype) = RECORD_FORMATS[record_format]
+    partial = f'{target}.part'
+    (data, rate) = soundfile.read(wav_name, dtype='float32')
+    try:
+        soundfile.write(partial, data, rate, format=file_format, subtype=subtype)
+        os.replace(partial, target)
+    except BaseException:
+        if os.path.exists(partial):
+            os.unlink(partial)
+        raise
+    os.unlink(wav_name)
+
+
+class RecordingEncoder:
+    '''
+    Background encoder of accepted recordings
+
+    Args:
+        record_format (str): 'wav' (nothing to encode), 'flac' or 'opus'
+        store (RecordingStore | None): Store the recordings are appended to
+        threads (int): Number of encoder threads
+
+    Attributes:
+        pending (set[Future]): Encodings not finished yet
+    '''
+
+    def __init__(self, record_format: str, store: RecordingStore | None=None,
+                 threads: int=ENCODER_THREADS) -> None:
+        check_record_format(record_format)
+        self.record_format = record_format
+        self.store = store
+        self.pending: set[Future] = set()
+        self.executor: ThreadPoolExecutor | None = None
+        if record_format != 'wav' or store is not None:
+            self.executor = ThreadPoolExecutor(threads, thread_name_prefix='encoder')
+
+    def submit(self, wav_name: str, info: dict | None=None,
+               name: str | None=None, keep_dir: str | None=None) -> str:
+        """Queue a recording for encoding and/or storing
+
+        Args:
+            wav_name (str): Accepted WAV recording
+            info (dict | None): rf, start, classification and channel for the
+                store index
+            name (str | None): Final file name of the recording (default the
+                name of wav_name)
+            keep_dir (str | None): The recording is moved here (with its
+                final name) if encoding or storing fails, e.g. when it is
+                still in the temporary area
+
+        Returns:
+            str: Name of the final file or the store reference
+        """
+        if self.executor is None:
+            return wav_name
+
+        name = name or os.path.basename(wav_name)
+        target = encoded_name(os.path.join(os.path.dirname(wav_name), name),
+                              self.record_format)
+        record_id = None
+        if self.store is not None:
+            record_id = self.store.reserve()
+        future = self.executor.submit(self._finish, wav_name, target, name,
+                                      record_id, info or {}, keep_dir)
+        self.pending.add(future)
+
+        def done(future: Future) -> None:
+            self.pending.discard(future)
+            if future.exception() is not None:
+                logging.error(f'Could not encode/store {wav_name} ({future.exception()}), file kept')
+
+        future.add_done_callback(done)
+        if record_id is not None:
+            return self.store.reference(record_id)
+        return target
+
+    def _finish(self, wav_name: str, target: str, name: str,
+                record_id: str | None, info: dict, keep_dir: str | None) -> None:
+        # Runs in an encoder thread
+        try:
+            duration = wav_duration(wav_name)
+            path = wav_name
+            if self.record_format != 'wav':
+                encode_file(wav_name, target, self.record_format)
+                path = target
+            if self.store is not None and record_id is not None:
+                self.store.append(record_id, path, duration=duration,
+                                  name=encoded_name(name, self.record_format), **info)
+        except BaseException:
+            if keep_dir is not None:
+                for left in (wav_name, target):
+                    if os.path.exists(left):
+                        kept = os.path.join(keep_dir, encoded_name(name, Path(left).suffix[1:]))
+                        shutil.move(left, kept)
+            raise
+
+    def shutdown(self) -> None:
+        """Wait for the queued encodings"""
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+        if self.store is not None:
+            self.store.close()
+
+
+def main() -> None:
+    """Encode WAV files given on the command line"""
+    import sys
+
+    if len(sys.argv) < 3:
+        print(f'usage: {sys.argv[0]} flac|opus WAV_FILE...')
+        raise SystemExit(1)
+    record_format = sys.argv[1]
+    encoder = RecordingEncoder(record_format)
+    for wav_name in sys.argv[2:]:
+        print(f'{wav_name} -> {encoder.submit(wav_name)}')
+    encoder.shutdown()
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except KeyboardInterrupt:
+        pass
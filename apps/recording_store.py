@@ -0,0 +1,289 @@
+'''
+Append-only store for the recordings.
+
+With --record_store DIR the accepted recordings are not kept as one file
+each in wav/.  They are appended to large segment files in DIR, and each
+one gets a line in DIR/index.jsonl with its frequency, start time,
+duration, classification and place in the segment.  The writes are
+sequential and the file count stays small, which helps on SD cards and
+network mounts.
+
+Each store writer (one per demodulator pool, in the scanner or a
+demodulator worker) uses its own segment files, named after the time it
+opened the store, its pid and its number in the process.  The index lines are written with single appends so several processes can share
+the index.
+
+A recording is referred to as DIR#ID (e.g. in the channel log).  Use this
+module as a tool to list or extract recordings:
+
+    recording_store.py list DIR [--rf MHZ] [--since TIME] [--until TIME]
+    recording_store.py extract DIR [ID...] [--rf MHZ] [-o OUT_DIR]
+'''
+import argparse
+from dataclasses import dataclass, asdict
+import itertools
+import json
+import os
+from pathlib import Path
+import threading
+import time
+from typing import Iterator
+import wave
+
+INDEX_NAME = 'index.jsonl'
+SEGMENT_MB = 256
+
+_store_numbers = itertools.count(1)  # tells the stores of one process apart
+
+
+@dataclass(kw_only=True)
+class StoreParams:
+    '''
+    Holds the recording store command line options
+
+    directory (str): Store directory
+    segment_mb (int): Size of the segment files in MiB
+    '''
+    directory: str
+    segment_mb: int = SEGMENT_MB
+
+    def __post_init__(self):
+        if not self.directory:
+            raise ValueError('Recording store directory must not be empty')
+        if self.segment_mb <= 0:
+            raise ValueError(f'Segment size must be positive: {self.segment_mb} MiB')
+
+
+@dataclass(kw_only=True)
+class StoredRecording:
+    '''
+    Index entry of a recording
+
+    id (str): Identifier in the store
+    segment (str): Segment file name
+    offset (int): Byte offset in the segment
+    length (int): Length in bytes
+    name (str): Original file name
+    rf (float): Frequency in MHz
+    start (float): Start time (seconds since the epoch)
+    duration (float | None): Length in seconds (None if unknown)
+    classification (str | None): Classification of the audio
+    channel (int | None): Demodulator number
+    '''
+    id: str
+    segment: str
+    offset: int
+    length: int
+    name: str
+    rf: float
+    start: float
+    duration: float | None = None
+    classification: str | None = None
+    channel: int | None = None
+
+
+def wav_duration(path: str | Path) -> float | None:
+    '''
+    Length of a WAV file in seconds (None if it is not readable)
+    '''
+    try:
+        with wave.open(str(path)) as wav:
+            return wav.getnframes() / wav.getframerate()
+    except (wave.Error, EOFError, OSError, ZeroDivisionError):
+        return None
+
+
+class RecordingStore:
+    '''
+    Writer of a recording store (thread safe)
+
+    Args:
+        directory (str | Path): Store directory (created if needed)
+        segment_size (int): Bytes after which a new segment is started
+    '''
+
+    def __init__(self, directory: str | Path, segment_size: int=SEGMENT_MB * 2**20) -> None:
+        if segment_size <= 0:
+            raise ValueError(f'Segment size must be positive: {segment_size}')
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.segment_size = segment_size
+        self.tag = f'{time.strftime("%Y%m%d%H%M%S")}-{os.getpid()}-{next(_store_numbers)}'
+        self.lock = threading.Lock()
+        self.count = 0
+        self.segment_count = 0
+        self.segment: Path | None = None
+        self.segment_file = None
+
+    @classmethod
+    def from_params(cls, params: StoreParams) -> 'RecordingStore':
+        return cls(params.directory, params.segment_mb * 2**20)
+
+    def reserve(self) -> str:
+        """Identifier for a recording that will be appended later"""
+        with self.lock:
+            self.count += 1
+            return f'{self.tag}-{self.count}'
+
+    def reference(self, record_id: str) -> str:
+        """How the recording is referred to outside the store"""
+        return f'{self.directory}#{record_id}'
+
+    def _open_segment(self) -> None:
+        if self.segment_file is not None:
+            self.segment_file.close()
+        self.segment_count += 1
+        self.segment = self.directory / f'{self.tag}-{self.segment_count:04d}.seg'
+        self.segment_file = open(self.segment, 'ab')
+
+    def append(self, record_id: str, path: str | Path, *, rf: float,
+               start: float, duration: float | None=None,
+               classification: str | None=None,
+               channel: int | None=None,
+               name: str | None=None) -> StoredRecording:
+        """Append a recording file to the store and remove the file
+
+        Args:
+            record_id (str): Identifier from reserve()
+            path (str | Path): Recording file
+            name (str | None): Name of the recording in the index (default
+                the file name of path)
+            The others are as in StoredRecording
+
+        Returns:
+            StoredRecording: The index entry
+        """
+        data = Path(path).read_bytes()
+        with self.lock:
+            if self.segment_file is None or \
+                    self.segment_file.tell() + len(data) > self.segment_size:
+                self._open_segment()
+            assert self.segment is not None
+            offset = self.segment_file.tell()
+            self.segment_file.write(data)
+            self.segment_file.flush()
+
+            entry = StoredRecording(id=record_id, segment=self.segment.name,
+                                    offset=offset, length=len(data),
+                                    name=name or Path(path).name, rf=rf, start=start,
+                                    duration=duration,
+                                    classification=classification,
+                                    channel=channel)
+            line = (json.dumps(asdict(entry)) + '\n').encode()
+            fd = os.open(self.directory / INDEX_NAME,
+                         os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line)
+            finally:
+                os.close(fd)
+
+        os.unlink(path)
+        return entry
+
+    def close(self) -> None:
+        with self.lock:
+            if self.segment_file is not None:
+                self.segment_file.close()
+                self.segment_file = None
+
+
+def read_index(directory: str | Path) -> Iterator[StoredRecording]:
+    '''
+    Entries of a store in the order they were written
+
+    A partly written last line (crash) is skipped
+    '''
+    index = Path(directory) / INDEX_NAME
+    if not index.exists():
+        return
+    with open(index) as file:
+        for line in file:
+            try:
+                yield StoredRecording(**json.loads(line))
+            except (json.JSONDecodeError, TypeError):
+                continue
+
+
+def select(entries: Iterator[StoredRecording], ids: list[str] | None=None,
+           rf: float | None=None, since: float | None=None,
+           until: float | None=None) -> list[StoredRecording]:
+    '''
+    Entries matching all the given filters
+    '''
+    selected = []
+    for entry in entries:
+        if ids and entry.id not in ids:
+            continue
+        if rf is not None and abs(entry.rf - rf) > 0.0005:
+            continue
+        if since is not None and entry.start < since:
+            continue
+        if until is not None and entry.start > until:
+            continue
+        selected.append(entry)
+    return selected
+
+
+def read_recording(directory: str | Path, entry: StoredRecording) -> bytes:
+    '''
+    Contents of a stored recording
+    '''
+    with open(Path(directory) / entry.segment, 'rb') as file:
+        file.seek(entry.offset)
+        data = file.read(entry.length)
+    if len(data) != entry.length:
+        raise ValueError(f'Segment {entry.segment} is truncated ({entry.id})')
+    return data
+
+
+def extract(directory: str | Path, entry: StoredRecording,
+            out_dir: str | Path) -> Path:
+    '''
+    Write a stored recording to a file with its original name
+    '''
+    target = Path(out_dir) / entry.name
+    target.parent.mkdir(parents=True, exist_ok=True)
+    target.write_bytes(read_recording(directory, entry))
+    return target
+
+
+def _parse_time(text: str) -> float:
+    # seconds since the epoch or an ISO date/time
+    try:
+        return float(text)
+    except ValueError:
+        from datetime import datetime
+        return datetime.fromisoformat(text).timestamp()
+
+
+def main() -> None:
+    """List or extract recordings of a store"""
+    parser = argparse.ArgumentParser(description='Recording store tool')
+    parser.add_argument('command', choices=['list', 'extract'])
+    parser.add_argument('directory', help='Store directory')
+    parser.add_argument('ids', nargs='*', help='Recording ids (default all)')
+    parser.add_argument('--rf', type=float, help='Frequency in MHz')
+    parser.add_argument('--since', type=_parse_time,
+                        help='Start time (epoch seconds or ISO format)')
+    parser.add_argument('--until', type=_parse_time,
+                        help='End time (epoch seconds or ISO format)')
+    parser.add_argument('-o', '--out', default='.', help='Extract to this directory')
+    options = parser.parse_args()
+
+    entries = select(read_index(options.directory), options.ids, options.rf,
+                     options.since, options.until)
+    for entry in entries:
+        if options.command == 'list':
+            start = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(entry.start))
+            duration = f'{entry.duration:6.1f}s' if entry.duration is not None else '     ?'
+            print(f'{entry.id:<28} {entry.rf:10.4f} {start} {duration} '
+                  f'{entry.classification or "-":<2} {entry.name}')
+        else:
+            print(extract(options.directory, entry, options.out))
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except KeyboardInterrupt:
+        pass
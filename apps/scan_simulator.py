@@ -0,0 +1,405 @@
+'''
+Offline scan schedule simulator.
+
+Runs the FrequencyProvider (with the chosen step schedule) in an asyncio
+event loop with virtual time against an activity trace: a list of
+transmissions, each with a frequency, start and duration.  A simplified
+scanner looks at the trace once per scan cycle:
+
+- a transmission is in view when it is inside the usable bandwidth of the
+  current step (and not on the DC channel)
+- spectra right after a retune are skipped (settle, see --retune_settle)
+- a transmission in view gets a free demodulator and keeps it until it
+  ends or the step changes, its start is reported to the provider as the
+  scanner does when not recording (transmission_started and
+  interesting_activity)
+- the survey schedule gets the channels in view and no demodulators
+
+The report shows the revisit intervals of the steps, the fraction of the
+transmissions caught and why the others were missed: never in view while
+on the air (dwell) or in view with all the demodulators busy (demod).
+
+Hours of scanning take seconds, so frequencies, sample rate, timeouts,
+number of demodulators and schedules can be compared before deploying.
+The trace is either synthetic or a CSV file with freq (MHz), start and
+duration (seconds) columns.
+'''
+import argparse
+import asyncio
+import csv
+from dataclasses import dataclass, field
+import logging
+import random
+import selectors
+import statistics
+
+from center_frequency_provider import (FrequencyGroup, FrequencyProvider,
+                                       FrequencyRangeParams, FrequencySingleParams,
+                                       SCHEDULES)
+from step_planner import USABLE_BANDWIDTH
+
+CYCLE_INTERVAL = 0.1  # seconds between scan cycles (the scanner's idle pacing)
+RETUNE_SETTLE = 0.05  # seconds of stale spectra after a retune
+
+
+class VirtualClock:
+    '''
+    Simulated time in seconds, advanced by the event loop
+    '''
+
+    def __init__(self, now: float=0.0) -> None:
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class _VirtualSelector(selectors.SelectSelector):
+    '''
+    Selector that jumps the clock ahead instead of waiting
+    '''
+
+    def __init__(self, clock: VirtualClock) -> None:
+        super().__init__()
+        self.clock = clock
+
+    def select(self, timeout=None):
+        if timeout is not None and timeout > 0:
+            self.clock.now += timeout
+        return []
+
+
+class VirtualTimeLoop(asyncio.SelectorEventLoop):
+    '''
+    Event loop whose timers run on a virtual clock.  Nothing ever waits for
+    I/O, so only timers and tasks can be used.
+    '''
+
+    def __init__(self, clock: VirtualClock) -> None:
+        self.clock = clock
+        super().__init__(_VirtualSelector(clock))
+
+    def time(self) -> float:
+        return self.clock.now
+
+
+@dataclass(kw_only=True)
+class Transmission:
+    '''
+    One transmission of the trace
+
+    freq (int): RF frequency in Hz
+    start (float): Start in seconds from the start of the trace
+    duration (float): Length in seconds
+    '''
+    freq: int
+    start: float
+    duration: float
+
+    @property
+    def end(self) -> float:
+        return self.start + self.duration
+
+
+@dataclass(kw_only=True)
+class SimulationParams:
+    '''
+    Holds the simulated scanner options
+
+    frequency_params (FrequencyGroup): Frequencies, sample rate, timeouts
+        and schedule as for ham2mon
+    num_demod (int): Number of demodulators
+    duration (float): Seconds to simulate
+    cycle (float): Seconds between scan cycles
+    settle (float): Seconds of stale spectra after each retune
+    '''
+    frequency_params: FrequencyGroup
+    num_demod: int = 4
+    duration: float = 3600
+    cycle: float = CYCLE_INTERVAL
+    settle: float = RETUNE_SETTLE
+
+    def __post_init__(self):
+        if self.num_demod < 1:
+            raise ValueError(f'At least one demodulator is needed: {self.num_demod}')
+        if self.duration <= 0 or self.cycle <= 0:
+            raise ValueError(f'Duration and cycle must be positive: {self.duration} {self.cycle}')
+        if self.settle < 0:
+            raise ValueError(f'Retune settle must not be negative: {self.settle}')
+
+
+@dataclass(kw_only=True)
+class SimulationReport:
+    '''
+    Outcome of a simulation
+
+    Attributes:
+        steps (list[int]): Center frequencies of the steps in Hz
+        transmissions (int): Transmissions in the simulated time
+        caught (int): Transmissions that got a demodulator
+        missed_dwell (int): Transmissions never in view while on the air
+        missed_demod (int): Transmissions in view with no free demodulator
+        airtime (float): Part of the air time of the transmissions heard
+        revisits (dict[int, list[float]]): Seconds between the visits of
+            each step (by center frequency)
+        retunes (int): Step changes
+        stale_spectra (int): Scan cycles skipped after a retune
+    '''
+    steps: list[int]
+    transmissions: int = 0
+    caught: int = 0
+    missed_dwell: int = 0
+    missed_demod: int = 0
+    airtime: float = 0.0
+    revisits: dict[int, list[float]] = field(default_factory=dict)
+    retunes: int = 0
+    stale_spectra: int = 0
+
+    @property
+    def caught_fraction(self) -> float:
+        return self.caught / self.transmissions if self.transmissions else 0.0
+
+    def summary(self) -> list[str]:
+        """Report lines for printing"""
+        lines = [f'{len(self.steps)} steps, {self.retunes} retunes, '
+                 f'{self.stale_spectra} stale spectra',
+                 f'transmissions: {self.transmissions}  caught: {self.caught} '
+                 f'({self.caught_fraction:.1%})  missed (dwell): {self.missed_dwell}  '
+                 f'missed (demod): {self.missed_demod}',
+                 f'air time heard: {self.airtime:.1%}']
+        for (center, intervals) in self.revisits.items():
+            if intervals:
+                lines.append(f'{center/1E6:10.4f} MHz revisit mean {statistics.mean(intervals):7.1f} s '
+                             f'max {max(intervals):7.1f} s ({len(intervals) + 1} visits)')
+            else:
+                lines.append(f'{center/1E6:10.4f} MHz visited once')
+        return lines
+
+
+class _Outcome:
+    # What the simulated scanner saw of one transmission
+    def __init__(self) -> None:
+        self.in_view = False
+        self.caught = False
+        self.heard = 0.0
+
+
+class ScanSimulator:
+    '''
+    Simplified scanner driving a FrequencyProvider in virtual time
+
+    Args:
+        params (SimulationParams): Scanner options
+        trace (list[Transmission]): Activity to scan
+    '''
+
+    def __init__(self, params: SimulationParams, trace: list[Transmission]) -> None:
+        self.params = params
+        self.trace = sorted((transmission for transmission in trace
+                             if transmission.start < params.duration),
+                            key=lambda transmission: transmission.start)
+        self.clock = VirtualClock()
+        self.half_view = params.frequency_params.sample_rate * USABLE_BANDWIDTH / 2
+        self.spacing = params.frequency_params.channel_spacing
+
+    def run(self) -> SimulationReport:
+        """Simulate the scanning of the trace"""
+        loop = VirtualTimeLoop(self.clock)
+        try:
+            return loop.run_until_complete(self._simulate())
+        finally:
+            loop.close()
+
+    def _in_view(self, transmission: Transmission, center_freq: int) -> bool:
+        if abs(transmission.freq - center_freq) > self.half_view:
+            return False
+        # The scanner drops the channel at the center (offset 0)
+        return round(transmission.freq / self.spacing) * self.spacing != center_freq
+
+    async def _simulate(self) -> SimulationReport:
+        params = self.params
+        frequency_params = params.frequency_params
+        visits: dict[int, list[float]] = {}
+        retuned = [0.0]
+        report = SimulationReport(steps=[])
+
+        def center_changed() -> None:
+            retuned[0] = self.clock.now
+            report.retunes += 1
+            visits.setdefault(provider.center_freq, []).append(self.clock.now)
+
+        frequency_params.notify_scanner = center_changed
+        frequency_params.wait_settled = lambda: asyncio.sleep(params.settle)
+        provider = FrequencyProvider(frequency_params, self.clock)
+        report.steps = list(provider.steps)
+        visits[provider.center_freq] = [self.clock.now]
+
+        outcomes = [_Outcome() for _ in self.trace]
+        demodulated: set[int] = set()  # trace indexes holding a demodulator
+        center_freq = provider.center_freq
+        first = 0  # trace index of the earliest transmission still on the air
+
+        while self.clock.now < params.duration:
+            now = self.clock.now
+            if provider.center_freq != center_freq:
+                center_freq = provider.center_freq
+                demodulated.clear()  # the demodulators are retuned as well
+
+            while first < len(self.trace) and self.trace[first].end <= now:
+                first += 1
+            on_air = []
+            for idx in range(first, len(self.trace)):
+                if self.trace[idx].start > now:
+                    break  # sorted by start, the rest are later
+                if now < self.trace[idx].end:
+                    on_air.append(idx)
+            in_view = [idx for idx in on_air
+                       if self._in_view(self.trace[idx], center_freq)]
+
+            demodulated.intersection_update(in_view)
+            for idx in demodulated:
+                outcomes[idx].heard += params.cycle
+
+            if now - retuned[0] < params.settle:
+                report.stale_spectra += 1
+            elif provider.surveying:
+                provider.observe(center_freq, [self.trace[idx].freq for idx in in_view])
+            else:
+                if provider.observes:
+                    provider.observe(center_freq, [self.trace[idx].freq for idx in in_view])
+                for idx in in_view:
+                    outcomes[idx].in_view = True
+                    if idx in demodulated or len(demodulated) >= params.num_demod:
+                        continue
+                    demodulated.add(idx)
+                    outcomes[idx].caught = True
+                    provider.transmission_started()
+                    await provider.interesting_activity()
+
+            await asyncio.sleep(params.cycle)
+
+        if not provider.not_stepping():
+            provider.step_task.cancel()
+
+        airtime = 0.0
+        for (transmission, outcome) in zip(self.trace, outcomes):
+            report.transmissions += 1
+            airtime += min(transmission.duration, params.duration - transmission.start)
+            report.airtime += outcome.heard
+            if outcome.caught:
+                report.caught += 1
+            elif outcome.in_view:
+                report.missed_demod += 1
+            else:
+                report.missed_dwell += 1
+        report.airtime = min(report.airtime / airtime, 1.0) if airtime else 0.0
+        report.revisits = {center: [later - earlier for (earlier, later) in zip(times, times[1:])]
+                           for (center, times) in visits.items()}
+        return report
+
+
+def synthetic_trace(freqs: list[int], duration: float, per_hour: float=6,
+                    mean_length: float=5, seed: int | None=None) -> list[Transmission]:
+    '''
+    Random transmissions on each frequency (Poisson starts, exponential lengths)
+
+    Args:
+        freqs (list[int]): Frequencies in Hz
+        duration (float): Seconds of trace
+        per_hour (float): Average transmissions per hour on each frequency
+        mean_length (float): Average length in seconds
+        seed (int | None): Seed for a repeatable trace
+    '''
+    rng = random.Random(seed)
+    trace = []
+    for freq in freqs:
+        start = rng.expovariate(per_hour / 3600)
+        while start < duration:
+            length = rng.expovariate(1 / mean_length)
+            trace.append(Transmission(freq=freq, start=start, duration=length))
+            start += length + rng.expovariate(per_hour / 3600)
+    return trace
+
+
+def read_trace(file_name: str) -> list[Transmission]:
+    '''
+    Transmissions from a CSV file with freq (MHz), start and duration
+    (seconds) columns
+
+    Raises:
+        ValueError: Missing column or a value that is not a number
+    '''
+    with open(file_name, newline='') as file:
+        reader = csv.DictReader(file)
+        try:
+            return [Transmission(freq=int(round(float(row['freq']) * 1E6)),
+                                 start=float(row['start']),
+                                 duration=float(row['duration']))
+                    for row in reader]
+        except (KeyError, TypeError, ValueError) as error:
+            raise ValueError(f'{file_name} line {reader.line_num}: {error}') from None
+
+
+def _frequency_group(freq_spec: list[str], options: argparse.Namespace) -> FrequencyGroup:
+    # -f format as for ham2mon (MHz values and ranges)
+    singles = []
+    ranges = []
+    for entry in freq_spec:
+        if '-' in entry:
+            (lower, upper) = entry.split('-')
+            ranges.append(FrequencyRangeParams(lower_freq=int(float(lower) * 1E6),
+                                               upper_freq=int(float(upper) * 1E6)))
+        else:
+            singles.append(FrequencySingleParams(freq=int(float(entry) * 1E6)))
+    return FrequencyGroup(ranges=ranges, singles=singles,
+                          sample_rate=int(options.ask_samp_rate),
+                          quiet_timeout=options.quiet_timeout,
+                          active_timeout=options.active_timeout,
+                          schedule=options.schedule,
+                          max_revisit=options.max_revisit)
+
+
+def main() -> None:
+    """Simulate scanning a trace"""
+    parser = argparse.ArgumentParser(description='Scan schedule simulator')
+    parser.add_argument('-f', '--freq', nargs='+', dest='freq_spec',
+                        default=['450.0-470.0'], help='Frequencies and ranges in MHz')
+    parser.add_argument('-r', '--rate', type=float, dest='ask_samp_rate', default=4E6)
+    parser.add_argument('-n', '--demod', type=int, dest='num_demod', default=4)
+    parser.add_argument('--quiet_timeout', type=float, default=10)
+    parser.add_argument('--active_timeout', type=float, default=16)
+    parser.add_argument('--schedule', choices=SCHEDULES, default='round_robin')
+    parser.add_argument('--max_revisit', type=float, default=120)
+    parser.add_argument('--trace', help='CSV file with freq (MHz), start, duration')
+    parser.add_argument('--duration', type=float, default=3600, help='Seconds to simulate')
+    parser.add_argument('--channels', type=int, default=40,
+                        help='Busy channels of the synthetic trace')
+    parser.add_argument('--per_hour', type=float, default=6,
+                        help='Transmissions per hour and channel (synthetic trace)')
+    parser.add_argument('--seed', type=int, default=1)
+    options = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    frequency_params = _frequency_group(options.freq_spec, options)
+    if options.trace:
+        trace = read_trace(options.trace)
+    else:
+        rng = random.Random(options.seed)
+        freqs = []
+        for a_range in frequency_params.ranges:
+            channels = range(a_range.lower_freq, a_range.upper_freq, 12500)
+            freqs += rng.sample(channels, min(options.channels, len(channels)))
+        freqs += [single.freq + 12500 for single in frequency_params.singles]
+        trace = synthetic_trace(freqs, options.duration, options.per_hour, seed=options.seed)
+
+    params = SimulationParams(frequency_params=frequency_params,
+                              num_demod=options.num_demod, duration=options.duration)
+    for line in ScanSimulator(params, trace).run().summary():
+        print(line)
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except KeyboardInterrupt:
+        pass
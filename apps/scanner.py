@@ -15,13 +15,23 @@ import sys
 import logging
 from numpy.typing import NDArray
 from channel_loggers import ChannelLogParams, ChannelMessage, ChannelLogger
-from classification import ClassifierParams
+from classification import Classifier, ClassifierParams
+from detection import DetectionParams, SpectrumPacer, cycle_interval
+from devices import DeviceParams
 from center_frequency_provider import FrequencyGroup, FrequencyProvider
 from frequency_manager import FrequencyManager, FrequencyList, FrequencyConfiguration, ChannelFrequency, ChannelList
-from utilities import baseband_to_frequency, frequency_to_baseband
-#import asyncio
+from utilities import hz_to_baseband, hz_to_mhz
+from channel_planner import build_channels, plan_assignments
+from audio_streaming import AudioStreamServer
+from recording_store import StoreParams
+from tmp_recordings import TmpAreaParams
+import asyncio
 from dataclasses import dataclass, field
 
+# Scan cycle pacing in seconds (see also detection.SpectrumPacer)
+MAX_SETTLE_WAIT = 1.0       # give up waiting for a clean spectrum after a retune
+WATCH_INTERVAL = 2.0        # check the frequency file for changes (--watch-frequencies)
+
 @dataclass(kw_only=True)
 class ClassificationCount:
     V: int = field(default=0)
@@ -55,18 +65,41 @@ class Scanner(object):
         classifier_params (ClassifierParams): Parameters for channel classification
         auto_priority (bool): Automatically set priority channels
         agc (bool): Automatic gain control
+        detection_params (DetectionParams): FFT size and rates for channel detection
+        shared_frontend (bool): Demodulators share a sub-band decimation front end
+        channel_logger (ChannelLogger | None): Existing channel logger to use
+            (None = create one from channel_log_params)
+        classifier (Classifier | None): Existing classifier to use
+        demod_workers (int): Run the demodulators in this many worker processes
+            (0 = in the receiver flowgraph)
+        iq_ring (str | None): Name of a shared-memory ring for the hardware IQ
+        baseband_ring (str | None): Name prefix of shared-memory rings for the
+            channel baseband of each demodulator
+        stream_server (AudioStreamServer | None): Server for the audio streams
+        mix_stream (str): Stream name of the mix of the demodulators
+        record_format (str): Format of the accepted recordings (wav, flac, opus)
+        record_store (StoreParams | None): Recording store for the accepted
+            recordings (None = one file each)
+        tmp_area (TmpAreaParams): RAM backed directory and memory budget for
+            the recordings before they are accepted
 
     Attributes:
+        hw_args (string): Argument string passed to hardware
         center_freq (int): Hardware RF center frequency in Hz
         samp_rate (int): Hardware sample rate in sps (1E6 min)
         gains : Enumerated gain types and values
         squelch_db (int): Squelch in dB
         volume_dB (int): Volume in dB
-        threshold_dB (int): Threshold for channel detection in dB
+        threshold_dB (int): Threshold for channel detection in dB (relative to
+            the noise floor if the detection threshold mode is relative)
         spectrum (numpy.ndarray): FFT power spectrum data in linear, not dB
+        spectrum_seq (int): Probe sequence number of the spectrum
+        stale_spectra (int): Spectra skipped because they held samples from
+            before a retune
         frequencies (FrequencyList): List of frequencies including baseband values
         channel_spacing (float):  Spacing that channels will be rounded
         lockout_file_name (string): Name of file with channels to lockout
+        peers (list[Scanner]): Scanners of other devices that share the frequencies
     """
     # pylint: disable=too-many-instance-attributes
     # pylint: disable=too-many-arguments
@@ -80,7 +113,17 @@ class Scanner(object):
                  frequency_params: FrequencyGroup=FrequencyGroup(sample_rate=int(4E6)),
                  min_recording: float=0, max_recording: float=0,
                  classifier_params: ClassifierParams=None,
-                 auto_priority: bool=False, agc: bool=False):
+                 auto_priority: bool=False, agc: bool=False,
+                 detection_params: DetectionParams=DetectionParams(),
+                 shared_frontend: bool=False,
+                 channel_logger: ChannelLogger | None=None,
+                 classifier: Classifier | None=None,
+                 demod_workers: int=0, iq_ring: str | None=None,
+                 baseband_ring: str | None=None,
+                 stream_server: AudioStreamServer | None=None,
+                 mix_stream: str='mix', record_format: str='wav',
+                 record_store: StoreParams | None=None,
+                 tmp_area: TmpAreaParams=TmpAreaParams()):
 
         # Default values
         self.squelch_db = -60
@@ -92,6 +135,8 @@ class Scanner(object):
         self.samp_rate: int
         self.frequency_params = frequency_params
         self.spectrum: NDArray = np.empty(0)
+        self.spectrum_seq: int = 0
+        self.stale_spectra: int = 0
         self.frequencies: FrequencyList = []    # needed for the UI
         self.channels: ChannelList = []
         self._channels: ChannelList = []
@@ -102,22 +147,38 @@ class Scanner(object):
         self.log_mode = ""
         self.hang_time: float = 1.0
         self.max_recording = max_recording
-        self.xmit_stats: dict[float, ClassificationCount] = {}
+        self.xmit_stats: dict[int, ClassificationCount] = {}   # by RF in Hz
         self.auto_priority = auto_priority
+        self.detection_params = detection_params
+        self.hw_args = hw_args
+        self.peers: list[Scanner] = []
 
-        self.channel_logger = ChannelLogger.get_logger(channel_log_params)
+        if channel_logger is None:
+            channel_logger = ChannelLogger.get_logger(channel_log_params)
+        self.channel_logger = channel_logger
 
         # Create receiver object
         self.receiver = recvr.Receiver(ask_samp_rate, num_demod, type_demod,
                                        hw_args, freq_correction, record, play,
                                        audio_bps, min_recording, classifier_params,
-                                       self.got_channel_activity, agc)
+                                       self.got_channel_activity, agc,
+                                       detection_params, shared_frontend,
+                                       classifier, demod_workers, iq_ring,
+                                       baseband_ring, stream_server, mix_stream,
+                                       record_format, record_store, tmp_area)
 
         # Get the hardware sample rate
         self.samp_rate = self.receiver.samp_rate
 
+        # Noise floor tracking for thresholds relative to the floor
+        self.noise_floor = estimate.NoiseFloor(
+            detection_params.get_floor_depth(self.receiver.probe_rate),
+            detection_params.floor_percentile)
+
         self.frequency_params.notify_scanner = self.center_freq_changed
+        self.frequency_params.wait_settled = self.wait_settled
         self.frequency_params.sample_rate = self.samp_rate  # update with hardware sample rate
+        self.frequency_params.channel_spacing = self.channel_spacing  # occupancy map
 
         self.frequency_provider = FrequencyProvider(self.frequency_params)
 
@@ -132,6 +193,27 @@ class Scanner(object):
 
         self.frequency_manager = FrequencyManager(frequency_configuration, self.channel_spacing)
         # self.frequencies = self.frequency_manager.frequencies
+        self.watch_task: asyncio.Task | None = None
+
+        # Wake the scan cycle when the flowgraph produces a spectrum
+        # and the frequency provider when the first clean one after a retune
+        self.pacer = SpectrumPacer(self.receiver.spectrum_probe)
+        self.settled = asyncio.Event()
+        self.settled.set()
+        loop = asyncio.get_running_loop()
+
+        def spectrum_arrived() -> None:
+            self.pacer.arrived()
+            if self.receiver.spectrum_clean():
+                self.settled.set()
+
+        def spectrum_ready() -> None:
+            try:
+                loop.call_soon_threadsafe(spectrum_arrived)
+            except RuntimeError:
+                pass  # loop closed, we are shutting down
+
+        self.receiver.spectrum_probe.set_callback(spectrum_ready)
 
         # Start the receiver and wait for samples to accumulate
         self.receiver.start()
@@ -146,10 +228,37 @@ class Scanner(object):
 
         self.frequency_params.notify_interface()
     
+    async def wait_ready(self) -> None:
+        '''
+        Wait until the receiver is ready (demodulator worker processes started)
+        '''
+        await self.receiver.wait_workers()
+
+    async def wait_for_spectrum(self) -> None:
+        '''
+        Wait until the next scan cycle is due.  This is when a new spectrum is
+        available from the probe and the adaptive cycle interval has passed.
+        Returns after detection.MAX_CYCLE_WAIT even without a new spectrum so the
+        caller (e.g. user interface) is not stalled.
+        '''
+        interval = cycle_interval(self.channels, self.receiver.get_demod_freqs())
+        await self.pacer.wait(self.spectrum_seq, interval)
+
+    async def wait_settled(self) -> None:
+        '''
+        Wait for the first clean spectrum after a retune so the time on a
+        step is not spent on spectra of the previous step.  Returns after
+        MAX_SETTLE_WAIT regardless.
+        '''
+        try:
+            await asyncio.wait_for(self.settled.wait(), MAX_SETTLE_WAIT)
+        except asyncio.TimeoutError:
+            logging.debug('No clean spectrum after retune')
+
     async def scan_cycle(self) -> None:
         """Execute one scan cycle
 
-        Should be called no more than 10 Hz rate
+        Call after wait_for_spectrum() so it runs once per new spectrum
         Estimates channels from FFT power spectrum that are above threshold
         Rounds channels to nearest 5 kHz
         Moves priority channels in front
@@ -159,10 +268,31 @@ class Scanner(object):
         Log recent active channels
         """
 
+        self.pacer.cycle_started()
+
+        # Skip spectra holding samples from before the last retune, their
+        # channels would be at the wrong baseband offsets
+        if not self.receiver.spectrum_clean():
+            self.spectrum_seq = self.receiver.spectrum_probe.seq
+            self.stale_spectra += 1
+            return
+
         raw_channels = self._get_raw_channels()
 
         self._channels = self._add_metadata(raw_channels)
 
+        if self.frequency_provider.observes:
+            self.frequency_provider.observe(
+                self.center_freq,
+                [int(channel) + self.center_freq for channel in raw_channels
+                 if not self.frequency_manager.locked_out(int(channel))])
+
+        # A survey only collects spectra
+        if self.frequency_provider.surveying:
+            await self._park_demodulators()
+            self.channels = self._channels
+            return
+
         await self._process_current_demodulators(self._channels)
 
         await self._assign_channels_to_demodulators(self._channels)
@@ -173,8 +303,12 @@ class Scanner(object):
 
     def _get_raw_channels(self) -> NDArray:
         # Grab the FFT data, set threshold, and estimate baseband channels
-        self.spectrum = self.receiver.probe_signal_vf.level()
+        self.spectrum_seq = self.receiver.spectrum_probe.seq
+        self.spectrum = self.receiver.spectrum_probe.level()
         threshold = 10**(self.threshold_db/10.0)
+        if self.detection_params.threshold == 'relative':
+            threshold = self.noise_floor.update(self.spectrum, self.spectrum_seq,
+                                                threshold) * threshold
         channels = np.array(
             estimate.channel_estimate(self.spectrum, threshold))
 
@@ -223,71 +357,89 @@ class Scanner(object):
                     # clear the demodulator to reset file
                     await demodulator.set_center_freq(0, self.center_freq)
 
+    async def _park_demodulators(self) -> None:
+        for demodulator in self.receiver.demodulators:
+            if demodulator.center_freq != 0:
+                await demodulator.set_center_freq(0, self.center_freq)
+
     async def _assign_channels_to_demodulators(self, channels: ChannelList) -> None:
 
-        # assign channels to available demodulators
-        for channel in [channel for channel in channels if not channel.hanging]:
-        #for channel in channels:
-            # If channel not in demodulators
-            if channel.bb not in self.receiver.get_demod_freqs() and not channel.locked:
-                # Sequence through each demodulator
-                for idx in range(len(self.receiver.demodulators)):
-                    demodulator = self.receiver.demodulators[idx]
-                    # If channel is higher priority than what is being demodulated
-                    if self.frequency_manager.is_higher_priority(channel.bb, demodulator.center_freq):
-                        # Assigning channel to empty demodulator
-                        await demodulator.set_center_freq(
-                            channel.bb, self.center_freq)
-                        break
-                    else:
-                        pass
-            else:
-                pass
+        # assign channels to free demodulators or preempt lower priority ones
+        assignments = plan_assignments(channels, self.receiver.get_demod_freqs(),
+                                       not self.frequency_manager.config.disable_priority)
+        for idx, channel_bb in assignments:
+            await self.receiver.demodulators[idx].set_center_freq(
+                channel_bb, self.center_freq)
 
     def _add_metadata(self, active_channels: NDArray) -> ChannelList:
 
-        all_channels = active_channels   # start out with the active channels
-
-        # If a demodulator is not in channel list than it is waiting for hang time to end
-        # There is no activity on it so it was not in the scan
-        demod_freqs = self.receiver.get_demod_freqs()
-        for demod_freq in demod_freqs:
-            if demod_freq != 0 and demod_freq not in all_channels:
-               all_channels = np.append(all_channels, demod_freq)
-
-        sweep: ChannelList = []
-        for channel in all_channels:
-            frequency = baseband_to_frequency(channel, self.receiver.center_freq)
-            priority = self.frequency_manager.is_priority(channel)
-            idx = 0 if priority is not None else len(sweep)  # priority channels up front
-            sweep.insert(idx, ChannelFrequency(bb=channel,
-                                      rf=frequency,
-                                      locked=self.frequency_manager.locked_out(channel),
-                                      active=channel in demod_freqs and channel in active_channels,
-                                      priority=priority,
-                                      hanging=channel in demod_freqs and channel not in active_channels,
-                                      label=self.frequency_manager.get_label(frequency)))
-
-        return sweep
+        return build_channels(active_channels, self.receiver.get_demod_freqs(),
+                              self.receiver.center_freq, self.frequency_manager)
 
     async def add_lockout(self, idx: int) -> None:
         # need the same subset here as in cursesgui.ChannelWindow so idx gets the right channel
         subset = [c for c in self.channels if c.active or c.hanging]
         try:
-            self.frequencies = await self.frequency_manager.change({'single': subset[idx].rf, 'locked': True, 'mode': 'add'})
+            entry = {'single': subset[idx].rf, 'locked': True, 'mode': 'add'}
         except IndexError:
             # user selected a digit but no channels in interface
             return
-    
+        await self.change_frequency(entry)
+
+    async def change_frequency(self, entry: dict) -> None:
+        """
+        Change (or add) a frequency and apply the same change for the
+        scanners of the other devices so they all share the frequency data.
+
+        Args:
+            entry (dict): Dictionary of frequency attributes (see FrequencyManager.change)
+        """
+        self.frequencies = await self.frequency_manager.change(entry)
+        for peer in self.peers:
+            peer.frequencies = await peer.frequency_manager.change(entry)
+
     async def clear_lockout(self) -> None:
         """
         Clears lockout channels and rebuilds based on config.  Usually called
         by the user interface ('l' key).
         """
         self.frequencies = await self.frequency_manager.load()
+        for peer in self.peers:
+            peer.frequencies = await peer.frequency_manager.load()
 
     async def load_frequencies(self) -> None:
-        self.frequencies = await self.frequency_manager.load()
+        await self.frequency_manager.load()
+        # and the lockouts and priorities of the previous session
+        self.frequencies = await self.frequency_manager.restore()
+
+        self.plan_steps()
+
+        if self.frequency_manager.config.watch and self.watch_task is None:
+            self.watch_task = asyncio.create_task(self.watch_frequencies())
+
+    async def watch_frequencies(self) -> None:
+        '''
+        Apply the changes of the frequency file while scanning
+        '''
+        while True:
+            await asyncio.sleep(WATCH_INTERVAL)
+            if not await self.frequency_manager.reload():
+                continue
+            self.frequencies = self.frequency_manager.frequencies
+            self.plan_steps()
+
+    def plan_steps(self) -> None:
+        '''
+        Place the range steps on what the frequency file is interested in
+        (--plan_steps).  The provider only plans again if that changed.
+        '''
+        if not self.frequency_params.plan_steps:
+            return
+        if self.frequency_provider.plan_steps(self.frequency_manager.interest_frequencies()):
+            # The current step may have stayed on (no retune) but moved in the list
+            self.step = self.frequency_provider.step
+            self.steps = self.frequency_provider.steps
+            self.frequency_params.notify_interface()
 
     def set_center_freq(self, center_freq: int) -> None:
         """Sets RF center frequency of hardware, update lockout
@@ -299,6 +451,7 @@ class Scanner(object):
         # Tune the receiver then update with actual frequency
         # and on frequency provider info
         self.receiver.set_center_freq(center_freq)
+        self.settled.clear()
         self.center_freq = self.receiver.center_freq
         self.step = self.frequency_provider.step
         self.steps = self.frequency_provider.steps
@@ -306,6 +459,9 @@ class Scanner(object):
         # Recreate baseband lockout since frequency is changing
         self.frequency_manager.set_center(self.center_freq)
 
+        # Noise floor of the previous center frequency no longer applies
+        self.noise_floor.reset()
+
     def filter_and_set_gains(self, all_gains: list[dict]) -> list[dict]:
         """Set the supported gains and return them
 
@@ -365,15 +521,18 @@ class Scanner(object):
             return
 
         # embellish the message with frequency information
-        msg.label = self.frequency_manager.get_label(msg.rf)
+        msg.label = self.frequency_manager.label_at(msg.rf_hz)
         msg.priority = self.frequency_manager.is_priority(msg.bb)   # TODO: is_priority only takes base band frequency
 
         await self.channel_logger.log(msg)  # off events or nothing to note
 
+        if msg.state == 'on':
+            self.frequency_provider.transmission_started()
+
         if self.interesting(msg):
             await self.frequency_provider.interesting_activity()
 
-        await self.priority_assess(msg.rf, msg.classification)
+        await self.priority_assess(msg.rf_hz, msg.classification)
 
     def interesting(self, msg: ChannelMessage) -> bool:
         '''
@@ -393,10 +552,14 @@ class Scanner(object):
         self.receiver.stop()
         self.receiver.wait()
 
-    async def priority_assess(self, freq: float, classification: str) -> None:
+    async def priority_assess(self, rf_hz: int, classification: str) -> None:
         '''
         Track classification of transmisions and use the ratio of wanted/unwanted to
         set the priority.
+
+        Args:
+            rf_hz (int): Radio frequency of the transmission in Hz
+            classification (str): Classification of the transmission
         '''
 
         if not self.auto_priority:
@@ -405,29 +568,187 @@ class Scanner(object):
         if classification is None:  # ignore start of transission and thrown away short ones
             return
 
-        if freq not in self.xmit_stats:
-            self.xmit_stats[freq] = ClassificationCount()
-            setattr(self.xmit_stats[freq], classification, 1)
+        if rf_hz not in self.xmit_stats:
+            self.xmit_stats[rf_hz] = ClassificationCount()
+            setattr(self.xmit_stats[rf_hz], classification, 1)
         else:
-            setattr(self.xmit_stats[freq], classification,
-                    getattr(self.xmit_stats[freq], classification) + 1)
+            setattr(self.xmit_stats[rf_hz], classification,
+                    getattr(self.xmit_stats[rf_hz], classification) + 1)
 
-        bb_freq = frequency_to_baseband(float(freq), self.center_freq, self.channel_spacing)
+        bb_freq = hz_to_baseband(rf_hz, self.center_freq, self.channel_spacing)
+        freq = hz_to_mhz(rf_hz)  # the frequency file is in MHz
 
-        metrics: ClassificationCount = self.xmit_stats[freq]
+        metrics: ClassificationCount = self.xmit_stats[rf_hz]
         if metrics.V > metrics.D and metrics.V > metrics.S:  # Flag voice frequency as priority if not already set
             if self.frequency_manager.is_priority(bb_freq) is None:
                 logging.debug(f'adding {freq=} to priority list')
-                self.frequencies = await self.frequency_manager.change({'single': freq, 'priority': 1, 'mode': 'add'})
+                await self.change_frequency({'single': freq, 'priority': 1, 'mode': 'add'})
         else: # If not voice, remove from priority list if it currently a priority
             if self.frequency_manager.is_priority(bb_freq) is not None:
                 logging.debug(f'removing {freq=} from the priority list')
-                self.frequencies = await self.frequency_manager.change({'single': freq, 'priority': None, 'mode': 'add'})
+                await self.change_frequency({'single': freq, 'priority': None, 'mode': 'add'})
 
     async def clean_up(self) -> None:
+        if self.watch_task is not None:
+            self.watch_task.cancel()
+        self.frequency_manager.save()  # pending run time changes
         # cleanup terminating all demodulators
         for demod in self.receiver.demodulators:
             await demod.set_center_freq(0, self.center_freq)
+        await self.receiver.stop_workers()
+        self.receiver.finish_recordings()
+        self.receiver.close_rings()
+
+
+class ScannerGroup(object):
+    """Scanners for several SDR devices managed by one process
+
+    Each device (shard) gets its own receiver with a detection flow and a
+    demodulator pool, and its own center frequency provider.  The channel
+    logger and the classifier are shared by all shards.  The frequency data
+    is loaded by each shard (baseband values depend on its center frequency)
+    and changes such as lockouts are applied to all of them.
+
+    The user interface controls one shard at a time (the selected one).
+
+    Args:
+        devices (list[DeviceParams]): Hardware args and frequencies of each device
+
+        stream_port (int): TCP port of the audio streaming server (0 = none)
+
+        The remaining arguments are the same as for Scanner and apply to all devices
+
+    Attributes:
+        scanners (list[Scanner]): One scanner per device
+        stream_server (AudioStreamServer | None): Audio streams of all devices
+        selected (int): Index of the scanner controlled by the user interface
+    """
+    # pylint: disable=too-many-arguments
+
+    def __init__(self, devices: list[DeviceParams], ask_samp_rate: int=int(4E6),
+                 num_demod: int=4, type_demod: int=0, freq_correction: int=0,
+                 record: bool=True,
+                 frequency_configuration: FrequencyConfiguration | None=None,
+                 channel_log_params: ChannelLogParams=ChannelLogParams(type='none', target='', timeout=0),
+                 play: bool=True, audio_bps: int=8, channel_spacing: int=5000,
+                 min_recording: float=0, max_recording: float=0,
+                 classifier_params: ClassifierParams=None,
+                 auto_priority: bool=False, agc: bool=False,
+                 detection_params: DetectionParams=DetectionParams(),
+                 shared_frontend: bool=False, demod_workers: int=0,
+                 iq_ring: str | None=None, baseband_ring: str | None=None,
+                 stream_port: int=0, record_format: str='wav',
+                 record_store: StoreParams | None=None,
+                 tmp_area: TmpAreaParams=TmpAreaParams()):
+
+        self.selected = 0
+
+        # Resources shared by all the devices
+        # (demodulator worker processes create their own classifier)
+        channel_logger = ChannelLogger.get_logger(channel_log_params)
+        classifier = None
+        if demod_workers == 0:
+            classifier = recvr.create_classifier(classifier_params)
+        self.stream_server: AudioStreamServer | None = None
+        if stream_port > 0:
+            self.stream_server = AudioStreamServer(stream_port, recvr.AUDIO_RATE)
+
+        self.scanners: list[Scanner] = []
+        for (idx, device) in enumerate(devices):
+            # IQ rings and mix streams of the other devices get a suffix
+            device_ring = iq_ring
+            mix_stream = 'mix'
+            if idx > 0:
+                if iq_ring is not None:
+                    device_ring = f'{iq_ring}-{idx}'
+                mix_stream = f'mix-{idx}'
+
+            logging.debug(f'Creating scanner for device {device.hw_args}')
+            self.scanners.append(Scanner(ask_samp_rate, num_demod, type_demod,
+                                         device.hw_args, freq_correction, record,
+                                         frequency_configuration,
+                                         channel_log_params, play, audio_bps,
+                                         channel_spacing, device.frequency_params,
+                                         min_recording, max_recording,
+                                         classifier_params, auto_priority, agc,
+                                         detection_params, shared_frontend,
+                                         channel_logger=channel_logger,
+                                         classifier=classifier,
+                                         demod_workers=demod_workers,
+                                         iq_ring=device_ring,
+                                         baseband_ring=baseband_ring,
+                                         stream_server=self.stream_server,
+                                         mix_stream=mix_stream,
+                                         record_format=record_format,
+                                         record_store=record_store,
+                                         tmp_area=tmp_area))
+
+        for scanner in self.scanners:
+            scanner.peers = [peer for peer in self.scanners if peer is not scanner]
+
+    @property
+    def scanner(self) -> Scanner:
+        """The scanner selected in the user interface"""
+        return self.scanners[self.selected]
+
+    def select_next(self) -> Scanner:
+        """Select the scanner of the next device (wraps around)"""
+        self.selected = (self.selected + 1) % len(self.scanners)
+        return self.scanner
+
+    async def wait_ready(self) -> None:
+        """Wait until the receivers of all the devices are ready"""
+        await asyncio.gather(*(scanner.wait_ready() for scanner in self.scanners))
+
+    async def load_frequencies(self) -> None:
+        for scanner in self.scanners:
+            await scanner.load_frequencies()
+
+    async def start_streaming(self) -> None:
+        """Start serving the audio streams (if wanted)"""
+        if self.stream_server is not None:
+            await self.stream_server.start()
+
+    async def wait_for_spectrum(self) -> None:
+        """Wait until the scan cycle of any device is due"""
+        if len(self.scanners) == 1:
+            await self.scanner.wait_for_spectrum()
+            return
+
+        waits = [asyncio.create_task(scanner.wait_for_spectrum())
+                 for scanner in self.scanners]
+        (_, pending) = await asyncio.wait(waits, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    async def scan_cycle(self) -> None:
+        """Execute a scan cycle for each device with a new spectrum
+
+        If no device has a new spectrum (wait timed out) all of them run
+        so hang times and long recordings are still handled
+        """
+        due = [scanner for scanner in self.scanners
+               if scanner.receiver.spectrum_probe.seq != scanner.spectrum_seq]
+        for scanner in due or self.scanners:
+            await scanner.scan_cycle()
+
+    def status(self) -> list[str]:
+        """One line per device for the user interface"""
+        lines = []
+        for (idx, scanner) in enumerate(self.scanners):
+            marker = '*' if idx == self.selected else ' '
+            demod_freqs = scanner.receiver.get_demod_freqs()
+            busy = sum(1 for freq in demod_freqs if freq != 0)
+            lines.append(f'{marker}{idx+1} {scanner.center_freq/1E6:0.3f} '
+                         f'{busy}/{len(demod_freqs)} {scanner.hw_args}')
+        return lines
+
+    async def clean_up(self) -> None:
+        for scanner in self.scanners:
+            await scanner.clean_up()
+        if self.stream_server is not None:
+            await self.stream_server.close()
 
 
 async def main() -> None:
@@ -463,12 +784,22 @@ async def main() -> None:
     min_recording = 0
     max_recording = 0
     classifier_params = parser.classifier_params
+    detection_params = parser.detection_params
     scanner = Scanner(ask_samp_rate, num_demod, type_demod, hw_args,
                         freq_correction, record, frequency_configuration,
                         channel_log_params, play,
                         audio_bps, channel_spacing, frequency_params,
                         min_recording, max_recording,
-                        classifier_params)
+                        classifier_params, detection_params=detection_params,
+                        shared_frontend=parser.shared_frontend,
+                        demod_workers=parser.demod_workers,
+                        iq_ring=parser.iq_ring,
+                        baseband_ring=parser.baseband_ring,
+                        record_format=parser.record_format,
+                        record_store=parser.record_store,
+                        tmp_area=parser.tmp_area)
+
+    await scanner.wait_ready()
 
     # Set frequency, gain, squelch, and volume
     print("\n")
@@ -485,8 +816,8 @@ async def main() -> None:
     old_freqs: list[float] = []
 
     while 1:
-        # No need to go faster than 10 Hz rate of GNU Radio probe
-        await asyncio.sleep(0.1)
+        # Wait for the next spectrum from the GNU Radio probe
+        await scanner.wait_for_spectrum()
 
         # Execute a scan cycle
         await scanner.scan_cycle()
@@ -0,0 +1,95 @@
+'''
+Places the range steps on the frequencies of interest.
+
+The regular steps tile a range edge to edge whether or not anything of
+interest is there.  With --plan_steps the steps are computed from the
+frequencies of interest in the frequency file (unlocked singles and ranges
+with a priority or a label) that fall in the scanned ranges instead.
+
+Each step covers the usable part of the sample rate around its center
+(the hardware filter passes about 80 %) except a guard around DC, where
+the scanner does not detect channels.  The planner is a greedy cover over
+the sorted frequencies: from the lowest uncovered frequency it picks the
+center that covers the longest run of frequencies, moving the DC guard
+into a gap between frequencies when that reaches further.
+'''
+from bisect import bisect_left, bisect_right
+
+USABLE_BANDWIDTH = 0.8  # part of the sample rate passed by the hardware filter
+
+
+def _covered_run(points: list[int], first: int, center: float, half: float,
+                 dc_guard: float) -> int:
+    '''
+    Index after the run of points from first covered by a step at center
+    '''
+    idx = first
+    while idx < len(points):
+        offset = abs(points[idx] - center)
+        if offset > half or offset < dc_guard:
+            break
+        idx += 1
+    return idx
+
+
+def plan_centers(points: list[int], samp_rate: float, dc_guard: float,
+                 usable: float=USABLE_BANDWIDTH) -> list[int]:
+    '''
+    Step centers covering all the points
+
+    Args:
+        points (list[int]): Frequencies of interest in Hz
+        samp_rate (float): Hardware sample rate in sps
+        dc_guard (float): Frequencies closer than this to a center (Hz) are
+            not covered by that step
+        usable (float): Part of the sample rate covered by a step
+
+    Returns:
+        list[int]: Centers in Hz (ascending)
+    '''
+    points = sorted(set(points))
+    half = samp_rate * usable / 2
+    if dc_guard >= half:
+        raise ValueError(f'DC guard {dc_guard} Hz leaves nothing of the usable band')
+
+    centers: list[int] = []
+    first = 0
+    while first < len(points):
+        low = points[first]
+        # The lowest uncovered point is below the center: low + dc_guard
+        # <= center <= low + half.  Besides the highest center, try each
+        # center that puts a point just above the DC guard.
+        candidates = [low + half]
+        start = bisect_left(points, low + 2*dc_guard)
+        stop = bisect_right(points, low + half + dc_guard)
+        candidates += [points[idx] - dc_guard for idx in range(start, stop)]
+
+        best_center = candidates[0]
+        best_end = first
+        for center in candidates:
+            end = _covered_run(points, first, center, half, dc_guard)
+            if end > best_end:
+                (best_center, best_end) = (center, end)
+
+        centers.append(int(round(best_center)))
+        first = best_end
+
+    return centers
+
+
+def main() -> None:
+    """Plan the steps for some UHF business channels"""
+    points = [451_012_500, 451_025_000, 451_800_000, 452_300_000,
+              456_000_000, 456_012_500, 461_950_000, 462_562_500,
+              462_587_500, 467_562_500]
+    for samp_rate in (2.4E6, 10E6):
+        centers = plan_centers(points, samp_rate, dc_guard=5000)
+        print(f'{samp_rate/1E6:.1f} Msps: {len(centers)} steps at '
+              f'{[center/1E6 for center in centers]}')
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,131 @@
+'''
+Sizes the sub-bands of the shared front end (--shared_frontend).
+
+The front end splits the hardware band into num_subbands sub-bands with one
+polyphase channelizer.  The sub-bands are spaced samp_rate/num_subbands
+apart and oversampled by 2, so each spans twice the spacing and a channel
+is always fully inside the sub-band nearest to it.  A tuner then only
+translates and filters the remaining offset (at most half the spacing) at
+the sub-band rate.
+
+The spacing comes from the channel bandwidth of the demodulator: the
+narrower the channel, the more sub-bands and the lower the sub-band rate.
+The sub-band filter passes the nearest channels (offset plus the channel
+band edge) and stops what would alias onto them at the sub-band rate, with
+a transition of at least half the spacing to keep the channelizer cheap.
+
+Kept free of GNU Radio so it can be tested on its own.
+'''
+from dataclasses import dataclass
+
+from decimation_planner import DemodProfile, NBFM_PROFILE, WBFM_PROFILE
+
+OVERSAMPLE = 2        # sub-band rate / spacing
+MIN_TRANSITION = 0.5  # sub-band filter transition as part of the spacing
+MAX_SUBBANDS = 64     # more only adds channelizer and selector outputs
+
+
+@dataclass(frozen=True)
+class SubbandPlan:
+    '''
+    Sub-bands of the shared front end
+
+    Sub-band k is centered at k*spacing, wrapping to negative frequencies
+    for the upper half (FFT order)
+
+    samp_rate (float): Input baseband sample rate in sps
+    num_subbands (int): Number of sub-bands (even, as the channelizer
+        needs for an oversample rate of 2)
+    channel_edge (float): Band edge of a channel in Hz (from its center)
+    '''
+    samp_rate: float
+    num_subbands: int
+    channel_edge: float
+
+    @property
+    def spacing(self) -> float:
+        '''Distance between sub-band centers in Hz'''
+        return self.samp_rate / self.num_subbands
+
+    @property
+    def output_rate(self) -> float:
+        '''Sample rate of each sub-band in sps'''
+        return OVERSAMPLE * self.spacing
+
+    @property
+    def decimation(self) -> float:
+        '''Rate reduction of a tuner input'''
+        return self.samp_rate / self.output_rate
+
+    @property
+    def pass_edge(self) -> float:
+        '''Highest frequency of a channel in its sub-band in Hz'''
+        return self.spacing / 2 + self.channel_edge
+
+    @property
+    def cutoff(self) -> float:
+        '''Cutoff of the sub-band filter in Hz (middle of the transition)'''
+        return self.output_rate / 2
+
+    @property
+    def transition(self) -> float:
+        '''
+        Transition width of the sub-band filter in Hz.  It stops at the
+        first frequency that aliases onto the channel (output_rate - pass_edge).
+        '''
+        return self.output_rate - 2 * self.pass_edge
+
+    def locate(self, center_freq: float) -> tuple[int, float]:
+        """Find the sub-band for a baseband frequency
+
+        Args:
+            center_freq (float): Baseband center frequency in Hz
+
+        Returns:
+            tuple[int, float]: Sub-band index and offset from its center in Hz
+        """
+        nearest = int(round(center_freq / self.spacing))
+        return nearest % self.num_subbands, center_freq - nearest * self.spacing
+
+
+def plan_subbands(samp_rate: float, profile: DemodProfile,
+                  max_subbands: int = MAX_SUBBANDS) -> SubbandPlan:
+    '''
+    Most sub-bands (lowest sub-band rate) that still fit a channel
+
+    A sub-band needs a transition of at least MIN_TRANSITION of the spacing
+    above the channel, and a rate of at least the channel rate of the
+    demodulator.
+
+    Args:
+        samp_rate (float): Input baseband sample rate in sps
+        profile (DemodProfile): Filter requirements of the demodulator
+        max_subbands (int): Upper limit of the number of sub-bands
+
+    Returns:
+        SubbandPlan: The sub-bands (2 if the band is too narrow to split)
+    '''
+    channel_edge = profile.channel_cutoff + profile.channel_transition / 2
+    # transition = spacing*(OVERSAMPLE - 1) - 2*channel_edge
+    min_spacing = max(2 * channel_edge / (OVERSAMPLE - 1 - MIN_TRANSITION),
+                      profile.min_channel_rate / OVERSAMPLE)
+    num_subbands = min(int(samp_rate // min_spacing), max_subbands)
+    num_subbands = max(2, num_subbands - num_subbands % 2)
+    return SubbandPlan(samp_rate, num_subbands, channel_edge)
+
+
+def main() -> None:
+    """Print the sub-bands for common sample rates"""
+    for (name, profile) in (('NBFM/AM', NBFM_PROFILE), ('WBFM', WBFM_PROFILE)):
+        for samp_rate in (1E6, 2E6, 2.4E6, 3.2E6, 8E6, 10E6):
+            plan = plan_subbands(samp_rate, profile)
+            print(f'{name} {samp_rate/1E6:.1f} Msps: {plan.num_subbands} sub-bands, '
+                  f'{plan.output_rate/1E3:.1f} ksps (/{plan.decimation:.1f}), '
+                  f'filter {plan.cutoff/1E3:.1f} kHz +/- {plan.transition/2E3:.1f} kHz')
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,56 @@
+import asyncio
+import numpy as np
+from audio_streaming import AudioStreamServer, AudioClient, encode
+
+
+def test_encode_clips_to_int16():
+    data = encode(np.array([0.0, 0.5, 1.0, -2.0], dtype=np.float32))
+    assert np.frombuffer(data, '<i2').tolist() == [0, 16383, 32767, -32767]
+
+
+async def connect(server, request):
+    (reader, writer) = await asyncio.open_connection('127.0.0.1', server.port)
+    writer.write(f'{request}\n'.encode())
+    await writer.drain()
+    return (reader, writer)
+
+
+async def test_client_receives_its_stream():
+    server = AudioStreamServer(0, 8000)
+    server.register('1')
+    server.register('mix')
+    await server.start()
+    try:
+        (reader, writer) = await connect(server, '1')
+        assert await reader.readline() == b'OK 8000 s16le\n'
+        while not server.wanted('1'):
+            await asyncio.sleep(0.01)
+
+        server.publish('mix', np.full(4, 0.5, dtype=np.float32))
+        server.publish('1', np.zeros(2, dtype=np.float32))
+        assert await asyncio.wait_for(reader.readexactly(4), 1) == bytes(4)
+        writer.close()
+    finally:
+        await server.close()
+
+
+async def test_unknown_stream_and_list():
+    server = AudioStreamServer(0, 8000)
+    server.register('2')
+    server.register('mix')
+    await server.start()
+    try:
+        (reader, _) = await connect(server, '7')
+        assert (await reader.read()).startswith(b'ERR')
+        (reader, _) = await connect(server, 'list')
+        assert await reader.read() == b'2\nmix\n'
+    finally:
+        await server.close()
+
+
+def test_slow_client_drops_oldest_buffers():
+    client = AudioClient(writer=None, max_buffers=2)
+    for data in (b'a', b'b', b'c'):
+        client.put(data)
+    assert client.dropped == 1
+    assert [client.queue.get_nowait(), client.queue.get_nowait()] == [b'b', b'c']
@@ -0,0 +1,236 @@
+import pytest
+from center_frequency_provider import (ActivityWeightedSchedule, FrequencyGroup,
+                                       FrequencyProvider, FrequencyRangeParams,
+                                       REVISIT_SLACK,
+                                       RoundRobinSchedule, StepSchedule)
+from step_planner import plan_centers
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def group(**kwargs) -> FrequencyGroup:
+    return FrequencyGroup(sample_rate=2000000, quiet_timeout=10, **kwargs)
+
+
+def visits(schedule: StepSchedule, clock: Clock, count: int) -> list[int]:
+    step = 0
+    schedule.visit(step)
+    steps = []
+    for _ in range(count):
+        clock.now += schedule.dwell(step)
+        step = schedule.next_step(step)
+        schedule.visit(step)
+        steps.append(step)
+    return steps
+
+
+def test_round_robin_is_the_default():
+    schedule = StepSchedule.get_schedule([0, 1, 2], group())
+    assert isinstance(schedule, RoundRobinSchedule)
+    assert [schedule.next_step(step) for step in range(3)] == [1, 2, 0]
+    assert schedule.dwell(1) == 10
+
+
+def test_unknown_schedule_is_rejected():
+    with pytest.raises(ValueError):
+        group(schedule='random')
+
+
+def test_quiet_steps_are_visited_in_order():
+    clock = Clock()
+    schedule = ActivityWeightedSchedule(list(range(4)), group(schedule='activity'), clock)
+    assert visits(schedule, clock, 6) == [1, 2, 3, 0, 1, 2]
+
+
+def test_busy_step_is_visited_more_often_and_longer():
+    clock = Clock()
+    schedule = ActivityWeightedSchedule(list(range(6)), group(schedule='activity', max_revisit=600), clock)
+    for _ in range(5):
+        schedule.record_activity(3)
+
+    steps = visits(schedule, clock, 30)
+    assert steps.count(3) > 2 * steps.count(1)
+    assert schedule.dwell(3) > schedule.dwell(1)
+    assert all(step in steps for step in range(6))
+
+
+def test_max_revisit_bounds_the_gap():
+    clock = Clock()
+    schedule = ActivityWeightedSchedule(list(range(5)), group(schedule='activity', max_revisit=60), clock)
+    for _ in range(20):
+        schedule.record_activity(0)
+        schedule.record_activity(1)
+
+    step = 0
+    last = {idx: clock.now for idx in range(5)}
+    for _ in range(50):
+        clock.now += schedule.limit(step, schedule.dwell(step))
+        step = schedule.next_step(step)
+        schedule.visit(step)
+        assert clock.now - last[step] <= 60
+        last[step] = clock.now
+
+
+def test_active_extension_is_limited_by_max_revisit():
+    clock = Clock()
+    schedule = ActivityWeightedSchedule(list(range(3)), group(schedule='activity', max_revisit=60), clock)
+    schedule.visit(0)
+    clock.now += 40
+    # steps 1 and 2 are due in 20 s, the later one needs a shortest dwell (5 s) and a retune first
+    assert schedule.limit(0, 1000) == pytest.approx(20 - 5 - REVISIT_SLACK)
+    clock.now += 20
+    assert schedule.limit(0, 1000) == 5
+    assert schedule.next_step(0) == 1
+    assert RoundRobinSchedule(list(range(3)), group(), clock).limit(0, 1000) == 1000
+
+
+async def test_provider_steps_with_schedule():
+    clock = Clock()
+    provider = FrequencyProvider(group(schedule='activity',
+                                       ranges=[FrequencyRangeParams(lower_freq=440000000,
+                                                                    upper_freq=450000000)]),
+                                 clock)
+    assert isinstance(provider.schedule, ActivityWeightedSchedule)
+    await provider.interesting_activity()
+    provider.transmission_started()
+    assert provider.schedule.scores[0] == pytest.approx(1.25)
+    provider.step_task.cancel()
+
+
+async def test_planned_steps_replace_ranges_with_interest():
+    provider = FrequencyProvider(group(ranges=[FrequencyRangeParams(lower_freq=440000000,
+                                                                    upper_freq=450000000),
+                                               FrequencyRangeParams(lower_freq=460000000,
+                                                                    upper_freq=462000000)]))
+    assert len(provider.steps) == 7
+    provider.plan_steps([441000000, 441500000, 470000000])
+    assert len(provider.steps) == 2  # one planned, one regular
+    assert provider.steps[1] == 461000000
+    assert provider.center_freq == provider.steps[0]
+    provider.step_task.cancel()
+
+
+async def test_steps_are_planned_again_only_when_interest_changes():
+    clock = Clock()
+    retunes = []
+    provider = FrequencyProvider(group(schedule='activity',
+                                       notify_scanner=lambda: retunes.append(provider.center_freq),
+                                       ranges=[FrequencyRangeParams(lower_freq=440000000,
+                                                                    upper_freq=450000000),
+                                               FrequencyRangeParams(lower_freq=460000000,
+                                                                    upper_freq=462000000)]),
+                                 clock)
+    assert provider.plan_steps([441000000, 441500000])
+    assert retunes == [provider.steps[0]]
+    schedule = provider.schedule
+    assert not provider.plan_steps([441500000, 441000000, 441000000])
+    assert provider.schedule is schedule
+
+    # the current step stays on and keeps its activity
+    provider.schedule.record_activity(0)
+    center = provider.center_freq
+    assert provider.plan_steps([441000000, 441500000, 461500000])
+    assert len(provider.steps) == 2 and provider.steps[0] == center
+    assert provider.step == 0 and provider.center_freq == center
+    assert provider.schedule.scores[0] == pytest.approx(1.0)
+    assert len(retunes) == 1
+    provider.step_task.cancel()
+
+
+async def test_planned_steps_restart_when_the_current_one_is_gone():
+    provider = FrequencyProvider(group(ranges=[FrequencyRangeParams(lower_freq=440000000,
+                                                                    upper_freq=450000000)]))
+    provider.plan_steps([441000000])
+    assert provider.plan_steps([448000000])
+    assert provider.steps == plan_centers([448000000], 2000000, 5000)
+    assert provider.center_freq == provider.steps[0]
+    # back to stepping with the current step second
+    assert provider.plan_steps([441000000, 448000000])
+    assert provider.step == 1
+    assert not provider.step_task.done()
+    provider.step_task.cancel()
+
+
+def test_survey_keeps_occupancy_of_remaining_steps():
+    clock = Clock()
+    params = group(schedule='survey', survey_dwell=1, resurvey=300)
+    steps = [451000000, 453000000, 455000000]
+    schedule = StepSchedule.get_schedule(steps, params, clock)
+    for center in steps:
+        for _ in range(10):
+            schedule.observe(center, [455012500] if center == 455000000 else [])
+    schedule.next_step(0)
+    schedule.next_step(1)
+    assert schedule.next_step(2) == 2 and not schedule.surveying
+
+    planned = StepSchedule.get_schedule([452000000, 455000000], params, clock)
+    planned.carry_over(schedule)
+    assert not planned.surveying
+    assert planned.active_steps == [1]
+    assert planned.step_duty(1) == pytest.approx(1.0)
+
+
+def test_survey_dwells_only_on_active_steps():
+    clock = Clock()
+    steps = [451000000, 453000000, 455000000, 457000000]
+    schedule = StepSchedule.get_schedule(steps, group(schedule='survey', survey_dwell=1,
+                                                      resurvey=300), clock)
+    assert schedule.surveying and schedule.dwell(0) == 1
+
+    for (step, center) in enumerate(steps):
+        for _ in range(10):
+            heard = [455012500] if center == 455000000 else []
+            schedule.observe(center, heard)
+        if step < len(steps) - 1:
+            assert schedule.next_step(step) == step + 1
+
+    # survey done, only the step with the busy channel remains
+    assert schedule.next_step(3) == 2
+    assert not schedule.surveying
+    assert schedule.next_step(2) == 2
+    assert schedule.dwell(2) == 10
+
+    clock.now += 300
+    assert schedule.next_step(2) == 0
+    assert schedule.surveying
+
+
+def test_survey_busy_channel_in_the_overlap_marks_only_the_step_seeing_it():
+    steps = [451000000, 452400000]
+    schedule = StepSchedule.get_schedule(steps, group(schedule='survey', survey_dwell=1))
+    for center in steps:
+        for _ in range(10):
+            # 451.5 MHz is within sample_rate/2 of both steps, in view of the first only
+            schedule.observe(center, [451500000])
+    assert schedule.step_duty(0) == 1
+    assert schedule.step_duty(1) == 0
+    schedule.next_step(0)
+    assert schedule.next_step(1) == 0
+    assert schedule.active_steps == [0]
+
+
+async def test_activity_does_not_hold_a_survey_step():
+    provider = FrequencyProvider(group(schedule='survey', survey_dwell=1,
+                                       ranges=[FrequencyRangeParams(lower_freq=440000000,
+                                                                    upper_freq=450000000)]))
+    assert provider.surveying
+    step_task = provider.step_task
+    await provider.interesting_activity()
+    assert provider.step_task is step_task
+    assert provider.schedule.limit(0, provider.params.active_timeout) == 1
+    provider.step_task.cancel()
+
+
+def test_survey_without_activity_starts_over():
+    steps = [451000000, 453000000]
+    schedule = StepSchedule.get_schedule(steps, group(schedule='survey'))
+    schedule.observe(451000000, [])
+    assert schedule.next_step(0) == 1
+    assert schedule.next_step(1) == 0
+    assert schedule.surveying
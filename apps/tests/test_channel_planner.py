@@ -0,0 +1,122 @@
+import numpy as np
+import pytest
+from channel_planner import build_channels, plan_assignments
+from frequency_manager import ChannelFrequency, FrequencyConfiguration, FrequencyManager
+
+CENTER = 460e6
+
+
+def channel(bb: int, priority: int | None = None, locked: bool = False,
+            hanging: bool = False, active: bool = False) -> ChannelFrequency:
+    return ChannelFrequency(bb=bb, rf=(CENTER + bb)/1e6, priority=priority,
+                            locked=locked, hanging=hanging, active=active)
+
+
+@pytest.fixture
+async def frequency_manager() -> FrequencyManager:
+
+    config = FrequencyConfiguration(disable_lockout=False, disable_priority=False)
+    frequency_manager = FrequencyManager(config, 5000)
+    await frequency_manager.add({'single': 460.01, 'label': 'Priority', 'priority': 1})
+    await frequency_manager.add({'single': 460.02, 'label': 'Locked', 'locked': True})
+    await frequency_manager.add({'lo': 460.1, 'hi': 460.2, 'label': 'Range', 'priority': 2})
+    frequency_manager.set_center(int(CENTER))
+
+    return frequency_manager
+
+
+async def test_build_channels_metadata(frequency_manager):
+
+    active_channels = np.array([-10000, 10000, 20000, 150000])
+    demod_freqs = [-10000, 30000, 0]
+
+    channels = build_channels(active_channels, demod_freqs, int(CENTER), frequency_manager)
+    by_bb = {channel.bb: channel for channel in channels}
+
+    assert len(channels) == 5
+    assert by_bb[-10000].active and not by_bb[-10000].hanging
+    assert by_bb[30000].hanging and not by_bb[30000].active
+    assert not by_bb[10000].active and not by_bb[10000].hanging
+    assert by_bb[20000].locked
+    assert by_bb[10000].label == 'Priority'
+    assert by_bb[150000].label == 'Range'
+    assert by_bb[30000].rf == 460.03
+
+
+async def test_build_channels_priority_first_then_detection_order(frequency_manager):
+
+    active_channels = np.array([-10000, 150000, 20000, 10000])
+
+    channels = build_channels(active_channels, [30000, 0], int(CENTER), frequency_manager)
+
+    assert [channel.bb for channel in channels] == [10000, 150000, -10000, 20000, 30000]
+
+
+def test_assign_to_free_demodulators_in_index_order():
+
+    channels = [channel(10000), channel(20000)]
+
+    assert plan_assignments(channels, [0, 0, 0], True) == [(0, 10000), (1, 20000)]
+
+
+def test_skip_locked_hanging_and_already_demodulated():
+
+    channels = [channel(10000, locked=True),
+                channel(20000, hanging=True),
+                channel(30000, active=True),
+                channel(40000)]
+
+    assert plan_assignments(channels, [30000, 0, 0], True) == [(1, 40000)]
+
+
+def test_priority_channels_assigned_first():
+
+    channels = [channel(10000), channel(20000, priority=2), channel(30000, priority=1)]
+
+    assert plan_assignments(channels, [0, 0], True) == [(0, 30000), (1, 20000)]
+
+
+def test_preempt_lowest_priority_busy_demodulator():
+
+    channels = [channel(10000, priority=3, active=True),
+                channel(20000, active=True),
+                channel(30000, priority=2, active=True),
+                channel(40000, priority=1)]
+
+    assert plan_assignments(channels, [10000, 20000, 30000], True) == [(1, 40000)]
+
+
+def test_preempt_ties_go_to_lowest_index():
+
+    channels = [channel(10000, active=True),
+                channel(20000, active=True),
+                channel(30000, priority=1),
+                channel(40000, priority=1)]
+
+    assert plan_assignments(channels, [10000, 20000], True) == [(0, 30000), (1, 40000)]
+
+
+def test_no_preemption_for_equal_or_no_priority():
+
+    channels = [channel(10000, priority=2, active=True),
+                channel(20000, priority=2),
+                channel(30000)]
+
+    assert plan_assignments(channels, [10000], True) == []
+
+
+def test_newly_assigned_channel_is_not_preempted_by_lower_priority():
+
+    channels = [channel(10000, active=True),
+                channel(20000, priority=1),
+                channel(30000, priority=2)]
+
+    assert plan_assignments(channels, [10000], True) == [(0, 20000)]
+
+
+def test_no_preemption_when_priority_disabled():
+
+    channels = [channel(10000, active=True), channel(20000, priority=1)]
+
+    assert plan_assignments(channels, [10000], False) == []
+    assert plan_assignments(channels, [10000, 0], False) == [(1, 20000)]
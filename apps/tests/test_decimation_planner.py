@@ -0,0 +1,63 @@
+import pytest
+from decimation_planner import (plan_decimation, legacy_plan, estimate_taps,
+                                NBFM_PROFILE, WBFM_PROFILE, XLATING, COMPLEX, FLOAT)
+
+
+def test_estimate_taps_matches_firdes_hamming():
+
+    # firdes.low_pass(1, 1, 0.090, 0.010, WIN_HAMMING) has 241 taps
+    assert estimate_taps(1, 0.010) == 241
+
+
+@pytest.mark.parametrize('in_rate', [1E6, 1.024E6, 4E6 / 3, 2.4E6, 4E6, 10E6])
+@pytest.mark.parametrize('profile', [NBFM_PROFILE, WBFM_PROFILE])
+def test_plan_reaches_audio_rate(in_rate, profile):
+
+    plan = plan_decimation(in_rate, 8000, profile)
+
+    assert plan.channel_stages[0].kind == XLATING
+    assert all(stage.kind == COMPLEX for stage in plan.channel_stages[1:])
+    assert all(stage.kind == FLOAT for stage in plan.audio_stages)
+    assert plan.channel_rate >= profile.min_channel_rate
+    assert plan.audio_stages[-1].out_rate >= 8000
+    assert plan.audio_stages[-1].out_rate * plan.resample_rate == pytest.approx(8000)
+
+
+def test_last_stages_hold_the_sharp_filters():
+
+    plan = plan_decimation(2.4E6, 8000, NBFM_PROFILE)
+
+    assert plan.channel_stages[-1].cutoff == NBFM_PROFILE.channel_cutoff
+    assert plan.audio_stages[-1].cutoff == NBFM_PROFILE.audio_cutoff
+    for stage in plan.channel_stages[:-1]:
+        # Early stages keep the channel clear of aliases
+        assert stage.out_rate - stage.cutoff - stage.transition/2 >= 13E3
+
+
+def test_no_resampler_when_rates_divide():
+
+    plan = plan_decimation(4E6, 8000, NBFM_PROFILE)
+
+    assert not plan.needs_resampler
+    assert plan.resampler_cost == 0
+
+
+def test_plan_is_cheaper_than_fixed_cascade():
+
+    for in_rate in (1E6, 2.4E6, 4E6):
+        plan = plan_decimation(in_rate, 8000, NBFM_PROFILE)
+        assert plan.cost < legacy_plan(in_rate, 8000, NBFM_PROFILE, 5).cost
+
+
+def test_rate_below_channel_rate_rejected():
+
+    with pytest.raises(ValueError):
+        plan_decimation(30E3, 8000, NBFM_PROFILE)
+
+
+def test_report_lists_stages():
+
+    plan = plan_decimation(2E6, 8000, NBFM_PROFILE)
+    report = plan.report()
+
+    assert report.count('MMAC/s') == len(plan.stages) + 1
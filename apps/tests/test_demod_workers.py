@@ -0,0 +1,146 @@
+import asyncio
+
+import pytest
+from demod_workers import (DemodWorker, WorkerParams, split_demodulators,
+                           handle_command, _serve)
+from frequency_manager import ChannelMessage
+
+
+def params(**kwargs) -> WorkerParams:
+    return WorkerParams(**{'iq_address': 'ipc://iq', 'audio_address': 'ipc://audio',
+                           'samp_rate': 2E6, 'audio_rate': 8000, 'num_demod': 2,
+                           'type_demod': 0, 'first_channel': 1, 'record': False,
+                           'play': False, 'audio_bps': 8, 'min_recording': 0,
+                           'classifier_params': None,  # not used by the stub flow
+                           **kwargs})
+
+
+class StubDemodulator:
+    def __init__(self, channel, notify_scanner=None):
+        self.channel = channel
+        self.notify_scanner = notify_scanner
+        self.calls = []
+
+    async def set_center_freq(self, center_freq, rf_center_freq):
+        self.calls.append(('tune', center_freq, rf_center_freq))
+        if self.notify_scanner is not None:
+            await self.notify_scanner(ChannelMessage(state='on', rf=146.52, bb=center_freq,
+                                                     channel=self.channel))
+
+    def set_squelch(self, squelch_db):
+        self.calls.append(('squelch', squelch_db))
+
+    def set_volume(self, volume_db):
+        self.calls.append(('volume', volume_db))
+
+
+class StubFlow:
+    '''Stands in for WorkerFlow (no GNU Radio)'''
+    def __init__(self, params, notify_scanner):
+        self.pool = self
+        self.demodulators = [StubDemodulator(params.first_channel + idx, notify_scanner)
+                             for idx in range(params.num_demod)]
+
+    def start(self): pass
+    def stop(self): pass
+    def wait(self): pass
+    def close_rings(self): pass
+    def finish_recordings(self): pass
+
+
+def stub_worker(params, conn):
+    asyncio.run(_serve(params, conn, StubFlow))
+
+
+def failing_worker(params, conn):
+    conn.send(('error', 'no device'))
+
+
+def silent_worker(params, conn):
+    conn.recv()
+
+
+@pytest.mark.parametrize('num_demod, num_workers, expected', [
+    (4, 2, [2, 2]), (10, 4, [3, 3, 2, 2]), (3, 8, [1, 1, 1]), (5, 0, [5])])
+def test_split_demodulators(num_demod, num_workers, expected):
+
+    assert split_demodulators(num_demod, num_workers) == expected
+
+
+def test_worker_needs_a_demodulator():
+
+    with pytest.raises(ValueError):
+        params(num_demod=0)
+
+
+async def test_commands_reach_the_demodulators():
+
+    demodulators = [StubDemodulator(1), StubDemodulator(2)]
+
+    assert await handle_command(demodulators, ('tune', 1, 5000, 146_000_000))
+    assert await handle_command(demodulators, ('squelch', 0, -60))
+    assert await handle_command(demodulators, ('volume', 1, 3))
+    assert not await handle_command(demodulators, ('stop',))
+
+    assert demodulators[0].calls == [('squelch', -60)]
+    assert demodulators[1].calls == [('tune', 5000, 146_000_000), ('volume', 3)]
+
+    with pytest.raises(ValueError):
+        await handle_command(demodulators, ('reboot',))
+
+
+async def test_worker_round_trip():
+
+    messages = []
+
+    async def notify_scanner(msg):
+        messages.append(msg)
+
+    worker = DemodWorker(params(first_channel=3), notify_scanner, target=stub_worker)
+    await worker.ready()
+
+    await worker.demodulators[1].set_center_freq(5000, 146_000_000)
+    assert worker.demodulators[1].center_freq == 5000
+    await worker.stop()
+
+    # messages sent before stopping reach the scanner
+    assert [(msg.channel, msg.bb) for msg in messages] == [(4, 5000)]
+    assert not worker.process.is_alive()
+
+
+async def test_worker_failure_is_raised():
+
+    worker = DemodWorker(params(), None, target=failing_worker)
+
+    with pytest.raises(Exception, match='no device'):
+        await worker.ready()
+    await worker.stop()
+
+
+async def test_worker_start_timeout():
+
+    worker = DemodWorker(params(), None, target=silent_worker)
+
+    with pytest.raises(Exception, match='did not start'):
+        await worker.ready(timeout=0.5)
+    await worker.stop()
+
+
+async def test_waiting_does_not_block_the_loop():
+
+    ticks = 0
+
+    async def tick():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0.01)
+
+    ticker = asyncio.create_task(tick())
+    worker = DemodWorker(params(), None, target=silent_worker)
+    with pytest.raises(Exception):
+        await worker.ready(timeout=0.3)
+    ticker.cancel()
+    await worker.stop()
+
+    assert ticks >= 10
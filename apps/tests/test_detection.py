@@ -0,0 +1,205 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+from detection import (DetectionParams, RetuneTracker, SpectrumPacer, cycle_interval,
+                       IDLE_CYCLE_INTERVAL, MAX_CYCLE_WAIT)
+
+
+def test_default_fft_length_matches_sample_rate():
+
+    params = DetectionParams()
+
+    assert params.get_fft_length(1E6) == 256
+    assert params.get_fft_length(4E6) == 1024
+    assert params.get_fft_length(3E6) == 1024
+
+
+def test_fixed_fft_length():
+
+    params = DetectionParams(fft_length=4096)
+
+    assert params.get_fft_length(4E6) == 4096
+
+
+def test_fft_length_from_resolution():
+
+    # 6.25 kHz or finer bins at 8 Msps
+    params = DetectionParams(resolution=6250)
+
+    fft_length = params.get_fft_length(8E6)
+
+    assert fft_length == 2048
+    assert 8E6/fft_length <= 6250
+
+
+def test_default_rates():
+
+    params = DetectionParams()
+    fft_length = params.get_fft_length(4E6)
+
+    assert params.get_decimation(4E6, fft_length) == 4
+    assert params.get_integration(4E6, fft_length) == 98
+
+
+def test_decimation_never_below_one():
+
+    params = DetectionParams(fft_length=8192, fft_rate=1000, probe_rate=10)
+
+    assert params.get_decimation(2E6, 8192) == 1
+    assert params.get_integration(2E6, 8192) == 24
+
+
+@pytest.mark.parametrize("kwargs, message", [
+    ({'fft_length': 1000}, 'power of two'),
+    ({'fft_length': -1}, 'FFT length must be >= 0'),
+    ({'resolution': -1}, 'FFT resolution must be >= 0'),
+    ({'fft_rate': 0}, 'rates must be positive'),
+    ({'fft_rate': 5, 'probe_rate': 10}, 'cannot be larger than FFT rate'),
+    ({'average': 'blah'}, 'Average must be one of'),
+])
+def test_invalid_params(kwargs, message):
+
+    with pytest.raises(ValueError, match=message):
+        DetectionParams(**kwargs)
+
+
+def test_default_alpha_follows_integration():
+
+    params = DetectionParams(average='exponential')
+
+    assert params.get_alpha(99) == 0.02
+    assert DetectionParams(average='exponential', alpha=0.5).get_alpha(99) == 0.5
+
+
+def test_floor_depth():
+
+    params = DetectionParams(threshold='relative', floor_window=3)
+
+    assert params.get_floor_depth(10) == 30
+    assert params.get_floor_depth(0.1) == 1
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_spectra_are_clean_without_retune():
+    tracker = RetuneTracker(10, 0.05, Clock())
+    assert tracker.clean(1)
+
+
+def test_first_clean_spectrum_after_retune():
+    clock = Clock()
+    tracker = RetuneTracker(10, 0.05, clock)
+    tracker.retune()
+
+    # vectors during the settle time do not end the stale period
+    assert tracker.vectors(23) is None
+    assert not tracker.clean(3)
+
+    clock.now = 0.06
+    assert tracker.vectors(37) == 37
+    # spectrum 3 holds vectors 30-39 (stale), spectrum 4 starts at 40
+    assert tracker.clean_from == 4
+    assert not tracker.clean(4)
+    assert tracker.clean(5)
+
+
+def test_retune_during_settle_restarts_it():
+    clock = Clock()
+    tracker = RetuneTracker(10, 0.05, clock)
+    tracker.retune()
+    clock.now = 0.04
+    tracker.retune()
+    clock.now = 0.06
+    assert tracker.vectors(40) is None
+    clock.now = 0.1
+    assert tracker.vectors(50) == 50
+    assert tracker.clean_from == 5
+
+
+class StubProbe:
+    def __init__(self):
+        self.seq = 0
+
+
+def channel(**kwargs):
+    return SimpleNamespace(**{'locked': False, 'priority': None, 'active': True,
+                              **kwargs})
+
+
+def test_cycle_interval_idle_without_channels():
+
+    assert cycle_interval([], [0, 0]) == IDLE_CYCLE_INTERVAL
+    assert cycle_interval([channel(locked=True)], [0]) == IDLE_CYCLE_INTERVAL
+
+
+def test_cycle_interval_fast_with_free_demodulator():
+
+    assert cycle_interval([channel()], [5000, 0]) == 0.0
+
+
+def test_cycle_interval_fast_with_pending_priority():
+
+    busy = [5000, 10000]
+    assert cycle_interval([channel()], busy) == IDLE_CYCLE_INTERVAL
+    assert cycle_interval([channel(), channel(priority=1, active=False)], busy) == 0.0
+
+
+async def test_pacer_wakes_on_new_spectrum():
+
+    probe = StubProbe()
+    pacer = SpectrumPacer(probe)
+    loop = asyncio.get_running_loop()
+
+    def spectrum() -> None:
+        probe.seq += 1
+        pacer.arrived()
+
+    loop.call_later(0.05, spectrum)
+    start = time.monotonic()
+    await pacer.wait(0, 0.0)
+
+    assert probe.seq == 1
+    assert time.monotonic() - start < MAX_CYCLE_WAIT / 2
+
+
+async def test_pacer_returns_at_once_with_unseen_spectrum():
+
+    probe = StubProbe()
+    probe.seq = 3
+    pacer = SpectrumPacer(probe)
+
+    start = time.monotonic()
+    await pacer.wait(2, 0.0)
+
+    assert time.monotonic() - start < 0.05
+
+
+async def test_pacer_times_out_without_spectrum():
+
+    pacer = SpectrumPacer(StubProbe())
+
+    start = time.monotonic()
+    await pacer.wait(0, 0.0)
+
+    assert time.monotonic() - start == pytest.approx(MAX_CYCLE_WAIT, abs=0.1)
+
+
+async def test_pacer_keeps_the_cycle_interval():
+
+    probe = StubProbe()
+    probe.seq = 1
+    pacer = SpectrumPacer(probe)
+    pacer.cycle_started()
+
+    start = time.monotonic()
+    await pacer.wait(0, IDLE_CYCLE_INTERVAL)
+
+    assert time.monotonic() - start >= IDLE_CYCLE_INTERVAL * 0.9
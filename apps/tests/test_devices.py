@@ -0,0 +1,26 @@
+import pytest
+from center_frequency_provider import FrequencyGroup, FrequencySingleParams
+from devices import DeviceParams
+
+
+def test_device_with_frequency():
+
+    group = FrequencyGroup(singles=[FrequencySingleParams(freq=446000000)],
+                           sample_rate=2400000)
+    device = DeviceParams(hw_args='rtl=1', frequency_params=group)
+
+    assert device.hw_args == 'rtl=1'
+
+
+def test_device_without_frequency():
+
+    with pytest.raises(ValueError):
+        DeviceParams(hw_args='rtl=1', frequency_params=FrequencyGroup(sample_rate=2400000))
+
+
+def test_device_without_hw_args():
+
+    group = FrequencyGroup(singles=[FrequencySingleParams(freq=446000000)],
+                           sample_rate=2400000)
+    with pytest.raises(ValueError):
+        DeviceParams(hw_args='', frequency_params=group)
@@ -0,0 +1,111 @@
+import numpy as np
+from estimate import avg_freq, channel_estimate, NoiseFloor
+
+
+def test_avg_freq():
+
+    assert avg_freq(np.array([0, 1, 1, 0])) == 1.5
+
+
+def test_channel_estimate_fixed_threshold():
+
+    spectrum = np.array([0, 1, 1, 0, 0, 1, 1, 1])
+
+    assert channel_estimate(spectrum, 0.5) == [1.5, 6.0]
+
+
+def test_channel_estimate_nothing_above_threshold():
+
+    assert channel_estimate(np.zeros(16), 0.5) == []
+
+
+def test_channel_estimate_per_bin_threshold():
+
+    spectrum = np.array([2, 2, 2, 0, 0, 5, 5, 0])
+    # first group is below its (raised) threshold
+    threshold = np.array([3, 3, 3, 1, 1, 1, 1, 1])
+
+    assert channel_estimate(spectrum, threshold) == [5.5]
+
+
+def test_noise_floor_follows_level_change():
+
+    noise_floor = NoiseFloor(depth=4, percentile=50)
+
+    for _ in range(4):
+        floor = noise_floor.update(np.full(8, 1.0))
+    assert np.allclose(floor, 1.0)
+
+    # gain change raises the noise everywhere
+    for _ in range(4):
+        floor = noise_floor.update(np.full(8, 10.0))
+    assert np.allclose(floor, 10.0)
+
+
+def test_noise_floor_ignores_intermittent_signal():
+
+    noise_floor = NoiseFloor(depth=10, percentile=25)
+    quiet = np.full(8, 1.0)
+    busy = quiet.copy()
+    busy[3] = 100.0
+
+    for idx in range(10):
+        floor = noise_floor.update(busy if idx % 3 == 0 else quiet)
+
+    assert np.allclose(floor, 1.0)
+    assert channel_estimate(busy, floor * 10) == [3.0]
+
+
+
+def test_noise_floor_holds_under_sustained_signal():
+
+    noise_floor = NoiseFloor(depth=10, percentile=25)
+    quiet = np.full(8, 1.0)
+    busy = quiet.copy()
+    busy[3] = 100.0
+
+    for _ in range(10):
+        floor = noise_floor.update(quiet, threshold=10)
+    # carrier on for three windows
+    for _ in range(30):
+        floor = noise_floor.update(busy, threshold=10)
+
+    assert np.allclose(floor, 1.0)
+    assert channel_estimate(busy, floor * 10) == [3.0]
+
+
+def test_noise_floor_follows_level_change_while_holding():
+
+    noise_floor = NoiseFloor(depth=4, percentile=50)
+    for _ in range(4):
+        noise_floor.update(np.full(8, 1.0), threshold=10)
+
+    # all the bins rise above the threshold: gain change, not a signal
+    for _ in range(4):
+        floor = noise_floor.update(np.full(8, 100.0), threshold=10)
+
+    assert np.allclose(floor, 100.0)
+
+
+def test_noise_floor_window_counts_probe_spectra():
+
+    noise_floor = NoiseFloor(depth=4, percentile=50)
+    noise_floor.update(np.full(8, 10.0), seq=1)
+
+    # the same spectrum read again is not added
+    floor = noise_floor.update(np.full(8, 10.0), seq=1)
+    assert noise_floor.count == 1
+
+    # spectra skipped by the scanner still age the window
+    floor = noise_floor.update(np.full(8, 1.0), seq=6)
+    assert np.allclose(floor, 1.0)
+
+def test_noise_floor_reset():
+
+    noise_floor = NoiseFloor(depth=4, percentile=50)
+    noise_floor.update(np.full(8, 10.0))
+
+    noise_floor.reset()
+    floor = noise_floor.update(np.full(8, 1.0))
+
+    assert np.allclose(floor, 1.0)
@@ -0,0 +1,73 @@
+import pytest
+import yaml
+from frequency_import import import_csv, to_yaml
+from frequency_manager import FrequencyCache, FrequencyConfiguration, FrequencyManager
+
+CHIRP = '''Location,Name,Frequency,Duplex,Offset,Tone,rToneFreq,Mode,Comment
+0,CALL,146.520000,,0.000000,,88.5,FM,
+1,RPT,147.000000,+,0.600000,Tone,100.0,FM,
+2,CALL,146.520000,,0.000000,,88.5,FM,again
+'''
+
+RADIOREFERENCE = '''Frequency Output,Frequency Input,FCC Callsign,Agency/Category,Description,Alpha Tag,PL Tone,Mode,Class,Tag
+154.43000,,KA1234,Fire,Dispatch,FD DISP,CSQ,FM,BM,Fire Dispatch
+'''
+
+
+def test_chirp_export_keeps_first_duplicate():
+    result = import_csv(CHIRP)
+    assert [(frequency.single, frequency.label) for frequency in result.frequencies] == \
+        [(146.52, 'CALL'), (147.0, 'RPT')]
+    assert all(frequency.saved for frequency in result.frequencies)
+    assert len(result.duplicates) == 1 and result.duplicates[0].startswith('line 4')
+
+
+def test_duplicates_are_found_by_the_hz_key():
+    result = import_csv('single,lo,hi\n146.52,,\n146.5200001,,\n,150.0,151.0\n,150.0000002,151\n')
+    assert [frequency.key for frequency in result.frequencies] == \
+        [('single', 146520000), ('range', 150000000, 151000000)]
+    assert [duplicate[:6] for duplicate in result.duplicates] == ['line 3', 'line 5']
+
+
+def test_radioreference_export_uses_alpha_tag():
+    (frequency,) = import_csv(RADIOREFERENCE).frequencies
+    assert frequency.single == 154.43
+    assert frequency.label == 'FD DISP'
+
+
+def test_invalid_rows_are_reported_with_the_config_rules():
+    result = import_csv('label,lo,hi,single,locked,priority\n'
+                        'ok,450,460,,,2\n'
+                        'overlap,455,470,,yes,\n'
+                        'fraction,,,462.5625,,1.5\n'
+                        'order,480,470,,,\n'
+                        'lockout,,,100,maybe,\n'
+                        'both,450,451,100,,\n'
+                        'text,,,abc,,\n')
+    assert [frequency.label for frequency in result.frequencies] == ['ok', 'overlap']
+    assert result.frequencies[1].locked
+    assert result.errors == ['line 4: Priority must be an integer >= 1',
+                             'line 5: Upper frequency (hi) must be larger than lower frequency (lo)',
+                             'line 6: Locked must be a boolean',
+                             'line 7: Frequency cannot be specified as both single and range',
+                             'line 8: frequency and priority must be numbers']
+    assert len(result.overlaps) == 1 and result.overlaps[0].startswith('line 3')
+
+
+def test_yaml_conversion_loads_the_same():
+    frequencies = import_csv(CHIRP).frequencies
+    converted = yaml.safe_load(to_yaml(frequencies))
+    assert converted == {'frequencies': [{'label': 'CALL', 'single': 146.52},
+                                         {'label': 'RPT', 'single': 147.0}]}
+
+
+@pytest.mark.asyncio
+async def test_csv_frequency_file(tmp_path):
+    file = tmp_path / 'export.csv'
+    file.write_text(CHIRP)
+    config = FrequencyConfiguration(file_name=file, disable_lockout=False,
+                                    disable_priority=False)
+    frequency_manager = FrequencyManager(config, 5000, FrequencyCache(None))
+    frequencies = await frequency_manager.load()
+    assert len(frequencies) == 2
+    assert frequency_manager.get_label(147.0) == 'RPT'
@@ -1,7 +1,12 @@
+import asyncio
+import os
+import yaml
 import pytest
+import frequency_manager as fm_module
 from frequency_manager import (
-    FrequencyManager, FrequencyConfiguration,
+    FrequencyManager, FrequencyConfiguration, FrequencyCache, ChannelFrequency,
 )
+from utilities import baseband_to_frequency
 from pathlib import Path
 
 # To enable debug log, see pytest.ini and uncomment the "log_cli = true" line
@@ -111,6 +116,19 @@ async def test_check_existing_range_was_loaded(fm_with_entries):
     assert frequencies[1].saved == True
 
 
+@pytest.mark.asyncio
+async def test_interest_frequencies_skip_locked(fm_with_entries):
+    await fm_with_entries.load()
+
+    interest = fm_with_entries.interest_frequencies()
+
+    assert 454000000 in interest
+    assert 460150000 in interest
+    assert 465000000 not in interest  # in the locked range only
+    assert interest.count(125000000) == 1
+    assert len(interest) == 2 + (130000000 - 120000000) // CHANNEL_SPACING + 1
+
+
 @pytest.mark.asyncio
 async def test_add_single_frequency(fm_empty):
 
@@ -667,6 +685,24 @@ async def test_get_label(fm_empty):
         FREQ+1) is None  # No label for this frequency
 
 
+@pytest.mark.asyncio
+async def test_label_matches_computed_frequency(fm_empty):
+
+    CENTER = 146_500_000
+
+    await fm_empty.add({'single': 146.52, 'label': 'Calling'})
+    await fm_empty.add({'lo': 146.6, 'hi': 146.7, 'label': 'Repeaters'})
+
+    # RF computed from the baseband offset has float artifacts
+    channel = ChannelFrequency(rf=baseband_to_frequency(20_000, CENTER), bb=20_000,
+                               active=True, hanging=False)
+    assert channel.rf_hz == 146_520_000
+    assert fm_empty.label_at(channel.rf_hz) == 'Calling'
+    assert fm_empty.get_label(channel.rf) == 'Calling'
+    assert fm_empty.label_at(146_700_000) == 'Repeaters'
+    assert fm_empty.label_at(146_700_001) is None
+
+
 @pytest.mark.asyncio
 async def test_get_range_label(fm_empty):
 
@@ -793,3 +829,158 @@ async def test_fail_change_nonexistant_range(fm_empty):
 
     with pytest.raises(ValueError, match='not found in frequencies list'):
         await fm_empty.change(entry)
+
+
+@pytest.mark.asyncio
+async def test_load_replaces_runtime_entries(fm_with_entries):
+    await fm_with_entries.load()
+    await fm_with_entries.add({'single': 146.52, 'locked': True, 'mode': 'add'})
+
+    frequencies = await fm_with_entries.load()
+
+    assert len(frequencies) == 4
+    assert all(frequency.single != 146.52 for frequency in frequencies)
+
+
+@pytest.mark.asyncio
+async def test_unchanged_file_loads_from_cache(tmp_path, monkeypatch):
+    file = tmp_path / 'frequencies.yaml'
+    file.write_text(Path('tests/frequency_config_for_testing.yaml').read_text())
+    config = FrequencyConfiguration(file_name=file, disable_lockout=False,
+                                    disable_priority=False)
+    cache = FrequencyCache(tmp_path)
+    parsed = await FrequencyManager(config, CHANNEL_SPACING, cache).load()
+
+    def no_parsing(*args, **kwargs):
+        raise AssertionError('file parsed again')
+
+    monkeypatch.setattr(fm_module.yaml, 'load', no_parsing)
+    frequency_manager = FrequencyManager(config, CHANNEL_SPACING, cache)
+    cached = await frequency_manager.load()
+
+    assert [frequency.key for frequency in cached] == [frequency.key for frequency in parsed]
+    assert cached[1].locked and cached[1].saved
+    with pytest.raises(ValueError, match='already occurs'):
+        await frequency_manager.add({'single': 454.0})
+
+    # A changed file is parsed again
+    monkeypatch.undo()
+    file.write_text('frequencies:\n  - single: 146.52\n')
+    changed = await FrequencyManager(config, CHANNEL_SPACING, cache).load()
+    assert [frequency.single for frequency in changed] == [146.52]
+
+
+def rewrite(file: Path, text: str) -> None:
+    # A new mtime even within the file system time resolution
+    mtime = file.stat().st_mtime_ns if file.exists() else 0
+    file.write_text(text)
+    os.utime(file, ns=(mtime + 10**9, mtime + 10**9))
+
+
+@pytest.mark.asyncio
+async def test_reload_applies_only_file_changes(tmp_path):
+    file = tmp_path / 'frequencies.yaml'
+    rewrite(file, 'frequencies:\n'
+            '  - single: 146.52\n    label: "Calling"\n'
+            '  - single: 147.0\n    priority: 2\n'
+            '  - lo: 150.0\n    hi: 151.0\n    locked: true\n')
+    config = FrequencyConfiguration(file_name=file, disable_lockout=False,
+                                    disable_priority=False, watch=True)
+    frequency_manager = FrequencyManager(config, CHANNEL_SPACING, FrequencyCache(None))
+    await frequency_manager.load()
+    assert not await frequency_manager.reload()  # unchanged
+
+    await frequency_manager.add({'single': 162.4, 'locked': True, 'mode': 'add'})
+    await frequency_manager.change({'single': 147.0, 'priority': 1})
+    first = frequency_manager.index[('single', 146520000)]
+
+    rewrite(file, 'frequencies:\n'
+            '  - single: 146.52\n    label: "Calling channel"\n'
+            '  - single: 147.0\n    priority: 2\n'
+            '  - single: 155.0\n')
+    assert await frequency_manager.reload()
+
+    index = frequency_manager.index
+    assert set(index) == {('single', 146520000), ('single', 147000000),
+                          ('single', 155000000), ('single', 162400000)}
+    assert len(frequency_manager.frequencies) == 4
+    assert index[('single', 146520000)] is first  # changed in place
+    assert first.label == 'Calling channel'
+    assert index[('single', 147000000)].priority == 1  # run time change kept
+    assert index[('single', 162400000)].locked  # run time entry kept
+
+
+@pytest.mark.asyncio
+async def test_invalid_reload_keeps_frequencies(tmp_path):
+    file = tmp_path / 'frequencies.yaml'
+    rewrite(file, 'frequencies:\n  - single: 146.52\n')
+    config = FrequencyConfiguration(file_name=file, disable_lockout=False,
+                                    disable_priority=False, watch=True)
+    frequency_manager = FrequencyManager(config, CHANNEL_SPACING, FrequencyCache(None))
+    await frequency_manager.load()
+
+    rewrite(file, 'frequencies:\n  - single: 146.52\n  - single: 146.52\n')
+    assert not await frequency_manager.reload()
+    assert [frequency.single for frequency in frequency_manager.frequencies] == [146.52]
+
+
+@pytest.mark.asyncio
+async def test_reload_over_runtime_change_is_kept_after_restart(tmp_path, monkeypatch):
+    monkeypatch.setattr(fm_module, 'SAVE_DELAY', 0.01)
+    file = tmp_path / 'frequencies.yaml'
+    rewrite(file, 'frequencies:\n  - single: 146.52\n  - single: 147.0\n')
+    config = FrequencyConfiguration(file_name=file, disable_lockout=False,
+                                    disable_priority=False, watch=True,
+                                    runtime_file=fm_module.runtime_file_for(file))
+    frequency_manager = FrequencyManager(config, CHANNEL_SPACING, FrequencyCache(None))
+    await frequency_manager.load()
+    await frequency_manager.change({'single': 146.52, 'locked': True})
+    await frequency_manager.change({'single': 147.0, 'locked': True})
+    await asyncio.sleep(0.05)
+
+    # The file now decides on 146.52 and no longer has 147.0
+    rewrite(file, 'frequencies:\n  - single: 146.52\n    locked: false\n    priority: 2\n')
+    assert await frequency_manager.reload()
+    await asyncio.sleep(0.05)
+
+    restarted = FrequencyManager(config, CHANNEL_SPACING, FrequencyCache(None))
+    await restarted.load()
+    await restarted.restore()
+    frequency = restarted.index[('single', 146520000)]
+    assert not frequency.locked and frequency.priority == 2
+    assert list(restarted.index) == [('single', 146520000)]
+
+
+@pytest.mark.asyncio
+async def test_runtime_changes_are_saved_once_and_restored(tmp_path, monkeypatch):
+    monkeypatch.setattr(fm_module, 'SAVE_DELAY', 0.01)
+    file = tmp_path / 'frequencies.yaml'
+    file.write_text('frequencies:\n  - single: 146.52\n    label: "Calling"\n')
+    config = FrequencyConfiguration(file_name=file, disable_lockout=False,
+                                    disable_priority=False,
+                                    runtime_file=fm_module.runtime_file_for(file))
+    assert config.runtime_file == tmp_path / 'frequencies.runtime.yaml'
+
+    frequency_manager = FrequencyManager(config, CHANNEL_SPACING, FrequencyCache(None))
+    await frequency_manager.load()
+    writes = []
+    monkeypatch.setattr(fm_module, 'atomic_write',
+                        lambda path, data: writes.append(data) or path.write_bytes(data))
+    await frequency_manager.change({'single': 162.4, 'locked': True, 'mode': 'add'})
+    await frequency_manager.change({'single': 146.52, 'priority': 1, 'mode': 'add'})
+    await asyncio.sleep(0.05)
+    assert len(writes) == 1  # debounced
+
+    restored = FrequencyManager(config, CHANNEL_SPACING, FrequencyCache(None))
+    await restored.load()
+    await restored.restore()
+    assert restored.index[('single', 162400000)].locked
+    assert restored.index[('single', 146520000)].priority == 1
+    assert restored.index[('single', 146520000)].label == 'Calling'
+    assert not restored.index[('single', 146520000)].saved
+
+    # Clearing the lockouts ('l' key) empties the runtime file
+    await restored.load()
+    restored.save()
+    assert restored.runtime_entries() == []
+    assert yaml.safe_load(config.runtime_file.read_text()) == {'frequencies': []}
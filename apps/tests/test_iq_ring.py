@@ -0,0 +1,132 @@
+import threading
+import uuid
+import numpy as np
+import pytest
+from iq_ring import IQRingWriter, IQRingReader
+
+
+@pytest.fixture
+def ring():
+    name = f'ham2mon-test-{uuid.uuid4().hex[:8]}'
+    writer = IQRingWriter(name, 100, center_freq=146E6, samp_rate=1E6)
+    reader = IQRingReader(name)
+    yield (writer, reader)
+    reader.close()
+    writer.close()
+
+
+def samples(start, count):
+    return np.arange(start, start + count).astype(np.complex64)
+
+
+def test_read_returns_written_samples(ring):
+    (writer, reader) = ring
+    assert reader.read() is None
+    writer.write(samples(0, 30))
+    block = reader.read()
+    assert block.seq == 0
+    assert np.array_equal(block.samples, samples(0, 30))
+    assert block.center_freq == 146E6
+    assert block.samp_rate == 1E6
+    assert reader.read() is None
+
+
+def test_read_stops_at_the_end_of_the_ring(ring):
+    (writer, reader) = ring
+    writer.write(samples(0, 80))
+    reader.read()
+    writer.write(samples(80, 40))
+    first = reader.read()
+    second = reader.read()
+    assert (first.seq, len(first.samples)) == (80, 20)
+    assert (second.seq, len(second.samples)) == (100, 20)
+    assert np.array_equal(np.concatenate([first.samples, second.samples]),
+                          samples(80, 40))
+
+
+def test_slow_reader_skips_overwritten_samples(ring):
+    (writer, reader) = ring
+    writer.write(samples(0, 50))
+    writer.write(samples(50, 100))
+    block = reader.read()
+    assert block.seq == 50
+    assert reader.dropped == 50
+    assert np.array_equal(block.samples, samples(50, 50))
+
+
+def test_metadata_change_splits_blocks(ring):
+    (writer, reader) = ring
+    writer.write(samples(0, 10))
+    writer.set_metadata(147E6, 1E6)
+    writer.write(samples(10, 10))
+    first = reader.read()
+    second = reader.read()
+    assert (first.seq, len(first.samples), first.center_freq) == (0, 10, 146E6)
+    assert (second.seq, len(second.samples), second.center_freq) == (10, 10, 147E6)
+
+
+def test_view_is_valid_until_overwritten(ring):
+    (writer, reader) = ring
+    writer.write(samples(0, 10))
+    block = reader.read(copy=False)
+    assert reader.valid(block)
+    writer.write(samples(10, 95))
+    assert not reader.valid(block)
+
+
+def test_reader_rejects_other_shared_memory():
+    from multiprocessing import shared_memory
+    name = f'ham2mon-test-{uuid.uuid4().hex[:8]}'
+    other = shared_memory.SharedMemory(name, create=True, size=256)
+    try:
+        with pytest.raises(ValueError):
+            IQRingReader(name)
+    finally:
+        other.close()
+        other.unlink()
+
+
+def test_metadata_waits_for_the_settle_time():
+    name = f'ham2mon-test-{uuid.uuid4().hex[:8]}'
+    now = [0.0]
+    writer = IQRingWriter(name, 100, center_freq=146E6, samp_rate=1E6,
+                          clock=lambda: now[0])
+    reader = IQRingReader(name)
+    try:
+        writer.set_metadata(147E6, 1E6, settle=0.05)
+        # samples of the old frequency still in the flowgraph buffers
+        writer.write(samples(0, 10))
+        now[0] = 0.05
+        writer.write(samples(10, 10))
+        first = reader.read()
+        second = reader.read()
+        assert (first.seq, len(first.samples), first.center_freq) == (0, 10, 146E6)
+        assert (second.seq, len(second.samples), second.center_freq) == (10, 10, 147E6)
+    finally:
+        reader.close()
+        writer.close()
+
+
+def test_metadata_from_another_thread_keeps_the_header_consistent(ring):
+    (writer, reader) = ring
+    stop = threading.Event()
+
+    def retune():
+        freq = 146E6
+        while not stop.is_set():
+            freq += 1E3
+            writer.set_metadata(freq, 1E6)
+
+    thread = threading.Thread(target=retune)
+    thread.start()
+    try:
+        for idx in range(2000):
+            writer.write(samples(idx, 5))
+            reader.read()
+    finally:
+        stop.set()
+        thread.join()
+
+    assert int(writer.header['gen']) % 2 == 0
+    writer.write(samples(0, 5))
+    assert reader.read() is not None
@@ -0,0 +1,42 @@
+import pytest
+from occupancy import OccupancyMap
+
+
+def test_duty_cycle_of_channels_in_view():
+    occupancy = OccupancyMap(450000000, 460000000, 12500)
+    for idx in range(10):
+        heard = [451000000] if idx < 3 else []
+        occupancy.observe(451500000, 2000000, heard)
+
+    assert occupancy.duty(451000000) == pytest.approx(0.3)
+    assert occupancy.duty(451500000) == 0
+    assert occupancy.duty(458000000) == 0  # never in view
+    assert occupancy.band_duty(450000000, 452000000) == pytest.approx(0.3)
+
+
+def test_channels_out_of_view_are_ignored():
+    occupancy = OccupancyMap(450000000, 460000000, 12500)
+    occupancy.observe(451000000, 2000000, [455000000])
+    assert occupancy.busiest() == []
+
+
+def test_aging_keeps_duty_but_lets_new_spectra_weigh_more():
+    occupancy = OccupancyMap(450000000, 460000000, 12500)
+    for _ in range(4):
+        occupancy.observe(451000000, 2000000, [451000000])
+    occupancy.age()
+    assert occupancy.duty(451000000) == 1
+    for _ in range(2):
+        occupancy.observe(451000000, 2000000, [])
+    assert occupancy.duty(451000000) == pytest.approx(0.5)
+    assert occupancy.busiest(1) == [(451000000, pytest.approx(0.5))]
+
+
+def test_carry_over_keeps_the_channels_in_both_maps():
+    previous = OccupancyMap(450000000, 460000000, 12500)
+    for _ in range(4):
+        previous.observe(451000000, 2000000, [451000000])
+    occupancy = OccupancyMap(450500000, 470000000, 12500)
+    occupancy.carry_over(previous)
+    assert occupancy.duty(451000000) == 1
+    assert occupancy.duty(465000000) == 0
@@ -0,0 +1,36 @@
+import pytest
+import recording_formats
+from recording_formats import (RecordingEncoder, check_record_format,
+                               encoded_name, wav_subformat)
+
+
+def test_bps_maps_to_wav_subformat():
+    assert wav_subformat(8) == 'FORMAT_PCM_U8'
+    assert wav_subformat(16) == 'FORMAT_PCM_16'
+    assert wav_subformat(24) == 'FORMAT_PCM_24'
+    with pytest.raises(ValueError):
+        wav_subformat(12)
+
+
+def test_encoded_name_changes_extension():
+    assert encoded_name('wav/146.5200_20240101_120000.123_V.wav', 'flac') == \
+        'wav/146.5200_20240101_120000.123_V.flac'
+    assert encoded_name('wav/x.wav', 'opus') == 'wav/x.opus'
+
+
+def test_unknown_format_is_rejected():
+    with pytest.raises(ValueError):
+        check_record_format('mp3')
+
+
+def test_compressed_formats_need_soundfile(monkeypatch):
+    monkeypatch.setattr(recording_formats, 'soundfile', None)
+    check_record_format('wav')
+    with pytest.raises(ValueError):
+        check_record_format('flac')
+
+
+def test_wav_recordings_are_not_encoded():
+    encoder = RecordingEncoder('wav')
+    assert encoder.submit('wav/x.wav') == 'wav/x.wav'
+    encoder.shutdown()
@@ -0,0 +1,139 @@
+import os
+import wave
+
+import pytest
+from recording_formats import RecordingEncoder
+from recording_store import (INDEX_NAME, RecordingStore, StoreParams,
+                             read_index, read_recording, select, extract)
+
+
+def write_wav(path, frames=8000, rate=8000):
+    with wave.open(str(path), 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(bytes(2*frames))
+    return path
+
+
+def test_append_index_and_extract(tmp_path):
+    store = RecordingStore(tmp_path / 'store')
+    source = tmp_path / 'a.wav'
+    source.write_bytes(b'recording a')
+    record_id = store.reserve()
+    store.append(record_id, source, rf=146.52, start=1000.0, channel=2)
+    store.close()
+
+    assert not source.exists()
+    (entry,) = read_index(tmp_path / 'store')
+    assert entry.id == record_id and entry.channel == 2
+    assert read_recording(tmp_path / 'store', entry) == b'recording a'
+    assert extract(tmp_path / 'store', entry, tmp_path / 'out').read_bytes() == b'recording a'
+
+
+def test_segments_rotate(tmp_path):
+    store = RecordingStore(tmp_path, segment_size=10)
+    for idx in range(3):
+        source = tmp_path / f'{idx}.wav'
+        source.write_bytes(b'12345678')
+        store.append(store.reserve(), source, rf=146.52, start=idx)
+    store.close()
+
+    entries = list(read_index(tmp_path))
+    assert len({entry.segment for entry in entries}) == 3
+    assert all(entry.offset == 0 for entry in entries)
+
+
+def test_two_stores_in_one_process_share_a_directory(tmp_path):
+    stores = [RecordingStore(tmp_path), RecordingStore(tmp_path)]
+    contents = [b'AA', b'BB', b'CC', b'DD']
+    for (idx, content) in enumerate(contents):
+        store = stores[idx % 2]
+        source = tmp_path / f'{idx}.wav'
+        source.write_bytes(content)
+        store.append(store.reserve(), source, rf=146.52, start=idx)
+    for store in stores:
+        store.close()
+
+    entries = list(read_index(tmp_path))
+    assert len({entry.id for entry in entries}) == 4
+    assert [read_recording(tmp_path, entry) for entry in entries] == contents
+
+
+def test_select_filters(tmp_path):
+    store = RecordingStore(tmp_path)
+    for (idx, rf) in enumerate((146.52, 146.52, 446.0)):
+        source = tmp_path / f'{idx}.wav'
+        source.write_bytes(b'x')
+        store.append(f'id{idx}', source, rf=rf, start=100.0*idx)
+    store.close()
+
+    entries = list(read_index(tmp_path))
+    assert [e.id for e in select(entries, rf=146.52)] == ['id0', 'id1']
+    assert [e.id for e in select(entries, since=50, until=250)] == ['id1', 'id2']
+    assert [e.id for e in select(entries, ids=['id2'])] == ['id2']
+
+
+def test_truncated_index_line_is_skipped(tmp_path):
+    store = RecordingStore(tmp_path)
+    source = tmp_path / 'a.wav'
+    source.write_bytes(b'x')
+    store.append('id0', source, rf=146.52, start=0.0)
+    store.close()
+    with open(tmp_path / INDEX_NAME, 'a') as index:
+        index.write('{"id": "id1", "segm')
+
+    assert [e.id for e in read_index(tmp_path)] == ['id0']
+
+
+def test_encoder_appends_to_store(tmp_path):
+    store = RecordingStore(tmp_path / 'store')
+    encoder = RecordingEncoder('wav', store)
+    wav_name = str(write_wav(tmp_path / '146.5200_x.wav', frames=4000))
+    reference = encoder.submit(wav_name, {'rf': 146.52, 'start': 0.0,
+                                          'classification': 'V', 'channel': 1})
+    encoder.shutdown()
+
+    (entry,) = read_index(tmp_path / 'store')
+    assert reference == f'{tmp_path / "store"}#{entry.id}'
+    assert entry.duration == pytest.approx(0.5)
+    assert entry.classification == 'V'
+
+
+
+def test_encoder_stores_straight_from_the_tmp_area(tmp_path):
+    store = RecordingStore(tmp_path / 'store')
+    encoder = RecordingEncoder('wav', store)
+    (tmp_path / 'tmp').mkdir()
+    (tmp_path / 'wav').mkdir()
+    wav_name = str(write_wav(tmp_path / 'tmp' / '146.5200_x.wav', frames=4000))
+    encoder.submit(wav_name, {'rf': 146.52, 'start': 0.0, 'classification': 'V'},
+                   name='146.5200_x_V.wav', keep_dir=str(tmp_path / 'wav'))
+    encoder.shutdown()
+
+    (entry,) = read_index(tmp_path / 'store')
+    assert entry.name == '146.5200_x_V.wav'
+    assert os.listdir(tmp_path / 'tmp') == []
+    assert os.listdir(tmp_path / 'wav') == []
+
+
+class FailingStore(RecordingStore):
+    def append(self, *args, **kwargs):
+        raise OSError('disk full')
+
+
+def test_recording_is_kept_when_it_cannot_be_stored(tmp_path):
+    encoder = RecordingEncoder('wav', FailingStore(tmp_path / 'store'))
+    (tmp_path / 'tmp').mkdir()
+    (tmp_path / 'wav').mkdir()
+    wav_name = str(write_wav(tmp_path / 'tmp' / '146.5200_x.wav'))
+    encoder.submit(wav_name, {'rf': 146.52, 'start': 0.0},
+                   name='146.5200_x_V.wav', keep_dir=str(tmp_path / 'wav'))
+    encoder.shutdown()
+
+    assert os.listdir(tmp_path / 'tmp') == []
+    assert os.listdir(tmp_path / 'wav') == ['146.5200_x_V.wav']
+
+def test_store_params_are_validated():
+    with pytest.raises(ValueError):
+        StoreParams(directory='store', segment_mb=0)
@@ -0,0 +1,71 @@
+import pytest
+from center_frequency_provider import (FrequencyGroup, FrequencyRangeParams,
+                                       FrequencySingleParams)
+from scan_simulator import (ScanSimulator, SimulationParams, Transmission,
+                            read_trace, synthetic_trace)
+
+
+def simulate(trace, num_demod=4, duration=120, **kwargs):
+    frequency_params = FrequencyGroup(sample_rate=2000000, quiet_timeout=10,
+                                      active_timeout=16, **kwargs)
+    params = SimulationParams(frequency_params=frequency_params,
+                              num_demod=num_demod, duration=duration)
+    return ScanSimulator(params, trace).run()
+
+
+def test_single_step_catches_everything_in_view():
+    trace = [Transmission(freq=146520000, start=5, duration=3),
+             Transmission(freq=146000000, start=20, duration=3)]  # on DC
+    report = simulate(trace, singles=[FrequencySingleParams(freq=146000000)])
+    assert report.transmissions == 2
+    assert report.caught == 1
+    assert report.missed_dwell == 1
+
+
+def test_short_transmission_on_another_step_is_missed_by_dwell():
+    trace = [Transmission(freq=463500000, start=2, duration=2)]
+    report = simulate(trace, ranges=[FrequencyRangeParams(lower_freq=460000000,
+                                                          upper_freq=464000000)])
+    assert len(report.steps) == 3
+    assert report.missed_dwell == 1
+    assert report.caught_fraction == 0
+
+
+def test_demod_shortage_is_reported():
+    trace = [Transmission(freq=146520000, start=5, duration=10),
+             Transmission(freq=146550000, start=6, duration=2)]
+    report = simulate(trace, num_demod=1, singles=[FrequencySingleParams(freq=146000000)])
+    assert report.caught == 1
+    assert report.missed_demod == 1
+
+
+def test_round_robin_revisit_interval():
+    report = simulate([], duration=200,
+                      ranges=[FrequencyRangeParams(lower_freq=460000000,
+                                                   upper_freq=464000000)])
+    for intervals in report.revisits.values():
+        assert intervals
+        assert all(interval == pytest.approx(30, abs=1) for interval in intervals)
+
+
+def test_activity_schedule_keeps_max_revisit():
+    trace = synthetic_trace(list(range(450000000, 460000000, 125000)), 1800, per_hour=30, seed=2)
+    report = simulate(trace, duration=1800, schedule='activity', max_revisit=60,
+                      ranges=[FrequencyRangeParams(lower_freq=450000000,
+                                                   upper_freq=460000000)])
+    assert report.caught
+    for intervals in report.revisits.values():
+        assert max(intervals) <= 60 + 0.5
+
+
+def test_read_trace(tmp_path):
+    trace_file = tmp_path / 'trace.csv'
+    trace_file.write_text('freq,start,duration\n462.5625,10,2.5\n')
+    assert read_trace(str(trace_file)) == [Transmission(freq=462562500, start=10, duration=2.5)]
+    trace_file.write_text('freq,start\n462.5625,10\n')
+    with pytest.raises(ValueError):
+        read_trace(str(trace_file))
+
+
+def test_synthetic_trace_is_repeatable():
+    assert synthetic_trace([146520000], 3600, seed=3) == synthetic_trace([146520000], 3600, seed=3)
@@ -0,0 +1,36 @@
+import pytest
+from step_planner import plan_centers, USABLE_BANDWIDTH
+
+SAMP_RATE = 2400000
+DC_GUARD = 5000
+POINTS = [451012500, 451025000, 451800000, 452300000, 456000000,
+          456012500, 461950000, 462562500, 462587500, 467562500]
+
+
+def covered(point: int, centers: list[int]) -> bool:
+    half = SAMP_RATE * USABLE_BANDWIDTH / 2
+    return any(DC_GUARD <= abs(point - center) <= half for center in centers)
+
+
+def test_every_point_is_covered_away_from_dc():
+    centers = plan_centers(POINTS, SAMP_RATE, DC_GUARD)
+    assert centers == sorted(centers)
+    assert all(covered(point, centers) for point in POINTS)
+
+
+def test_fewer_steps_than_tiling_the_range():
+    centers = plan_centers(POINTS, SAMP_RATE, DC_GUARD)
+    tiled = (max(POINTS) - min(POINTS)) // SAMP_RATE + 1
+    assert len(centers) < tiled
+
+
+def test_point_on_a_center_is_moved_off_dc():
+    # Two points exactly one usable half apart would put one on DC
+    points = [460000000, 460960000, 460965000]
+    centers = plan_centers(points, SAMP_RATE, DC_GUARD)
+    assert all(covered(point, centers) for point in points)
+
+
+def test_guard_wider_than_band_is_rejected():
+    with pytest.raises(ValueError):
+        plan_centers(POINTS, SAMP_RATE, dc_guard=SAMP_RATE)
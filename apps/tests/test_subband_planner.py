@@ -0,0 +1,67 @@
+import pytest
+from decimation_planner import NBFM_PROFILE, WBFM_PROFILE, plan_decimation
+from subband_planner import plan_subbands, SubbandPlan, MAX_SUBBANDS
+
+
+def test_low_rate_still_decimates():
+
+    plan = plan_subbands(1E6, NBFM_PROFILE)
+
+    assert plan.num_subbands > 2
+    assert plan.decimation > 4
+    assert plan.output_rate >= NBFM_PROFILE.min_channel_rate
+
+
+def test_wide_channels_get_fewer_subbands():
+
+    narrow = plan_subbands(2.4E6, NBFM_PROFILE)
+    wide = plan_subbands(2.4E6, WBFM_PROFILE)
+
+    assert wide.num_subbands < narrow.num_subbands
+    assert wide.output_rate > narrow.output_rate
+
+
+@pytest.mark.parametrize('samp_rate', [1E6, 1.024E6, 2.4E6, 3.2E6, 10E6, 20E6])
+@pytest.mark.parametrize('profile', [NBFM_PROFILE, WBFM_PROFILE])
+def test_channels_fit_in_subbands(samp_rate, profile):
+
+    plan = plan_subbands(samp_rate, profile)
+
+    assert plan.num_subbands % 2 == 0
+    assert 2 <= plan.num_subbands <= MAX_SUBBANDS
+    # the filter passes the channel farthest from a sub-band center and
+    # stops before the first frequency aliasing onto it
+    assert plan.cutoff - plan.transition/2 == pytest.approx(plan.pass_edge)
+    assert plan.cutoff + plan.transition/2 == pytest.approx(plan.output_rate - plan.pass_edge)
+    assert plan.transition >= plan.spacing / 2 - 1E-6
+    # the tuners can run at the sub-band rate
+    plan_decimation(plan.output_rate, 8000, profile)
+
+
+def test_too_narrow_band_is_not_split():
+
+    plan = plan_subbands(100E3, NBFM_PROFILE)
+
+    assert plan.num_subbands == 2
+    assert plan.output_rate == 100E3
+
+
+def test_locate_nearest_subband():
+
+    plan = SubbandPlan(1E6, 10, 13E3)   # 100 kHz spacing
+
+    assert plan.locate(0) == (0, 0)
+    assert plan.locate(120E3) == (1, pytest.approx(20E3))
+    assert plan.locate(-120E3) == (9, pytest.approx(-20E3))
+    # upper half of the band wraps to the negative sub-bands (FFT order)
+    assert plan.locate(-480E3) == (5, pytest.approx(20E3))
+
+
+@pytest.mark.parametrize('freq', range(-500_000, 500_000, 12_500))
+def test_locate_offset_within_half_spacing(freq):
+
+    plan = plan_subbands(1E6, NBFM_PROFILE)
+    (index, offset) = plan.locate(freq)
+
+    assert 0 <= index < plan.num_subbands
+    assert abs(offset) <= plan.spacing / 2 + 1E-6
@@ -0,0 +1,47 @@
+import os
+
+import pytest
+from tmp_recordings import TmpArea, TmpAreaParams
+
+
+@pytest.fixture
+def area(tmp_path):
+    area = TmpArea(TmpAreaParams(directory=str(tmp_path / 'ram'), budget_mb=1),
+                   spill_dir=str(tmp_path / 'wav/tmp'),
+                   wav_dir=str(tmp_path / 'wav'))
+    area.prepare()
+    return area
+
+
+def record(path, size):
+    with open(path, 'wb') as file:
+        file.write(bytes(size))
+    return path
+
+
+def test_recordings_spill_to_disk_over_budget(area, tmp_path):
+    first = record(area.path('1.wav'), 2**20)
+    assert first.startswith(str(tmp_path / 'ram'))
+    second = area.path('2.wav')
+    assert second == str(tmp_path / 'wav/tmp/2.wav')
+    assert area.spilled == 1
+
+
+def test_accepted_recording_moves_to_wav(area, tmp_path):
+    path = record(area.path('146.5200_x.wav'), 10)
+    name = area.accept(path, '146.5200_x_V.wav')
+    assert name == str(tmp_path / 'wav/146.5200_x_V.wav')
+    assert os.path.exists(name) and not os.path.exists(path)
+
+
+def test_without_ram_directory_recordings_are_on_disk(tmp_path):
+    area = TmpArea(spill_dir=str(tmp_path / 'wav/tmp'))
+    assert area.path('1.wav') == str(tmp_path / 'wav/tmp/1.wav')
+    assert area.used() == 0
+
+
+def test_remove_cleans_up(area, tmp_path):
+    record(area.path('1.wav'), 10)
+    area.remove()
+    assert not (tmp_path / 'ram').exists()
+    assert not (tmp_path / 'wav/tmp').exists()
@@ -0,0 +1,29 @@
+import os
+from utilities import (cache_dir, atomic_write, mhz_to_hz, hz_to_mhz,
+                       baseband_to_frequency, frequency_to_baseband)
+
+
+def test_cache_dir_follows_xdg(tmp_path, monkeypatch):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path))
+    path = cache_dir()
+    assert path == tmp_path / 'ham2mon'
+    assert path.is_dir()
+
+
+def test_atomic_write_replaces_contents(tmp_path):
+    target = tmp_path / 'data.json'
+    atomic_write(target, b'old')
+    atomic_write(target, b'new')
+    assert target.read_bytes() == b'new'
+    # no temporary files left behind
+    assert os.listdir(tmp_path) == ['data.json']
+
+
+def test_frequencies_convert_to_exact_hz():
+    # 146.52 MHz is not exact as a float but is exactly 146520000 Hz
+    assert mhz_to_hz(146.52) == 146_520_000
+    assert mhz_to_hz(462.5625) == 462_562_500
+    assert hz_to_mhz(146_520_000) == 146.52
+    rf = baseband_to_frequency(20_000, 146_500_000)
+    assert mhz_to_hz(rf) == 146_520_000
+    assert frequency_to_baseband(rf, 146_500_000, 5000) == 20_000
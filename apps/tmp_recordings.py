@@ -0,0 +1,176 @@
+'''
+Temporary recording area.
+
+Every transmission is recorded to a temporary file first and, on a busy
+band with classification, most of them are discarded again (too short or
+an unwanted classification).  The temporary files are kept in a RAM backed
+directory (tmpfs, /dev/shm by default) as long as the recordings there stay
+under a memory budget.  Recordings that start while the budget is used up
+go to wav/tmp on disk instead.  Only accepted recordings are moved to wav/,
+so most of the discarded ones never touch the disk.  With a recording
+store (--record_store) the accepted ones are appended to the store from
+here instead, without a copy in wav/.
+
+The budget is checked when a recording starts: the recording sink keeps
+its file open, so a recording that is already running stays where it is.
+--max_recording bounds how far a single recording can go over the budget.
+'''
+from dataclasses import dataclass
+import glob
+import logging
+import os
+import shutil
+
+WAV_DIR = 'wav'
+SPILL_DIR = 'wav/tmp'
+RAM_DIR = '/dev/shm'
+BUDGET_MB = 64
+
+
+@dataclass(kw_only=True)
+class TmpAreaParams:
+    '''
+    Holds the temporary recording area options
+
+    directory (str | None): RAM backed directory for the recordings
+        (None = record to wav/tmp on disk only)
+    budget_mb (int): Most MiB of recordings kept in the directory
+    '''
+    directory: str | None = None
+    budget_mb: int = BUDGET_MB
+
+    def __post_init__(self):
+        if self.budget_mb < 0:
+            raise ValueError(f'Memory budget must not be negative: {self.budget_mb} MiB')
+
+
+def area_directory(ram_dir: str) -> str:
+    '''
+    Directory of this ham2mon instance in a RAM backed file system
+    '''
+    return os.path.join(ram_dir, f'ham2mon-{os.getpid()}')
+
+
+class TmpArea:
+    '''
+    Places the temporary recordings and moves the accepted ones to wav/
+
+    The demodulator worker processes share the directory (and the budget)
+    of the main process
+
+    Args:
+        params (TmpAreaParams): Directory and memory budget
+        spill_dir (str): Disk directory used when the budget is used up
+        wav_dir (str): Directory of the accepted recordings
+    '''
+
+    def __init__(self, params: TmpAreaParams=TmpAreaParams(),
+                 spill_dir: str=SPILL_DIR, wav_dir: str=WAV_DIR) -> None:
+        self.directory = params.directory
+        self.budget = params.budget_mb * 2**20
+        self.spill_dir = spill_dir
+        self.wav_dir = wav_dir
+        self.spilled = 0  # recordings started on disk for lack of memory
+
+    def prepare(self) -> None:
+        """Create the directories and remove recordings left behind"""
+        os.makedirs(self.spill_dir, exist_ok=True)
+        if self.directory is not None:
+            os.makedirs(self.directory, exist_ok=True)
+        self.clear()
+
+    def used(self) -> int:
+        """Bytes of recordings in the RAM backed directory"""
+        if self.directory is None:
+            return 0
+        total = 0
+        try:
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    try:
+                        total += entry.stat().st_size
+                    except FileNotFoundError:
+                        pass  # moved or removed meanwhile
+        except FileNotFoundError:
+            pass
+        return total
+
+    def path(self, name: str) -> str:
+        """Where to record a new recording
+
+        Args:
+            name (str): File name of the recording
+
+        Returns:
+            str: Path in the RAM backed directory, or on disk if it is
+                not used or the budget is used up
+        """
+        if self.directory is not None:
+            if self.used() < self.budget:
+                return os.path.join(self.directory, name)
+            self.spilled += 1
+            logging.debug(f'Memory budget used up, recording {name} on disk')
+        return os.path.join(self.spill_dir, name)
+
+    def accept(self, path: str, name: str | None=None) -> str:
+        """Move an accepted recording to the wav directory
+
+        Args:
+            path (str): Temporary recording
+            name (str | None): File name in the wav directory (default the
+                same as the temporary one)
+
+        Returns:
+            str: Path of the recording in the wav directory
+        """
+        target = os.path.join(self.wav_dir, name or os.path.basename(path))
+        shutil.move(path, target)  # a copy when coming from RAM
+        return target
+
+    def clear(self) -> None:
+        """Remove the temporary recordings"""
+        for directory in (self.spill_dir, self.directory):
+            if directory is None:
+                continue
+            for name in glob.glob(os.path.join(directory, '*.wav')):
+                try:
+                    os.unlink(name)
+                except FileNotFoundError:
+                    pass
+
+    def remove(self) -> None:
+        """Remove the temporary recordings and the directories"""
+        self.clear()
+        for directory in (self.spill_dir, self.directory):
+            if directory is None:
+                continue
+            try:
+                os.rmdir(directory)
+            except OSError:
+                pass
+
+
+def main() -> None:
+    """Show where recordings go with a tiny budget"""
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as base:
+        area = TmpArea(TmpAreaParams(directory=os.path.join(base, 'ram'), budget_mb=1),
+                       spill_dir=os.path.join(base, 'wav/tmp'),
+                       wav_dir=os.path.join(base, 'wav'))
+        area.prepare()
+        for idx in range(4):
+            path = area.path(f'{idx}.wav')
+            with open(path, 'wb') as file:
+                file.write(bytes(600 * 1024))
+            print(f'{idx}.wav -> {os.path.relpath(path, base)} '
+                  f'({area.used() // 1024} KiB in RAM)')
+        print(f'accepted: {os.path.relpath(area.accept(path), base)}')
+        area.remove()
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except KeyboardInterrupt:
+        pass
@@ -3,14 +3,72 @@ Created on Thu Mar 7 2024
 
 @author: john
 """
+import os
+import tempfile
+from pathlib import Path
+
+def mhz_to_hz(freq: float) -> int:
+    """Returns the integer Hz key of a frequency in MHz
+
+    Frequencies are compared and looked up by this key, MHz floats are
+    only for display and the frequency file
+    """
+    return int(round(float(freq) * 1E6))
+
+def hz_to_mhz(freq: int) -> float:
+    """Returns frequency in MHz (for display)
+    """
+    return freq / 1E6
+
+def hz_to_baseband(rf_hz: int, center_freq: int, channel_spacing: int) -> int:
+    """Returns baseband frequency in Hz (rounded to the channel spacing)
+    """
+    bb_freq = rf_hz - center_freq
+    bb_freq = round(bb_freq/channel_spacing) * channel_spacing
+    return int(bb_freq)
+
 def frequency_to_baseband(freq: float, center_freq: int, channel_spacing: int) -> int:
     """Returns baseband frequency in Hz
     """
-    bb_freq = float(freq) * 1E6 - center_freq
-    bb_freq = round(bb_freq/channel_spacing) * channel_spacing
-    return bb_freq
+    return hz_to_baseband(mhz_to_hz(freq), center_freq, channel_spacing)
+
+def baseband_to_hz(bb_freq: int, center_freq: int) -> int:
+    """Return frequency in Hz
+    """
+    return int(round(bb_freq + center_freq))
 
 def baseband_to_frequency(bb_freq: int, center_freq: int) -> float:
     """Return frequency in Mhz
     """
-    return (bb_freq + center_freq)/1E6
\ No newline at end of file
+    return hz_to_mhz(baseband_to_hz(bb_freq, center_freq))
+
+def cache_dir() -> Path:
+    """Return the directory for ham2mon cache files (created if needed)
+
+    Follows XDG_CACHE_HOME (default ~/.cache)
+    """
+    base = os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache'
+    path = Path(base) / 'ham2mon'
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+def atomic_write(path: Path, data: bytes) -> None:
+    """Write a file so readers see either the old or the new contents
+
+    The data is written to a temporary file in the same directory
+    which is then renamed over the target
+    """
+    path = Path(path)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f'.{path.name}.')
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_name, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except OSError:
+            pass
+        raise
@@ -0,0 +1,49 @@
+'''
+Flowgraph of a demodulator worker process (see demod_workers.py).
+
+Imported by the worker processes only, so demod_workers.py itself does not
+need GNU Radio.
+'''
+from typing import Callable
+
+from gnuradio import gr  # type: ignore
+from gnuradio import zeromq  # type: ignore
+
+from demodulators.BaseTuner import BaseTuner
+from demod_workers import WorkerParams
+
+
+class WorkerFlow(gr.top_block):
+    '''
+    IQ subscriber, demodulator pool and audio publisher of one worker
+    '''
+
+    def __init__(self, params: WorkerParams, notify_scanner: Callable):
+        gr.top_block.__init__(self, "DemodWorker")
+
+        # Local import avoids a circular import (receiver uses the workers)
+        from receiver import create_classifier
+        from demodulators.DemodPool import DemodPool
+
+        classifier = create_classifier(params.classifier_params, params.audio_rate)
+
+        # Number the channels as if the demodulators were in the main process
+        BaseTuner.channel = params.first_channel - 1
+
+        iq_source = zeromq.sub_source(gr.sizeof_gr_complex, 1,
+                                      params.iq_address, 100, False, -1)
+        self.pool = DemodPool(params.samp_rate, params.num_demod,
+                              params.type_demod, params.audio_rate,
+                              params.record, params.play, params.audio_bps,
+                              params.min_recording, classifier,
+                              notify_scanner, params.shared_frontend,
+                              params.baseband_ring,
+                              record_format=params.record_format,
+                              record_store=params.record_store,
+                              tmp_area=params.tmp_area)
+        self.connect(iq_source, self.pool)
+
+        if params.play:
+            audio_sink = zeromq.pub_sink(gr.sizeof_float, 1,
+                                         params.audio_address, 100, False, -1)
+            self.connect(self.pool, audio_sink)